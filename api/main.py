@@ -1,20 +1,25 @@
 """API main module."""
 
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 
 from fastapi import APIRouter, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from uvicorn.logging import DefaultFormatter
+from fastapi.responses import JSONResponse, PlainTextResponse
 
 from api.services.agent.initialise import initialise_agent_registry
+from api.src.agents.registry import AgentState, agent_registry
+from api.src.azure.credentials import get_credentials
+from api.src.mcp.pool import get_mcp_session_manager
+from api.src.runs.manager import close_run_managers
+from api.src.settings import configure_logging
+from api.src.utils.cassette import get_cassette
+from api.src.utils.metrics import LoopLagMonitor, metrics
+from api.src.utils.tracing import configure_tracing, shutdown_tracing
 from api.v1.router import router as v1_router
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
-root_logger = logging.getLogger()
-for handler in root_logger.handlers:
-    handler.setFormatter(DefaultFormatter(fmt="%(levelprefix)s %(message)s"))
 
 
 @asynccontextmanager
@@ -22,8 +27,22 @@ async def lifespan(
     app: FastAPI,  # pylint: disable=unused-argument, redefined-outer-name
 ):
     """Application lifespan context manager."""
-    await initialise_agent_registry()
-    yield
+    configure_logging()
+    configure_tracing()
+
+    async with (
+        get_mcp_session_manager(),
+        get_credentials().token_provider,
+        LoopLagMonitor(),
+    ):
+        # create the agents in the background, /ready reports them until they are ready
+        initialising = asyncio.create_task(initialise_agent_registry())
+        yield
+        initialising.cancel()
+        await asyncio.gather(initialising, return_exceptions=True)
+        await close_run_managers()
+        get_cassette().close()
+        shutdown_tracing()
 
 
 app = FastAPI(
@@ -68,6 +87,44 @@ async def get() -> dict:
     return {"message": "Hello, World!"}
 
 
+@app.get("/ready", description="Report whether every agent is ready to serve requests.")
+async def ready() -> JSONResponse:
+    """Return the warm-up state of every agent.
+
+    Agents serving tools from a cached manifest while it is revalidated count as ready.
+
+    Returns:
+        JSONResponse: The status of each agent, with status code 503 while any agent is still
+            initialising or has failed.
+
+    """
+    statuses = agent_registry.status
+    # with no agents at all the registry has not started initialising them
+    is_ready = bool(statuses) and all(
+        status.state in (AgentState.READY, AgentState.WARMING) for status in statuses
+    )
+    return JSONResponse(
+        {
+            "ready": is_ready,
+            "agents": [status.model_dump(mode="json") for status in statuses],
+        },
+        status_code=200 if is_ready else 503,
+    )
+
+
+@app.get("/metrics", description="Get the process's metrics in the Prometheus format.")
+async def get_metrics() -> PlainTextResponse:
+    """Return the process's metrics.
+
+    Returns:
+        PlainTextResponse: The metrics in the Prometheus text exposition format.
+
+    """
+    return PlainTextResponse(
+        await metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 api = APIRouter(prefix="/api")
 api.include_router(v1_router)
 app.include_router(api)
@@ -1,11 +1,13 @@
 """Initialise the agent registry with available agents."""
 
+import asyncio
 import logging
 
 from a2a.types import AgentSkill
 
 from api.src.agents.github import create_github_agent
 from api.src.agents.registry import agent_registry
+from api.src.tools.cache import ToolCachePolicy
 
 logger = logging.getLogger(__name__)
 
@@ -14,39 +16,49 @@ async def initialise_agent_registry() -> None:
     """Initialise the agent registry by loading all agents."""
     logger.info("Initialising agent registry...")
 
-    notification_agent = await create_github_agent(
-        name="GitHub Notification Agent",
-        description="Agent for managing your GitHub notifications",
-        version="0.1.0",
-        instructions="This agent handles notifications and alerts.",
-        skills=[
-            AgentSkill(
-                name="List Notifications",
-                description="List all notifications from your GitHub account",
-                inputModes=["text"],
-                outputModes=["text"],
-                id="list_notifications",
-                tags=["notifications", "github"],
-            ),
-            AgentSkill(
-                name="Get Notification Details",
-                description="Get details of a specific notification",
-                inputModes=["text"],
-                outputModes=["text"],
-                id="get_notification_details",
-                tags=["notifications", "github"],
-            ),
-        ],
-        allowed_tools={"list_notifications", "get_notification_details"},
-        model="gpt-4o-mini_2024-07-18",
-        use_stdio=True,
-    )
+    # create the agents concurrently, each is registered as soon as it is ready
+    agents = {
+        "GitHub Notification Agent": create_github_agent(
+            name="GitHub Notification Agent",
+            description="Agent for managing your GitHub notifications",
+            version="0.1.0",
+            instructions="This agent handles notifications and alerts.",
+            skills=[
+                AgentSkill(
+                    name="List Notifications",
+                    description="List all notifications from your GitHub account",
+                    inputModes=["text"],
+                    outputModes=["text"],
+                    id="list_notifications",
+                    tags=["notifications", "github"],
+                ),
+                AgentSkill(
+                    name="Get Notification Details",
+                    description="Get details of a specific notification",
+                    inputModes=["text"],
+                    outputModes=["text"],
+                    id="get_notification_details",
+                    tags=["notifications", "github"],
+                ),
+            ],
+            allowed_tools={"list_notifications", "get_notification_details"},
+            cached_tools={
+                "list_notifications": ToolCachePolicy(
+                    ttl=15, stale_while_revalidate=45
+                ),
+                "get_notification_details": ToolCachePolicy(
+                    ttl=60, stale_while_revalidate=240
+                ),
+            },
+            model="gpt-4o-mini_2024-07-18",
+        ),
+        # Add more agents as needed
+    }
 
-    agent_registry.register(
-        notification_agent,
+    await asyncio.gather(
+        *[agent_registry.initialise(name, agent) for name, agent in agents.items()]
     )
-    logger.info("%s agent registered successfully", notification_agent.name)
-
-    # Add more agents as needed
+    for status in agent_registry.status:
+        logger.info("%s agent %s", status.name, status.state.value)
 
     return agent_registry
@@ -2,15 +2,17 @@
 
 import asyncio
 import uuid
-from typing import AsyncGenerator, Dict, List
+from typing import Annotated, AsyncGenerator, List, Optional
 
 from a2a.server.events.event_consumer import EventConsumer
 from a2a.server.events.event_queue import EventQueue
 from a2a.types import AgentCard, Role
 from a2a.utils.message import get_message_text
 from ag_ui.core import (
+    BaseEvent,
     EventType,
     RunAgentInput,
+    RunErrorEvent,
     RunFinishedEvent,
     RunStartedEvent,
     TextMessageContentEvent,
@@ -18,10 +20,22 @@ from ag_ui.core import (
     TextMessageStartEvent,
 )
 from ag_ui.encoder import EventEncoder
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Header, HTTPException, Request, WebSocket
 from fastapi.responses import StreamingResponse
+from fastapi.websockets import WebSocketDisconnect
+from pydantic import Field, ValidationError
 
 from api.src.agents.registry import agent_registry
+from api.src.pydantic import ConfiguredBaseModel
+from api.src.runs.manager import (
+    catch_run_error,
+    get_run_manager,
+    parse_last_event_id,
+)
+from api.src.runs.store import get_run_store
+from api.src.utils.metrics import observe_stream
+from api.src.utils.priority import Priority, prioritise
+from api.src.utils.tracing import traced_run
 
 router = APIRouter(prefix="/agent", tags=["agent"])
 
@@ -44,16 +58,20 @@ async def get_agent(agentId: str) -> AgentCard:  # noqa: N803
     return agent.card
 
 
-# In-memory store mapping job IDs to generators
-job_generators: Dict[str, AsyncGenerator[str, None]] = {}
+class AgentRun(ConfiguredBaseModel):
+    """A run waiting for its stream to be opened."""
 
+    agent_id: Annotated[str, Field(description="The ID of the agent to execute")]
+    message: Annotated[RunAgentInput, Field(description="The input for the run")]
 
-async def process_message(
+
+@traced_run("agent.run")
+async def generate_events(
     agentId: str, message: RunAgentInput  # noqa: N803
-) -> AsyncGenerator[str, None]:
-    """Process a user message for a given agent and streams Server-Sent Events (SSE) representing the agent's response.
+) -> AsyncGenerator[BaseEvent, None]:
+    """Process a user message for a given agent and yields AG-UI events representing the agent's response.
 
-    This coroutine yields encoded SSE events for the following stages:
+    This coroutine yields events for the following stages:
         - Run started
         - Assistant message start
         - Assistant message content (streamed in chunks)
@@ -65,22 +83,17 @@ async def process_message(
         message (RunAgentInput): The input message containing user content, thread ID, and run ID.
 
     Yields:
-        str: Encoded SSE event strings representing the progress and content of the agent's response.
+        BaseEvent: Events representing the progress and content of the agent's response.
 
     Raises:
         Any exceptions raised by the agent execution or event streaming will propagate.
 
     """
-    # Create an event encoder to properly format SSE events
-    encoder = EventEncoder()
-
     # Send run started event
-    yield encoder.encode(
-        RunStartedEvent(
-            type=EventType.RUN_STARTED,
-            thread_id=message.thread_id,
-            run_id=message.run_id,
-        )
+    yield RunStartedEvent(
+        type=EventType.RUN_STARTED,
+        thread_id=message.thread_id,
+        run_id=message.run_id,
     )
 
     # Generate a message ID for the assistant's response
@@ -88,78 +101,178 @@ async def process_message(
 
     # Create a streaming completion request
     queue = EventQueue()
-    task = asyncio.create_task(
-        agent_registry.execute_agent(
-            agentId,
-            queue=queue,
-            options={
-                "message_id": message_id,
-                "role": Role.user,
-                "text": message.messages[0].content,
-                "thread_id": message.thread_id,
-            },
+    with prioritise(Priority.INTERACTIVE, message.thread_id):
+        task = asyncio.create_task(
+            agent_registry.execute_agent(
+                agentId,
+                queue=queue,
+                options={
+                    "message_id": message_id,
+                    "role": Role.user,
+                    "text": message.messages[0].content,
+                    "thread_id": message.thread_id,
+                },
+            )
         )
-    )
 
     consumer = EventConsumer(queue)
     task.add_done_callback(consumer.agent_task_callback)
     started = False
-    async for event in consumer.consume_all():
-        if not started:
-            # Send text message start event
-            yield encoder.encode(
-                TextMessageStartEvent(
+    try:
+        async for event in consumer.consume_all():
+            if not started:
+                # Send text message start event
+                yield TextMessageStartEvent(
                     type=EventType.TEXT_MESSAGE_START,
                     message_id=message_id,
                     role="assistant",
                 )
-            )
-            started = True
+                started = True
 
-        yield encoder.encode(
-            TextMessageContentEvent(
+            yield TextMessageContentEvent(
                 type=EventType.TEXT_MESSAGE_CONTENT,
                 message_id=message_id,
                 delta=get_message_text(event),
             )
-        )
+    except BaseException:
+        # stop the agent if the stream is closed early, e.g. when the client goes away
+        task.remove_done_callback(consumer.agent_task_callback)
+        task.cancel()
+        raise
+    finally:
+        await asyncio.gather(task, return_exceptions=True)
 
     # Send text message end event
-    yield encoder.encode(
-        TextMessageEndEvent(type=EventType.TEXT_MESSAGE_END, message_id=message_id)
-    )
+    yield TextMessageEndEvent(type=EventType.TEXT_MESSAGE_END, message_id=message_id)
 
     # Send run finished event
-    yield encoder.encode(
-        RunFinishedEvent(
-            type=EventType.RUN_FINISHED,
-            thread_id=message.thread_id,
-            run_id=message.run_id,
-        )
+    yield RunFinishedEvent(
+        type=EventType.RUN_FINISHED,
+        thread_id=message.thread_id,
+        run_id=message.run_id,
     )
 
 
+async def process_message(
+    agentId: str, message: RunAgentInput  # noqa: N803
+) -> AsyncGenerator[str, None]:
+    """Process a user message for a given agent, yielding encoded SSE events."""
+    # Create an event encoder to properly format SSE events
+    encoder = EventEncoder()
+
+    async for event in generate_events(agentId, message):
+        yield encoder.encode(event)
+
+
 @router.post(
-    "{agentId}/start", description="Send new chat message and start processing."
+    "/{agentId}", description="Send new chat message and stream updates via SSE."
+)
+async def run_message(
+    agentId: str,  # noqa: N803
+    message: RunAgentInput,
+    request: Request,
+):
+    """Process a message for an agent and stream its events in the same response."""
+    if agentId not in agent_registry:
+        raise HTTPException(status_code=404, detail="Agent not found")
+
+    encoder = EventEncoder(accept=request.headers.get("accept"))
+
+    async def stream() -> AsyncGenerator[str, None]:
+        events = generate_events(agentId, message)
+        async for event in catch_run_error(message.run_id, events):
+            yield encoder.encode(event)
+
+    return StreamingResponse(
+        observe_stream("agent", stream()), media_type=encoder.get_content_type()
+    )
+
+
+@router.websocket("/{agentId}/ws")
+async def run_message_ws(websocket: WebSocket, agentId: str):  # noqa: N803
+    """Process messages for an agent received over a WebSocket, sending back their events.
+
+    Each message received is a `RunAgentInput` as JSON, and each message sent is an AG-UI event as
+    JSON. Runs on one connection are processed one after another.
+    """
+    if agentId not in agent_registry:
+        await websocket.close(code=1008, reason="Agent not found")
+        return
+
+    await websocket.accept()
+    try:
+        while True:
+            try:
+                message = RunAgentInput.model_validate_json(
+                    await websocket.receive_text()
+                )
+            except ValidationError as err:
+                # reject the message, the connection stays open for the next one
+                error = RunErrorEvent(type=EventType.RUN_ERROR, message=str(err))
+                await websocket.send_text(
+                    error.model_dump_json(by_alias=True, exclude_none=True)
+                )
+                continue
+
+            events = generate_events(agentId, message)
+            async for event in catch_run_error(message.run_id, events):
+                await websocket.send_text(
+                    event.model_dump_json(by_alias=True, exclude_none=True)
+                )
+    except WebSocketDisconnect:
+        pass
+
+
+@router.post(
+    "/{agentId}/start", description="Send new chat message and start processing."
 )
 async def send_message(
     agentId: str,  # noqa: N803
     message: RunAgentInput,
 ):
     """Send a new chat message."""
+    # the run store and manager are created on first use, not on import
+    run_store = get_run_store("agent")
+    run_manager = get_run_manager("agent")
     # Generate a unique job id
     job_id = message.run_id
-    # Store the generator for streaming responses.
-    job_generators[job_id] = process_message(agentId, message)
+    if run_manager.settings.run_eager_start:
+        # Start processing now, buffering events until the stream is opened.
+        run_manager.start(job_id, process_message(agentId, message))
+    else:
+        # Store the run until its stream is opened.
+        await run_store.put(
+            job_id, AgentRun(agent_id=agentId, message=message).model_dump_json()
+        )
     # Return the job id to the client.
     return {"runId": job_id}
 
 
 @router.get("/stream/{runId}", description="Stream chat message updates via SSE.")
-async def stream_message(runId: str):  # noqa: N803
-    """Return an SSE stream for the provided job id."""
-    generator = job_generators.get(runId)
-    if generator is None:
-        raise HTTPException(status_code=404, detail="Job not found")
-    del job_generators[runId]
-    return StreamingResponse(generator, media_type="text/event-stream")
+async def stream_message(
+    runId: str,  # noqa: N803
+    last_event_id: Annotated[Optional[str], Header()] = None,
+):
+    """Return an SSE stream for the provided job id, resuming after `Last-Event-ID`."""
+    # the run store and manager are created on first use, not on import
+    run_store = get_run_store("agent")
+    run_manager = get_run_manager("agent")
+    resume_after = parse_last_event_id(last_event_id)
+    run = run_manager.get(runId)
+    if run is not None and not run.can_resume(resume_after):
+        raise HTTPException(
+            status_code=410, detail="Events of the job are no longer available"
+        )
+    if run is None:
+        payload = await run_store.pop(runId)
+        if payload is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        agent_run = AgentRun.model_validate_json(payload)
+        run = run_manager.start(
+            runId, process_message(agent_run.agent_id, agent_run.message)
+        )
+
+    return StreamingResponse(
+        run.stream(resume_after),
+        media_type="text/event-stream",
+    )
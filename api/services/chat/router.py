@@ -2,16 +2,19 @@
 
 import asyncio
 import json
+import time
 import uuid
-from typing import AsyncGenerator, Dict
+from typing import Annotated, AsyncGenerator, Dict, Optional
 
 from a2a.server.events.event_consumer import EventConsumer
 from a2a.server.events.event_queue import EventQueue
 from a2a.types import Role
 from a2a.utils.message import get_message_text
 from ag_ui.core import (
+    BaseEvent,
     EventType,
     RunAgentInput,
+    RunErrorEvent,
     RunFinishedEvent,
     RunStartedEvent,
     TextMessageContentEvent,
@@ -22,48 +25,110 @@ from ag_ui.core import (
     ToolCallStartEvent,
 )
 from ag_ui.encoder import EventEncoder
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Header, HTTPException, Request, WebSocket
 from fastapi.responses import StreamingResponse
+from fastapi.websockets import WebSocketDisconnect
 from openai import AsyncAzureOpenAI
+from openai.types.chat.chat_completion_message_tool_call import (
+    ChatCompletionMessageToolCall,
+)
+from pydantic import ValidationError
 
 from api.src.agents.registry import agent_registry
-from api.src.azure.credentials import AzureCredentials
+from api.src.azure.credentials import get_credentials
 from api.src.messages.create import ChatCompletionToolMessageParam, create_message
 from api.src.openai.client import get_client
-from api.src.openai.tools import create_tool
+from api.src.openai.scheduler import get_llm_scheduler
+from api.src.openai.stream import StreamAccumulator
+from api.src.openai.tools import create_client_tool
 from api.src.prompts import JARVIS_SYSTEM_PROMPT
+from api.src.runs.manager import (
+    catch_run_error,
+    get_run_manager,
+    parse_last_event_id,
+)
+from api.src.runs.store import get_run_store
+from api.src.settings import get_settings
+from api.src.utils.metrics import (
+    llm_request_seconds,
+    observe_stream,
+    tool_loop_iterations,
+)
+from api.src.utils.priority import Priority, prioritise
+from api.src.utils.tracing import traced_run
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
 
-# In-memory store mapping job IDs to generators
-job_generators: Dict[str, AsyncGenerator[str, None]] = {}
+async def call_agent(
+    tool_call: ChatCompletionMessageToolCall,
+    thread_id: str,
+    semaphore: asyncio.Semaphore,
+) -> ChatCompletionToolMessageParam:
+    """Call the agent requested by a tool call and return its response as a tool message.
+
+    Args:
+        tool_call (ChatCompletionMessageToolCall): The tool call naming the agent to execute.
+        thread_id (str): The thread ID for the agent's context.
+        semaphore (asyncio.Semaphore): Limits how many agents run at the same time.
+
+    Returns:
+        ChatCompletionToolMessageParam: The agent's response to the tool call.
+
+    """
+    options = json.loads(tool_call.function.arguments or "{}")
+    options["thread_id"] = thread_id
+    options["role"] = Role.agent
+
+    async with semaphore:
+        # call the tool, the agent's calls are queued behind first turns
+        queue = EventQueue()
+        with prioritise(Priority.NESTED, thread_id):
+            task = asyncio.create_task(
+                agent_registry.execute_agent(
+                    tool_call.function.name,
+                    queue=queue,
+                    options=options,
+                )
+            )
 
+        consumer = EventConsumer(queue)
+        task.add_done_callback(consumer.agent_task_callback)
+        response = None
+        try:
+            async for event in consumer.consume_all():
+                response = get_message_text(event)
+        except BaseException:
+            # stop the agent if the call is cancelled, e.g. when the run is abandoned
+            task.remove_done_callback(consumer.agent_task_callback)
+            task.cancel()
+            raise
+        finally:
+            await asyncio.gather(task, return_exceptions=True)
+
+    return ChatCompletionToolMessageParam(
+        tool_call_id=tool_call.id,
+        role="tool",
+        content=response or "No response from tool.",
+    )
 
-async def process_message(message: RunAgentInput) -> AsyncGenerator[str, None]:
-    """Process the message using the pipeline."""
-    # Create an event encoder to properly format SSE events
-    encoder = EventEncoder()
 
+@traced_run("chat.run")
+async def generate_events(message: RunAgentInput) -> AsyncGenerator[BaseEvent, None]:
+    """Process the message using the pipeline, yielding AG-UI events as they happen."""
     # Send run started event
-    yield encoder.encode(
-        RunStartedEvent(
-            type=EventType.RUN_STARTED,
-            thread_id=message.thread_id,
-            run_id=message.run_id,
-        )
+    yield RunStartedEvent(
+        type=EventType.RUN_STARTED,
+        thread_id=message.thread_id,
+        run_id=message.run_id,
     )
 
     # Initialize OpenAI client
-    credentials = AzureCredentials()
     client = get_client(
         AsyncAzureOpenAI,
-        options=credentials,
+        options=get_credentials(),
     )
 
-    # Generate a message ID for the assistant's response
-    message_id = uuid.uuid4().hex
-
     # Create a streaming completion request
 
     messages = [
@@ -78,7 +143,7 @@ async def process_message(message: RunAgentInput) -> AsyncGenerator[str, None]:
     )
 
     tools = [
-        create_tool(
+        create_client_tool(
             name=tool.name, description=tool.description, parameters=tool.parameters
         )
         for tool in message.tools or []
@@ -86,186 +151,243 @@ async def process_message(message: RunAgentInput) -> AsyncGenerator[str, None]:
 
     tools.extend(agent_registry.agents_as_tools)
 
-    stream = await client.chat.completions.create(
-        model="gpt-4o-mini_2024-07-18",
-        messages=messages,
-        stream=False,
-        tools=tools,
-    )
-
-    # if stream.choices[0].message.content:
-    #     # If the assistant's response is not empty, send the content event
-
-    #     # Send text message start event
-    #     yield encoder.encode(
-    #         TextMessageStartEvent(
-    #             type=EventType.TEXT_MESSAGE_START,
-    #             message_id=message_id,
-    #             role="assistant",
-    #         )
-    #     )
-    #     yield encoder.encode(
-    #         TextMessageContentEvent(
-    #             type=EventType.TEXT_MESSAGE_CONTENT,
-    #             message_id=message_id,
-    #             delta=stream.choices[0].message.content or "",
-    #         )
-    #     )
-
-    #     # Send text message end event
-    #     yield encoder.encode(
-    #         TextMessageEndEvent(type=EventType.TEXT_MESSAGE_END, message_id=message_id)
-    #     )
-
-    tool_calls = stream.choices[0].message.tool_calls
-
-    if tool_calls:
-
-        while tool_calls:
-            tool_responses = []
-
-            # If the assistant's response includes tool calls, send them as events
-            for tool_call in tool_calls:
-
-                if tool_call.function.name in agent_registry:
-                    # Send tool message start event
-                    yield encoder.encode(
-                        ToolCallStartEvent(
-                            type=EventType.TOOL_CALL_START,
-                            parent_message_id=message_id,
-                            tool_call_id=tool_call.id,
-                            tool_call_name="callAgent",
-                        )
-                    )
-
-                    yield encoder.encode(
-                        ToolCallArgsEvent(
-                            type=EventType.TOOL_CALL_ARGS,
-                            tool_call_id=tool_call.id,
-                            delta=tool_call.function.name or "",
-                        )
-                    )
+    semaphore = asyncio.Semaphore(get_settings().chat_max_concurrent_agents)
 
-                    options = json.loads(tool_call.function.arguments or "{}")
-                    options["thread_id"] = message.thread_id
-                    options["role"] = Role.agent
-
-                    # call the tool
-                    queue = EventQueue()
-                    task = asyncio.create_task(
-                        agent_registry.execute_agent(
-                            tool_call.function.name,
-                            queue=queue,
-                            options=options,
-                        )
-                    )
+    # the first turn is what the user is waiting on, later turns follow up on agent calls
+    priority = Priority.INTERACTIVE
+    model = "gpt-4o-mini_2024-07-18"
+    iterations = 0
 
-                    consumer = EventConsumer(queue)
-                    task.add_done_callback(consumer.agent_task_callback)
-                    response = None
-                    async for event in consumer.consume_all():
-                        response = get_message_text(event)
+    while True:
+        # each turn's content is its own assistant message, and the parent of its tool calls
+        message_id = uuid.uuid4().hex
+        start = time.perf_counter()
+        stream = await get_llm_scheduler().create_completion(
+            client,
+            priority=priority,
+            thread_id=message.thread_id,
+            model=model,
+            messages=messages,
+            stream=True,
+            tools=tools,
+        )
 
-                    tool_response = ChatCompletionToolMessageParam(
-                        tool_call_id=tool_call.id,
-                        role="tool",
-                        content=response or "No response from tool.",
+        # forward content deltas and tool call fragments as they arrive
+        completion = StreamAccumulator()
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+
+            if delta.content:
+                if not completion.content:
+                    # Send text message start event
+                    yield TextMessageStartEvent(
+                        type=EventType.TEXT_MESSAGE_START,
+                        message_id=message_id,
+                        role="assistant",
                     )
-                    tool_responses.append(tool_response)
+                completion.add_content(delta.content)
+                yield TextMessageContentEvent(
+                    type=EventType.TEXT_MESSAGE_CONTENT,
+                    message_id=message_id,
+                    delta=delta.content,
+                )
 
-                else:
+            for fragment in delta.tool_calls or []:
+                tool_call, started = completion.add_tool_call(fragment)
+                is_agent = tool_call.function.name in agent_registry
 
+                if started:
                     # Send tool message start event
-                    yield encoder.encode(
-                        ToolCallStartEvent(
-                            type=EventType.TOOL_CALL_START,
-                            parent_message_id=message_id,
-                            tool_call_id=tool_call.id,
-                            tool_call_name=tool_call.function.name,
-                        )
+                    yield ToolCallStartEvent(
+                        type=EventType.TOOL_CALL_START,
+                        parent_message_id=message_id,
+                        tool_call_id=tool_call.id,
+                        tool_call_name=(
+                            "callAgent" if is_agent else tool_call.function.name
+                        ),
                     )
 
-                    yield encoder.encode(
-                        ToolCallArgsEvent(
+                    if is_agent:
+                        yield ToolCallArgsEvent(
                             type=EventType.TOOL_CALL_ARGS,
                             tool_call_id=tool_call.id,
-                            delta=tool_call.function.arguments or "",
+                            delta=tool_call.function.name,
                         )
-                    )
 
-                # Send text message end event
-                yield encoder.encode(
-                    ToolCallEndEvent(
-                        type=EventType.TOOL_CALL_END, tool_call_id=tool_call.id
+                if not is_agent and fragment.function and fragment.function.arguments:
+                    yield ToolCallArgsEvent(
+                        type=EventType.TOOL_CALL_ARGS,
+                        tool_call_id=tool_call.id,
+                        delta=fragment.function.arguments,
                     )
-                )
 
-            if tool_responses:
-                messages.append(
-                    create_message(**stream.choices[0].message.model_dump())
-                )
-                messages.extend(tool_responses)
+        llm_request_seconds.labels(model, "chat", "llm").observe(
+            time.perf_counter() - start
+        )
 
-                stream = await client.chat.completions.create(
-                    model="gpt-4o-mini_2024-07-18",
-                    messages=messages,
-                    stream=False,
-                    tools=tools,
+        if completion.content:
+            # Send text message end event
+            yield TextMessageEndEvent(
+                type=EventType.TEXT_MESSAGE_END, message_id=message_id
+            )
+
+        # run the agent calls concurrently, client-side tool calls finish immediately
+        agent_calls: Dict[asyncio.Task, ChatCompletionMessageToolCall] = {}
+        for tool_call in completion.tool_calls:
+            if tool_call.function.name in agent_registry:
+                task = asyncio.create_task(
+                    call_agent(tool_call, message.thread_id, semaphore)
                 )
-                tool_calls = stream.choices[0].message.tool_calls
+                agent_calls[task] = tool_call
             else:
-                tool_calls = None
-
-    if stream.choices[0].message.content:
-        # Send text message start event
-        yield encoder.encode(
-            TextMessageStartEvent(
-                type=EventType.TEXT_MESSAGE_START,
-                message_id=message_id,
-                role="assistant",
-            )
-        )
-        yield encoder.encode(
-            TextMessageContentEvent(
-                type=EventType.TEXT_MESSAGE_CONTENT,
-                message_id=message_id,
-                delta=stream.choices[0].message.content or "",
-            )
-        )
+                # Send tool message end event
+                yield ToolCallEndEvent(
+                    type=EventType.TOOL_CALL_END, tool_call_id=tool_call.id
+                )
 
-        # Send text message end event
-        yield encoder.encode(
-            TextMessageEndEvent(type=EventType.TEXT_MESSAGE_END, message_id=message_id)
+        # Send tool message end events in the order the agents finish
+        responses: Dict[str, ChatCompletionToolMessageParam] = {}
+        pending = set(agent_calls)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    tool_call = agent_calls[task]
+                    responses[tool_call.id] = task.result()
+                    yield ToolCallEndEvent(
+                        type=EventType.TOOL_CALL_END, tool_call_id=tool_call.id
+                    )
+        finally:
+            for task in pending:
+                task.cancel()
+
+        if not responses:
+            break
+
+        iterations += 1
+        priority = Priority.NESTED
+
+        # return the tool responses to the model in the order of the tool calls, if we get
+        # more tool calls these will be processed in the next loop
+        messages.append(completion.message)
+        messages.extend(
+            responses[tool_call.id]
+            for tool_call in completion.tool_calls
+            if tool_call.id in responses
         )
 
+    tool_loop_iterations.labels("chat").observe(iterations)
+
     # Send run finished event
-    yield encoder.encode(
-        RunFinishedEvent(
-            type=EventType.RUN_FINISHED,
-            thread_id=message.thread_id,
-            run_id=message.run_id,
-        )
+    yield RunFinishedEvent(
+        type=EventType.RUN_FINISHED,
+        thread_id=message.thread_id,
+        run_id=message.run_id,
+    )
+
+
+async def process_message(message: RunAgentInput) -> AsyncGenerator[str, None]:
+    """Process the message using the pipeline, yielding encoded SSE events."""
+    # Create an event encoder to properly format SSE events
+    encoder = EventEncoder()
+
+    async for event in generate_events(message):
+        yield encoder.encode(event)
+
+
+@router.post("", description="Send new chat message and stream updates via SSE.")
+async def run_message(message: RunAgentInput, request: Request):
+    """Process a chat message and stream its events in the same response."""
+    encoder = EventEncoder(accept=request.headers.get("accept"))
+
+    async def stream() -> AsyncGenerator[str, None]:
+        events = generate_events(message)
+        async for event in catch_run_error(message.run_id, events):
+            yield encoder.encode(event)
+
+    return StreamingResponse(
+        observe_stream("chat", stream()), media_type=encoder.get_content_type()
     )
 
 
+@router.websocket("/ws")
+async def run_message_ws(websocket: WebSocket):
+    """Process chat messages received over a WebSocket, sending back their events.
+
+    Each message received is a `RunAgentInput` as JSON, and each message sent is an AG-UI event as
+    JSON. Runs on one connection are processed one after another.
+    """
+    await websocket.accept()
+    try:
+        while True:
+            try:
+                message = RunAgentInput.model_validate_json(
+                    await websocket.receive_text()
+                )
+            except ValidationError as err:
+                # reject the message, the connection stays open for the next one
+                error = RunErrorEvent(type=EventType.RUN_ERROR, message=str(err))
+                await websocket.send_text(
+                    error.model_dump_json(by_alias=True, exclude_none=True)
+                )
+                continue
+
+            events = generate_events(message)
+            async for event in catch_run_error(message.run_id, events):
+                await websocket.send_text(
+                    event.model_dump_json(by_alias=True, exclude_none=True)
+                )
+    except WebSocketDisconnect:
+        pass
+
+
 @router.post("/start", description="Send new chat message and start processing.")
 async def send_message(
     message: RunAgentInput,
 ):
     """Send a new chat message."""
+    # the run store and manager are created on first use, not on import
+    run_store = get_run_store("chat")
+    run_manager = get_run_manager("chat")
     # Generate a unique job id
     job_id = message.run_id
-    # Store the generator for streaming responses.
-    job_generators[job_id] = process_message(message)
+    if run_manager.settings.run_eager_start:
+        # Start processing now, buffering events until the stream is opened.
+        run_manager.start(job_id, process_message(message))
+    else:
+        # Store the run until its stream is opened.
+        await run_store.put(job_id, message.model_dump_json())
     # Return the job id to the client.
     return {"runId": job_id}
 
 
 @router.get("/stream/{runId}", description="Stream chat message updates via SSE.")
-async def stream_message(runId: str):  # noqa: N803
-    """Return an SSE stream for the provided job id."""
-    generator = job_generators.get(runId)
-    if generator is None:
-        raise HTTPException(status_code=404, detail="Job not found")
-    del job_generators[runId]
-    return StreamingResponse(generator, media_type="text/event-stream")
+async def stream_message(
+    runId: str,  # noqa: N803
+    last_event_id: Annotated[Optional[str], Header()] = None,
+):
+    """Return an SSE stream for the provided job id, resuming after `Last-Event-ID`."""
+    # the run store and manager are created on first use, not on import
+    run_store = get_run_store("chat")
+    run_manager = get_run_manager("chat")
+    resume_after = parse_last_event_id(last_event_id)
+    run = run_manager.get(runId)
+    if run is not None and not run.can_resume(resume_after):
+        raise HTTPException(
+            status_code=410, detail="Events of the job are no longer available"
+        )
+    if run is None:
+        payload = await run_store.pop(runId)
+        if payload is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        message = RunAgentInput.model_validate_json(payload)
+        run = run_manager.start(runId, process_message(message))
+
+    return StreamingResponse(
+        run.stream(resume_after),
+        media_type="text/event-stream",
+    )
@@ -1,7 +1,8 @@
 """Base classes for agents and MCP sessions."""
 
 import asyncio
-from typing import Annotated, List, Optional
+import time
+from typing import Annotated, Any, Dict, List, Optional
 from uuid import uuid4
 
 from a2a.server.agent_execution import AgentExecutor
@@ -15,16 +16,22 @@ from openai.types.chat.chat_completion_message_tool_call import (
 )
 from pydantic import Field
 
-from api.src.azure.credentials import AzureCredentials
+from api.src.azure.credentials import get_credentials
 from api.src.messages.create import (
     ChatCompletionMessageParam,
     ChatCompletionToolMessageParam,
     create_message,
 )
+from api.src.openai.cache import completion_key, get_completion_cache
 from api.src.openai.client import get_client
+from api.src.openai.scheduler import get_llm_scheduler
 from api.src.openai.tools import ChatCompletionToolParam
 from api.src.pydantic import ConfiguredBaseModel
 from api.src.tools.registry import ToolRegistry
+from api.src.utils.metrics import llm_request_seconds, llm_tokens, tool_loop_iterations
+from api.src.utils.priority import Priority, current_priority, prioritise
+from api.src.utils.singleflight import get_single_flight
+from api.src.utils.tracing import extract, span
 
 # region Base Agent
 
@@ -41,6 +48,15 @@ class BaseAgent(ConfiguredBaseModel, AgentExecutor, AgentCard):
         Optional[ToolRegistry],
         Field(description="Registry of tools available to the agent"),
     ]
+    completion_cache_ttl: Annotated[
+        Optional[float],
+        Field(
+            default=None,
+            ge=0,
+            description="Seconds the agent's completions are cached when the completion cache "
+            "is enabled, 0 disables caching for the agent (default: COMPLETION_CACHE_TTL)",
+        ),
+    ]
 
     @property
     def card(self) -> AgentCard:
@@ -54,7 +70,13 @@ class BaseAgent(ConfiguredBaseModel, AgentExecutor, AgentCard):
             self.model_dump(
                 exclude_none=True,
                 exclude_unset=True,
-                exclude={"id", "model", "instructions", "tool_registry"},
+                exclude={
+                    "id",
+                    "model",
+                    "instructions",
+                    "tool_registry",
+                    "completion_cache_ttl",
+                },
             )
         )
 
@@ -67,20 +89,64 @@ class BaseAgent(ConfiguredBaseModel, AgentExecutor, AgentCard):
         tool_choice: str | NotGiven = NOT_GIVEN,
     ) -> ChatCompletion:
 
+        request = {
+            "messages": messages,
+            "model": model,
+            "temperature": temperature,
+            "tools": tools,
+            "tool_choice": tool_choice,
+        }
+
+        start = time.perf_counter()
+
+        # only deterministic completions are cached or shared between identical requests
+        if temperature != 0:
+            completion = await self._create_completion(request)
+            llm_request_seconds.labels(model, self.id, "llm").observe(
+                time.perf_counter() - start
+            )
+            return completion
+
+        key = completion_key(**request)
+        cache = get_completion_cache()
+        cacheable = cache.enabled and self.completion_cache_ttl != 0
+        if cacheable:
+            completion = await cache.get(key)
+            if completion is not None:
+                llm_request_seconds.labels(model, self.id, "cache").observe(
+                    time.perf_counter() - start
+                )
+                return completion
+
+        completion = await get_single_flight("completions").do(
+            key, lambda: self._create_completion(request)
+        )
+        llm_request_seconds.labels(model, self.id, "llm").observe(
+            time.perf_counter() - start
+        )
+        if cacheable:
+            await cache.put(key, completion, ttl=self.completion_cache_ttl)
+        return completion
+
+    async def _create_completion(self, request: Dict[str, Any]) -> ChatCompletion:
+
         # Initialize OpenAI client
-        credentials = AzureCredentials()
         client = get_client(
             AsyncAzureOpenAI,
-            options=credentials,
+            options=get_credentials(),
         )
 
-        return await client.chat.completions.create(
-            messages=messages,
-            model=model,
-            temperature=temperature,
-            tools=tools,
-            tool_choice=tool_choice,
-        )
+        completion = await get_llm_scheduler().create_completion(client, **request)
+        # counted here, once per call, rather than for every caller sharing the completion
+        if completion.usage is not None:
+            model = request["model"]
+            llm_tokens.labels(model, self.id, "prompt").inc(
+                completion.usage.prompt_tokens
+            )
+            llm_tokens.labels(model, self.id, "completion").inc(
+                completion.usage.completion_tokens
+            )
+        return completion
 
     async def _process_tool_call(
         self, tool_call: ChatCompletionMessageToolCall
@@ -124,30 +190,38 @@ class BaseAgent(ConfiguredBaseModel, AgentExecutor, AgentCard):
         )
 
         tool_calls = response.choices[0].message.tool_calls
+        iterations = 0
+
+        # follow-up turns and tool calls are queued behind first turns
+        priority, _ = current_priority()
+        with prioritise(max(priority, Priority.NESTED)):
+            while tool_calls:
+                iterations += 1
+
+                # process the response
+                assert isinstance(tool_calls, list), "tool_calls is not a list"
+                tool_responses = await asyncio.gather(
+                    *[self._process_tool_call(tool_call) for tool_call in tool_calls]
+                )
 
-        while tool_calls:
-
-            # process the response
-            assert isinstance(tool_calls, list), "tool_calls is not a list"
-            tool_responses = await asyncio.gather(
-                *[self._process_tool_call(tool_call) for tool_call in tool_calls]
-            )
-
-            messages.append(create_message(**response.choices[0].message.model_dump()))
-            messages.extend(tool_responses)
-
-            # return the tool responses to the model, if we get more tool calls these
-            # will be processed in the next loop
-            # if we get a response it will be saved after the loop
-            response = await self._get_llm_response(
-                messages,
-                model,
-                tools=tools,
-                tool_choice=tool_choice,
-                temperature=temperature,
-            )
-            tool_calls = response.choices[0].message.tool_calls
+                messages.append(
+                    create_message(**response.choices[0].message.model_dump())
+                )
+                messages.extend(tool_responses)
+
+                # return the tool responses to the model, if we get more tool calls these
+                # will be processed in the next loop
+                # if we get a response it will be saved after the loop
+                response = await self._get_llm_response(
+                    messages,
+                    model,
+                    tools=tools,
+                    tool_choice=tool_choice,
+                    temperature=temperature,
+                )
+                tool_calls = response.choices[0].message.tool_calls
 
+        tool_loop_iterations.labels(self.id).observe(iterations)
         return Message(
             contextId=context_id,
             messageId=uuid4().hex,
@@ -175,12 +249,13 @@ class BaseAgent(ConfiguredBaseModel, AgentExecutor, AgentCard):
             ]
         )
 
-        return await self._process_message(
-            context_id=context.context_id,
-            messages=messages,
-            model=self.model,
-            tools=self.tool_registry.tools if self.tool_registry else NOT_GIVEN,
-        )
+        with span("agent.process_message", agent_id=self.id, model=self.model):
+            return await self._process_message(
+                context_id=context.context_id,
+                messages=messages,
+                model=self.model,
+                tools=self.tool_registry.tools if self.tool_registry else NOT_GIVEN,
+            )
 
     async def execute(self, context: RequestContext, event_queue: EventQueue):
         """Execute the agent's main logic using the provided context, then enqueues the result as an event.
@@ -198,7 +273,9 @@ class BaseAgent(ConfiguredBaseModel, AgentExecutor, AgentCard):
             Any exceptions raised by the `invoke` method.
 
         """
-        result = await self.invoke(context=context)
+        # continue the trace of the caller, which may be in another process
+        with extract(context.message.metadata if context.message else None):
+            result = await self.invoke(context=context)
         event_queue.enqueue_event(result)
 
     async def cancel(self, context: RequestContext, event_queue: EventQueue):
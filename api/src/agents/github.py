@@ -1,12 +1,17 @@
 """GitHub MCP Agent using GitHub MCP Server."""
 
+import shlex
+from functools import lru_cache
+from typing import Dict, Optional
+
 from a2a.types import AgentCapabilities, AgentSkill
 from mcp.client.stdio import StdioServerParameters
-from pydantic import SecretStr
+from pydantic import HttpUrl, SecretStr
 
 from api.src.agents.base import BaseAgent
 from api.src.mcp.base import BaseHttpMcpSession
 from api.src.settings import ConfiguredBaseSettings
+from api.src.tools.cache import ToolCachePolicy
 from api.src.tools.registry import ToolRegistry
 
 
@@ -18,20 +23,52 @@ class GitHubMcpSettings(ConfiguredBaseSettings):
 
     use_stdio: bool = True
 
+    github_mcp_url: HttpUrl = HttpUrl("https://api.githubcopilot.com/mcp/")
+    """URL of the GitHub MCP server, used when `use_stdio` is False"""
+
+    github_mcp_stdio_command: Optional[str] = None
+    """Command line of the stdio MCP server, replacing the GitHub MCP server's docker image"""
 
-settings = GitHubMcpSettings()
 
-stdio_params = StdioServerParameters(
-    command="docker",
-    args=[
-        "run",
-        "-i",
-        "--rm",
-        "-e",
-        f"GITHUB_PERSONAL_ACCESS_TOKEN={settings.github_token.get_secret_value()}",
-        "ghcr.io/github/github-mcp-server",
-    ],
-)
+@lru_cache(maxsize=1)
+def get_github_settings() -> GitHubMcpSettings:
+    """Get the settings for the GitHub MCP Agent, read from the environment on first use.
+
+    Returns:
+        GitHubMcpSettings: The GitHub MCP settings.
+
+    """
+    return GitHubMcpSettings()
+
+
+def get_stdio_params(settings: GitHubMcpSettings) -> StdioServerParameters:
+    """Get the parameters for running the GitHub MCP server in docker.
+
+    If `GITHUB_MCP_STDIO_COMMAND` is set that command is run instead, e.g. a fake server for
+    benchmarks.
+
+    Args:
+        settings (GitHubMcpSettings): The GitHub MCP settings.
+
+    Returns:
+        StdioServerParameters: The parameters for the stdio MCP server.
+
+    """
+    if settings.github_mcp_stdio_command:
+        command, *args = shlex.split(settings.github_mcp_stdio_command)
+        return StdioServerParameters(command=command, args=args)
+
+    return StdioServerParameters(
+        command="docker",
+        args=[
+            "run",
+            "-i",
+            "--rm",
+            "-e",
+            f"GITHUB_PERSONAL_ACCESS_TOKEN={settings.github_token.get_secret_value()}",
+            "ghcr.io/github/github-mcp-server",
+        ],
+    )
 
 
 async def create_github_agent(
@@ -42,7 +79,8 @@ async def create_github_agent(
     skills: list[AgentSkill] = None,
     allowed_tools: set[str] = None,
     model: str = "gpt-4o-mini_2024-07-18",
-    use_stdio: bool = settings.use_stdio,
+    use_stdio: Optional[bool] = None,
+    cached_tools: Optional[Dict[str, ToolCachePolicy]] = None,
 ) -> BaseAgent:
     """Create and configures a GitHub agent with specified parameters.
 
@@ -57,7 +95,11 @@ async def create_github_agent(
             Defaults to None.
         model (str, optional): The model identifier to use for the agent. Defaults to
             "gpt-4o-mini_2024-07-18".
-        use_stdio (bool, optional): Whether to use stdio for communication. Defaults to True.
+        use_stdio (Optional[bool], optional): Whether to use stdio for communication. When False
+            the streamable HTTP server at `GITHUB_MCP_URL` is used. Defaults to None, using the
+            `USE_STDIO` setting.
+        cached_tools (Optional[Dict[str, ToolCachePolicy]], optional): Cache policies for read-only
+            tools, by tool name. Defaults to None.
 
     Returns:
         BaseAgent: An instance of the configured GitHub agent.
@@ -66,17 +108,23 @@ async def create_github_agent(
         Any exceptions raised during tool registration or agent creation.
 
     """
+    settings = get_github_settings()
+    if use_stdio is None:
+        use_stdio = settings.use_stdio
+
     agent_id = name.lower().replace(" ", "-")
 
     tool_registry = ToolRegistry()
 
     github_mcp = BaseHttpMcpSession(
         session_id=f"{agent_id}-github-mcp-session",
-        stdio_parameters=stdio_params,
+        stdio_parameters=get_stdio_params(settings),
+        url=settings.github_mcp_url,
+        headers={"Authorization": f"Bearer {settings.github_token.get_secret_value()}"},
         use_stdio=use_stdio,
     )
 
-    await tool_registry.register_mcp_server(github_mcp, allowed_tools)
+    await tool_registry.register_mcp_server(github_mcp, allowed_tools, cached_tools)
 
     return BaseAgent(
         capabilities=AgentCapabilities(
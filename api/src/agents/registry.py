@@ -1,6 +1,8 @@
 """Agent Registry Module."""
 
-from typing import Any, Dict, List, Union, overload
+import logging
+from enum import Enum
+from typing import Any, Awaitable, Dict, List, Optional, Union, overload
 from uuid import uuid4
 
 from a2a.server.agent_execution.context import RequestContext
@@ -10,9 +12,19 @@ from pydantic import BeforeValidator, Field
 from typing_extensions import Annotated
 
 from api.src.agents.base import BaseAgent
-from api.src.openai.tools import ChatCompletionToolParam, create_tool
+from api.src.openai.tools import ChatCompletionToolParam, ToolManifest, create_tool
 from api.src.pydantic import ConfiguredBaseModel
+from api.src.utils.metrics import (
+    metrics,
+    tool_cache_entries,
+    tool_cache_invalidations,
+    tool_cache_lookups,
+    tool_cache_revalidations,
+)
 from api.src.utils.options import validate_options
+from api.src.utils.tracing import inject, span
+
+logger = logging.getLogger(__name__)
 
 
 class AgentParameters(ConfiguredBaseModel):
@@ -45,6 +57,34 @@ class A2AOptions(AgentParameters):
     ]
 
 
+class AgentState(str, Enum):
+    """Warm-up state of an agent."""
+
+    INITIALISING = "initialising"
+    """The agent is being created"""
+    WARMING = "warming"
+    """The agent is serving tools from a cached manifest which is being revalidated"""
+    READY = "ready"
+    """The agent is ready"""
+    FAILED = "failed"
+    """The agent could not be created"""
+
+
+class AgentStatus(ConfiguredBaseModel):
+    """Warm-up status of an agent."""
+
+    name: Annotated[str, Field(description="Name of the agent.")]
+    id: Annotated[
+        Optional[str],
+        Field(default=None, description="ID of the agent, once registered."),
+    ]
+    state: Annotated[AgentState, Field(description="Warm-up state of the agent.")]
+    error: Annotated[
+        Optional[str],
+        Field(default=None, description="Why the agent could not be created."),
+    ]
+
+
 class AgentRegistry:
     """Singleton registry for managing agents."""
 
@@ -60,6 +100,10 @@ class AgentRegistry:
         """Initialize the AgentRegistry with an empty agents dictionary."""
         if not hasattr(self, "_agents"):
             self._agents: Dict[str, BaseAgent] = {}
+            # agents being created, or which could not be created, by name
+            self._pending: Dict[str, AgentStatus] = {}
+            self._version = 0
+            self._manifest: Optional[ToolManifest] = None
 
     def __iter__(self):
         """Return an iterator over the registered agents."""
@@ -92,6 +136,71 @@ class AgentRegistry:
 
         """
         self._agents[agent.id] = agent
+        self._invalidate()
+
+    async def initialise(
+        self, name: str, factory: Awaitable[BaseAgent]
+    ) -> Optional[BaseAgent]:
+        """Create an agent and register it, tracking its state while it is created.
+
+        Failures are logged and reported by `status` rather than raised, so one agent failing to
+        start does not prevent the others from being served.
+
+        Args:
+            name (str): The name of the agent.
+            factory (Awaitable[BaseAgent]): Awaitable creating the agent.
+
+        Returns:
+            Optional[BaseAgent]: The registered agent, or None if it could not be created.
+
+        """
+        self._pending[name] = AgentStatus(name=name, state=AgentState.INITIALISING)
+        try:
+            agent = await factory
+        except Exception as err:  # pylint: disable=broad-exception-caught
+            logger.exception("Unable to initialise the %s agent", name)
+            self._pending[name] = AgentStatus(
+                name=name, state=AgentState.FAILED, error=str(err)
+            )
+            return None
+
+        del self._pending[name]
+        self.register(agent)
+        return agent
+
+    @property
+    def status(self) -> List[AgentStatus]:
+        """Return the warm-up status of every agent, including those not yet registered."""
+        statuses = list(self._pending.values())
+        for agent in self._agents.values():
+            warming = (
+                agent.tool_registry is not None and agent.tool_registry.revalidating
+            )
+            statuses.append(
+                AgentStatus(
+                    name=agent.name,
+                    id=agent.id,
+                    state=AgentState.WARMING if warming else AgentState.READY,
+                )
+            )
+        return statuses
+
+    def unregister(self, id: str):
+        """Remove an agent from the registry.
+
+        Args:
+            id (str): The id of the agent to remove.
+
+        Raises:
+            KeyError: If no agent is registered under the given id.
+
+        """
+        del self._agents[id]
+        self._invalidate()
+
+    def _invalidate(self):
+        self._version += 1
+        self._manifest = None
 
     def list_agents(self) -> Dict[str, BaseAgent]:
         """Return a dictionary mapping agent names to their corresponding agent classes.
@@ -151,49 +260,79 @@ class AgentRegistry:
             options, A2AOptions
         ), "Options must be an instance of A2AOptions"
 
-        message = Message(
-            messageId=options.message_id,
-            role=options.role,
-            contextId=options.thread_id,
-            parts=[
-                Part(
-                    root=TextPart(
-                        kind="text",
-                        text=options.text,
+        # the message carries this span's context to the agent
+        with span("agent.execute", agent_id=id, thread_id=options.thread_id):
+            message = Message(
+                messageId=options.message_id,
+                role=options.role,
+                contextId=options.thread_id,
+                metadata=inject({}) or None,
+                parts=[
+                    Part(
+                        root=TextPart(
+                            kind="text",
+                            text=options.text,
+                        )
                     )
-                )
-            ],
-        )
-
-        context = RequestContext(
-            request=MessageSendParams(message=message), context_id=options.thread_id
-        )
-
-        agent_cls = self.get_agent(id)
-        await agent_cls.execute(
-            context=context,
-            event_queue=queue,
-        )
+                ],
+            )
+
+            context = RequestContext(
+                request=MessageSendParams(message=message), context_id=options.thread_id
+            )
+
+            agent_cls = self.get_agent(id)
+            await agent_cls.execute(
+                context=context,
+                event_queue=queue,
+            )
         await queue.close()
 
+    @property
+    def manifest(self) -> ToolManifest:
+        """Return the manifest of agents as tools, built when the agents last changed."""
+        if self._manifest is None:
+            self._manifest = ToolManifest.build(
+                self._version,
+                [
+                    create_tool(
+                        name=agent.id,
+                        description=agent.description,
+                        parameters=AgentParameters,
+                        strict=True,
+                    )
+                    for agent in self._agents.values()
+                ],
+            )
+        return self._manifest
+
     @property
     def agents_as_tools(self) -> List[ChatCompletionToolParam]:
-        """Return a dictionary of agents that can be used as tools.
+        """Return the tool definitions for calling the registered agents.
 
         Returns:
-            Dict[str, BaseAgent]: A dictionary where the keys are agent ids and the values are
-            the agent classes that can be used as tools.
+            List[ChatCompletionToolParam]: A tool definition for each registered agent, taking the
+            text to be processed by the agent.
 
         """
-        return [
-            create_tool(
-                name=agent.id,
-                description=agent.description,
-                parameters=AgentParameters,
-                strict=True,
-            )
-            for agent in self._agents.values()
-        ]
+        return list(self.manifest.tools)
 
 
 agent_registry = AgentRegistry()
+
+
+@metrics.collector
+def collect_tool_cache_metrics() -> None:
+    """Set the tool result cache metrics from the statistics of each agent's tools."""
+    # counters keep the totals of removed tools, only the entries of current tools are reported
+    tool_cache_entries.clear()
+    for agent in agent_registry:
+        if agent.tool_registry is None:
+            continue
+        for tool, stats in agent.tool_registry.cache_stats().items():
+            tool_cache_lookups.labels(agent.id, tool, "hit").set(stats.hits)
+            tool_cache_lookups.labels(agent.id, tool, "stale").set(stats.stale_hits)
+            tool_cache_lookups.labels(agent.id, tool, "miss").set(stats.misses)
+            tool_cache_revalidations.labels(agent.id, tool).set(stats.revalidations)
+            tool_cache_invalidations.labels(agent.id, tool).set(stats.invalidations)
+            tool_cache_entries.labels(agent.id, tool).set(stats.entries)
@@ -1,12 +1,22 @@
 """Function for authenticating with Azure."""
 
-from typing import Annotated, Any, Optional
+import asyncio
+import logging
+import time
+from functools import lru_cache
+from typing import TYPE_CHECKING, Annotated, Any, Optional
 
-from azure.identity import ClientSecretCredential
 from pydantic import Field, SecretStr, model_serializer
 
 from api.src.settings import ConfiguredBaseSettings
 
+if TYPE_CHECKING:
+    # azure.identity is slow to import, it is only loaded when a token is first requested
+    from azure.core.credentials import AccessToken
+    from azure.identity import ClientSecretCredential
+
+logger = logging.getLogger(__name__)
+
 
 class AzureCredentials(ConfiguredBaseSettings):
     """Azure credentials."""
@@ -27,6 +37,12 @@ class AzureCredentials(ConfiguredBaseSettings):
     openai_api_version: Annotated[
         Optional[str], Field(serialization_alias="api_version")
     ] = None
+    openai_api_key: Optional[SecretStr] = None
+    """API key used instead of an Azure AD token when no service principal is set, e.g. for a
+    local fake server"""
+
+    azure_token_refresh_margin: float = 300.0
+    """Seconds before expiry at which the access token is refreshed in the background"""
 
     @property
     def api_key(self) -> SecretStr:
@@ -51,13 +67,32 @@ class AzureCredentials(ConfiguredBaseSettings):
 
         raise ValueError("Credentials must be set")
 
-    def _get_credentials(self) -> ClientSecretCredential:
+    @property
+    def use_api_key(self) -> bool:
+        """Whether requests authenticate with `OPENAI_API_KEY` rather than an Azure AD token."""
+        return self.openai_api_key is not None and not all(
+            [self.azure_client_id, self.azure_client_secret, self.azure_tenant_id]
+        )
+
+    @property
+    def token_provider(self) -> "AzureTokenProvider":
+        """Get the process-wide token provider for these credentials.
+
+        Returns
+            token_provider: The cached `AzureTokenProvider` for these credentials.
+
+        """
+        return get_token_provider(self)
+
+    def _get_credentials(self) -> "ClientSecretCredential":
         """Get the credentials for the Azure Blob Storage account.
 
         Returns
             credentials: The credentials for the Azure Blob Storage account.
 
         """
+        from azure.identity import ClientSecretCredential
+
         if all(
             [
                 self.azure_client_id,
@@ -103,6 +138,7 @@ class AzureCredentials(ConfiguredBaseSettings):
                 self.azure_tenant_id,
                 self.openai_api_base,
                 self.openai_api_version,
+                self.openai_api_key,
             )
         )
 
@@ -111,7 +147,8 @@ class AzureCredentials(ConfiguredBaseSettings):
         """Serialize the credential attributes to a dictionary.
 
         Returns:
-            dict: A dictionary containing the Azure endpoint, API version, and API key.
+            dict: A dictionary containing the Azure endpoint, API version, and either the API key
+                or the Azure AD token provider.
 
         """
         attrs = {
@@ -119,5 +156,147 @@ class AzureCredentials(ConfiguredBaseSettings):
             "api_version": self.openai_api_version,
         }
 
-        attrs["api_key"] = self.api_key.get_secret_value()
+        if self.use_api_key:
+            attrs["api_key"] = self.openai_api_key.get_secret_value()
+        else:
+            attrs["azure_ad_token_provider"] = self.token_provider
         return attrs
+
+
+@lru_cache(maxsize=1)
+def get_credentials() -> AzureCredentials:
+    """Create and returns the Azure credentials for the process.
+
+    Returns:
+        AzureCredentials: The Azure credentials loaded from the environment.
+
+    """
+    return AzureCredentials()
+
+
+class AzureTokenProvider:
+    """Process-wide Azure AD token provider with proactive background refresh.
+
+    The token is kept in memory and refreshed in the background `refresh_margin` seconds before it
+    expires, so requests never wait on a token fetch once the provider has been started. Concurrent
+    refreshes share a single fetch, and the blocking `get_token` call runs in a worker thread so it
+    never blocks the event loop.
+
+    Instances are awaitable callables suitable for the `azure_ad_token_provider` argument of
+    `AsyncAzureOpenAI`.
+    """
+
+    retry_interval: float = 10.0
+    """Seconds to wait before retrying a failed background refresh"""
+
+    min_validity: float = 30.0
+    """Seconds a cached token must remain valid for to be returned without a fetch"""
+
+    def __init__(self, credentials: AzureCredentials):
+        self._credentials = credentials
+        self._credential: Optional["ClientSecretCredential"] = None
+        self._token: Optional["AccessToken"] = None
+        self._fetch: Optional[asyncio.Task] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    async def __call__(self) -> str:
+        """Return a valid access token, fetching one only if the cached token has expired.
+
+        Returns:
+            str: The access token.
+
+        """
+        token = self._token
+        if token is None or token.expires_on - time.time() < self.min_validity:
+            token = await self.refresh()
+        return token.token
+
+    async def __aenter__(self) -> "AzureTokenProvider":
+        """Start the provider, fetching the first token ahead of any request."""
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        """Stop the background refresh."""
+        self.close()
+
+    async def start(self) -> None:
+        """Fetch the first token and schedule the background refresh.
+
+        Failures are logged rather than raised so the application can still start; the token
+        will then be fetched on the first request instead. Nothing is fetched when the credentials
+        use an API key.
+        """
+        if self._credentials.use_api_key:
+            return
+
+        try:
+            await self.refresh()
+        except Exception as err:  # pylint: disable=broad-exception-caught
+            logger.warning("Unable to fetch an Azure AD token: %s", err)
+
+    def close(self) -> None:
+        """Cancel the background refresh."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    async def refresh(self) -> "AccessToken":
+        """Fetch a new token, sharing the fetch with any concurrent callers.
+
+        Returns:
+            AccessToken: The new access token.
+
+        """
+        if self._fetch is None or self._fetch.done():
+            self._fetch = asyncio.create_task(self._get_token())
+        return await asyncio.shield(self._fetch)
+
+    async def _get_token(self) -> "AccessToken":
+        if self._credentials.azure_scope is None:
+            raise ValueError("Azure scope must be set to get the API key")
+        if self._credential is None:
+            self._credential = self._credentials._get_credentials()
+
+        token = await asyncio.to_thread(
+            self._credential.get_token, self._credentials.azure_scope
+        )
+        self._token = token
+
+        margin = self._credentials.azure_token_refresh_margin
+        self._schedule(max(token.expires_on - time.time() - margin, 0))
+        return token
+
+    def _schedule(self, delay: float) -> None:
+        self.close()
+        self._timer = asyncio.get_running_loop().call_later(
+            delay, self._refresh_in_background
+        )
+
+    def _refresh_in_background(self) -> None:
+        task = asyncio.create_task(self.refresh())
+
+        def _done(task: asyncio.Task) -> None:
+            if task.cancelled():
+                return
+            if task.exception() is not None:
+                logger.warning(
+                    "Background Azure AD token refresh failed: %s", task.exception()
+                )
+                self._schedule(self.retry_interval)
+
+        task.add_done_callback(_done)
+
+
+@lru_cache(maxsize=8)
+def get_token_provider(credentials: AzureCredentials) -> AzureTokenProvider:
+    """Get the process-wide token provider for the given credentials.
+
+    Args:
+        credentials (AzureCredentials): The credentials to fetch tokens with.
+
+    Returns:
+        AzureTokenProvider: The token provider shared by every client using these credentials.
+
+    """
+    return AzureTokenProvider(credentials)
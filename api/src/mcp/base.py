@@ -1,17 +1,40 @@
 """Base classes for agents and MCP sessions."""
 
+import copy
 import json
-from typing import Annotated, Any, Dict, List, Optional, Union, overload
+import time
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import (
+    Annotated,
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Dict,
+    List,
+    Optional,
+    Union,
+    overload,
+)
 
 from mcp import ClientSession
 from mcp.client.stdio import StdioServerParameters, stdio_client
+from mcp.client.streamable_http import streamablehttp_client
 from mcp.types import CallToolResult, ListToolsResult
+from openai.types.chat.chat_completion_tool_param import ChatCompletionToolParam
 from pydantic import BaseModel, Field, HttpUrl
 
+from api.src.mcp.pool import McpSessionPool, SharedHttpClient, get_mcp_session_manager
 from api.src.messages.create import ChatCompletionToolMessageParam
-from api.src.pydantic import ConfiguredBaseModel
-from api.src.tools.base import BaseTool, BaseToolOptions
+from api.src.openai.tools import create_tool, strict_json_schema
+from api.src.pydantic import ConfiguredBaseModel, model_from_schema
+from api.src.tools.base import BaseTool, BaseToolOptions, ToolCallContext
+from api.src.tools.cache import ToolResultCache
+from api.src.utils.cassette import cassette_key, get_cassette
+from api.src.utils.metrics import mcp_call_errors, mcp_call_seconds
 from api.src.utils.options import validate_options
+from api.src.utils.singleflight import get_single_flight
+from api.src.utils.tracing import span
 
 # region MCP Session
 
@@ -32,6 +55,13 @@ class BaseHttpMcpSession(ConfiguredBaseModel):
     url: Annotated[
         Optional[HttpUrl], Field(default=None, description="The URL of the MCP server")
     ]
+    headers: Annotated[
+        Optional[Dict[str, str]],
+        Field(
+            default=None,
+            description="Headers to send with HTTP requests to the MCP server",
+        ),
+    ]
     use_stdio: Annotated[
         bool,
         Field(
@@ -39,13 +69,90 @@ class BaseHttpMcpSession(ConfiguredBaseModel):
             description="Whether to use stdio for MCP communication (default: False)",
         ),
     ]
+    pool_size: Annotated[
+        Optional[int],
+        Field(
+            default=None,
+            ge=1,
+            description="Maximum number of pooled sessions for the MCP server (default: "
+            "MCP_POOL_SIZE)",
+        ),
+    ]
+
+    @property
+    def pool_key(self) -> str:
+        """Return the key identifying this MCP server in the session manager."""
+        if self.session_id:
+            return self.session_id
+        if self.use_stdio and self.stdio_parameters:
+            return " ".join(
+                [self.stdio_parameters.command, *self.stdio_parameters.args]
+            )
+        return str(self.url)
+
+    @property
+    def server_label(self) -> str:
+        """Return the name of this MCP server in metrics, which leaves out the stdio arguments."""
+        if self.session_id:
+            return self.session_id
+        if self.use_stdio and self.stdio_parameters:
+            return self.stdio_parameters.command
+        return str(self.url)
+
+    @property
+    def pool(self) -> McpSessionPool:
+        """Return the pool of long-lived sessions for this MCP server."""
+        return get_mcp_session_manager().pool(
+            self.pool_key,
+            self._open_session_stdio if self.use_stdio else self._open_session_http,
+            self.pool_size,
+            label=self.server_label,
+        )
+
+    @asynccontextmanager
+    async def _open_session_stdio(self) -> AsyncIterator[ClientSession]:
+
+        assert (
+            self.stdio_parameters
+        ), "Stdio parameters must be set for stdio communication"
+
+        async with stdio_client(self.stdio_parameters) as (read, write):
+
+            async with ClientSession(read, write) as session:
+                # Send JSON-RPC initialize over the pipe
+                await session.initialize()
+
+                yield session
+
+    @asynccontextmanager
+    async def _open_session_http(self) -> AsyncIterator[ClientSession]:
+
+        assert self.url, "URL must be set for HTTP communication"
+
+        manager = get_mcp_session_manager()
+        settings = manager.settings
+        http_client = SharedHttpClient(manager.http_client(self.pool_key))
+
+        async with streamablehttp_client(
+            str(self.url),
+            headers=self.headers,
+            timeout=settings.mcp_http_timeout,
+            sse_read_timeout=settings.mcp_http_read_timeout,
+            httpx_client_factory=http_client,
+        ) as (read, write, _):
+
+            async with ClientSession(read, write) as session:
+                # Send JSON-RPC initialize over HTTP
+                await session.initialize()
+
+                yield session
 
     @validate_options(BaseToolOptions)
     async def call_tool(self, name: str, tool_args: Dict[str, Any]) -> CallToolResult:
         """Call a tool by its name with the provided arguments.
 
         Depending on the configuration, this method will either use standard I/O or HTTP to
-        communicate with the tool.
+        communicate with the tool. When `CASSETTE_MODE` is set the call is recorded or replayed.
 
         Args:
             name (str): The name of the tool to call.
@@ -59,6 +166,31 @@ class BaseHttpMcpSession(ConfiguredBaseModel):
             Exception: If the tool call fails or encounters an error.
 
         """
+        with span("mcp.call_tool", server=self.server_label, tool=name):
+            start = time.perf_counter()
+            failed = True
+            try:
+                cassette = get_cassette()
+                if cassette.mode != "off":
+                    result = await cassette.call(
+                        "call_tool",
+                        name,
+                        cassette_key(self.pool_key, name, tool_args),
+                        partial(self._call_tool, name, tool_args),
+                        CallToolResult,
+                    )
+                else:
+                    result = await self._call_tool(name, tool_args)
+                failed = result.isError
+                return result
+            finally:
+                mcp_call_seconds.labels(self.server_label, name).observe(
+                    time.perf_counter() - start
+                )
+                if failed:
+                    mcp_call_errors.labels(self.server_label, name).inc()
+
+    async def _call_tool(self, name: str, tool_args: Dict[str, Any]) -> CallToolResult:
         if self.use_stdio:
             return await self._call_tool_stdio(name, tool_args)
         else:
@@ -68,25 +200,19 @@ class BaseHttpMcpSession(ConfiguredBaseModel):
 
     async def _call_tool_stdio(self, name: str, tool_args: Dict[str, Any]) -> Any:
 
-        assert (
-            self.stdio_parameters
-        ), "Stdio parameters must be set for stdio communication"
-
-        async with stdio_client(self.stdio_parameters) as (read, write):
-
-            async with ClientSession(read, write) as session:
-                # Send JSON-RPC initialize over the pipe
-                await session.initialize()
-
-                return await session.call_tool(
-                    name=name,
-                    arguments=tool_args,
-                )
+        async with self.pool.session() as session:
+            return await session.call_tool(
+                name=name,
+                arguments=tool_args,
+            )
 
     async def _call_tool_http(self, name: str, tool_args: Dict[str, Any]) -> Any:
-        raise NotImplementedError(
-            "HTTP tool calls are not implemented in BaseHttpMcpSession."
-        )
+
+        async with self.pool.session() as session:
+            return await session.call_tool(
+                name=name,
+                arguments=tool_args,
+            )
 
     async def list_tools(self) -> List[ListToolsResult]:
         """Retrieve a list of available tools.
@@ -99,6 +225,18 @@ class BaseHttpMcpSession(ConfiguredBaseModel):
                 are fetched using the stdio method; otherwise, they are fetched via HTTP.
 
         """
+        cassette = get_cassette()
+        if cassette.mode != "off":
+            return await cassette.call(
+                "list_tools",
+                self.pool_key,
+                cassette_key(self.pool_key),
+                self._list_tools,
+                ListToolsResult,
+            )
+        return await self._list_tools()
+
+    async def _list_tools(self) -> List[ListToolsResult]:
         if self.use_stdio:
             return await self._list_tools_stdio() or []
         else:
@@ -108,23 +246,13 @@ class BaseHttpMcpSession(ConfiguredBaseModel):
 
     async def _list_tools_stdio(self):
 
-        assert (
-            self.stdio_parameters
-        ), "Stdio parameters must be set for stdio communication"
-
-        async with stdio_client(self.stdio_parameters) as (read, write):
-
-            async with ClientSession(read, write) as session:
-                # Send JSON-RPC initialize over the pipe
-                await session.initialize()
-
-                return await session.list_tools()
+        async with self.pool.session() as session:
+            return await session.list_tools()
 
     async def _list_tools_http(self):
         """Retrieve a list of tools using HTTP."""
-        raise NotImplementedError(
-            "HTTP tool retrieval is not implemented in BaseHttpMcpSession."
-        )
+        async with self.pool.session() as session:
+            return await session.list_tools()
 
 
 # endregion MCP Session
@@ -149,15 +277,51 @@ class MCPTool(BaseTool):
         session: BaseHttpMcpSession,
         name: str,
         description: str,
-        tool_call_schema: type[BaseModel],
+        tool_call_schema: Union[type[BaseModel], Dict[str, Any]],
         strict: Optional[bool] = True,
     ):
-        """Initialize the MCP tool with a session, name, and description."""
+        """Initialize the MCP tool with a session, name, and description.
+
+        `tool_call_schema` may be the tool's JSON input schema, in which case its model is only
+        built the first time the tool is used, and its card is built from the schema.
+        """
         self.session = session
         self.name = name
         self.description = description
-        self.tool_call_schema = tool_call_schema
+        self._tool_call_schema = tool_call_schema
+        self._input_schema = (
+            tool_call_schema if isinstance(tool_call_schema, dict) else None
+        )
         self.strict = strict
+        self.cache: Optional[ToolResultCache] = None
+        """Cache of the tool's results, set by the registry for read-only tools"""
+        self.invalidates: List[ToolResultCache] = []
+        """Caches cleared when the tool is called successfully"""
+
+    @property
+    def tool_call_schema(self) -> type[BaseModel]:
+        """Return the model for the tool's arguments, building it on first use."""
+        if isinstance(self._tool_call_schema, dict):
+            self._tool_call_schema = model_from_schema(
+                self.name, self._tool_call_schema
+            )
+        return self._tool_call_schema
+
+    @property
+    def card(self) -> ChatCompletionToolParam:
+        """Return the tool card, built from the input schema without building the model."""
+        if self._input_schema is None:
+            return super().card
+        return create_tool(
+            self.name,
+            self.description,
+            (
+                strict_json_schema(self._input_schema)
+                if self.strict
+                else copy.deepcopy(self._input_schema)
+            ),
+            strict=self.strict,
+        )
 
     @overload
     async def run(self, options: BaseToolOptions) -> ChatCompletionToolMessageParam: ...
@@ -171,18 +335,40 @@ class MCPTool(BaseTool):
     ) -> ChatCompletionToolMessageParam:
         """Invoke the tool asynchronously."""
         assert isinstance(options, BaseToolOptions), "options is not a BaseToolOptions"
-        result = self.initialise_tool_call(options=options)
-        if result:
-            return result
+        with span("tool.run", tool=self.name):
+            return await self._run(options)
+
+    async def _run(self, options: BaseToolOptions) -> ChatCompletionToolMessageParam:
+        # the call's state lives in its own context, so concurrent calls never share it
+        context = self.initialise_tool_call(options=options)
+        if not isinstance(context, ToolCallContext):
+            return context
+
+        def call() -> Awaitable[CallToolResult]:
+            return self.session.call_tool(
+                name=self.name,
+                tool_args=context.args.model_dump(
+                    exclude_none=True, exclude_unset=True
+                ),
+            )
 
-        result = await self.session.call_tool(
-            name=self.name,
-            tool_args=self._tool_args.model_dump(exclude_none=True, exclude_unset=True),
-        )
+        if self.cache is not None:
+            # the tool is read-only, so identical calls in flight can share one request
+            key = self.cache.key(context.args)
+            flights = get_single_flight("mcp_tools")
+            result = await self.cache.get_or_call(
+                key,
+                lambda: flights.do((self.session.pool_key, self.name, key), call),
+            )
+        else:
+            result = await call()
+            if result is not None and not result.isError:
+                for cache in self.invalidates:
+                    cache.invalidate()
 
         if result is None or result.isError:
             return ChatCompletionToolMessageParam(
-                tool_call_id=self._tool_call_id,
+                tool_call_id=context.tool_call_id,
                 role="tool",
                 content=(
                     "Tool call failed: " + result.content[0].text
@@ -192,7 +378,7 @@ class MCPTool(BaseTool):
             )
 
         return ChatCompletionToolMessageParam(
-            tool_call_id=self._tool_call_id,
+            tool_call_id=context.tool_call_id,
             role="tool",
             content=json.dumps([content.model_dump() for content in result.content]),
         )
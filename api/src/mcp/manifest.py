@@ -0,0 +1,99 @@
+"""On-disk cache of the tools advertised by MCP servers."""
+
+import asyncio
+import hashlib
+import logging
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+from mcp.types import ListToolsResult
+from pydantic import ValidationError
+
+from api.src.settings import ConfiguredBaseSettings
+
+logger = logging.getLogger(__name__)
+
+
+class McpManifestSettings(ConfiguredBaseSettings):
+    """Settings for the MCP tool manifest cache."""
+
+    mcp_manifest_cache: bool = True
+    """Whether the tools listed by MCP servers are cached on disk to warm later starts"""
+    mcp_manifest_cache_path: Path = Path(".jarvis/manifests")
+    """Directory holding the cached tool manifests"""
+
+
+class McpManifestCache:
+    """Cache of `list_tools` results, stored as one JSON file per MCP server.
+
+    A cached manifest lets the tools of a server be registered without waiting for the server to
+    start; the caller is expected to revalidate it against the server in the background.
+    """
+
+    def __init__(self, settings: McpManifestSettings):
+        self.enabled = settings.mcp_manifest_cache
+        self.path = settings.mcp_manifest_cache_path
+
+    def _file(self, key: str) -> Path:
+        return self.path / f"{hashlib.sha256(key.encode()).hexdigest()[:32]}.json"
+
+    def _load(self, key: str) -> Optional[ListToolsResult]:
+        try:
+            return ListToolsResult.model_validate_json(self._file(key).read_bytes())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValidationError) as err:
+            logger.warning("Ignoring unreadable tool manifest for %s: %s", key, err)
+            return None
+
+    def _save(self, key: str, tools: ListToolsResult) -> None:
+        self.path.mkdir(parents=True, exist_ok=True)
+        file = self._file(key)
+        # write then rename so concurrent readers never see a partial manifest
+        temp = file.with_suffix(f".{os.getpid()}.tmp")
+        # by alias, so fields such as `_meta` load back as they were listed
+        temp.write_text(tools.model_dump_json(by_alias=True, exclude_none=True))
+        temp.replace(file)
+
+    async def load(self, key: str) -> Optional[ListToolsResult]:
+        """Load the cached tools of an MCP server.
+
+        Args:
+            key (str): The key identifying the MCP server.
+
+        Returns:
+            Optional[ListToolsResult]: The cached tools, or None if there are none or the cache is
+                disabled.
+
+        """
+        if not self.enabled:
+            return None
+        return await asyncio.to_thread(self._load, key)
+
+    async def save(self, key: str, tools: ListToolsResult) -> None:
+        """Cache the tools of an MCP server.
+
+        Args:
+            key (str): The key identifying the MCP server.
+            tools (ListToolsResult): The tools listed by the server.
+
+        """
+        if not self.enabled:
+            return
+        try:
+            await asyncio.to_thread(self._save, key, tools)
+        except OSError as err:
+            logger.warning("Unable to cache tool manifest for %s: %s", key, err)
+
+
+@lru_cache(maxsize=1)
+def get_manifest_cache() -> McpManifestCache:
+    """Get the MCP tool manifest cache.
+
+    Returns:
+        McpManifestCache: The manifest cache, configured from the environment.
+
+    """
+    return McpManifestCache(McpManifestSettings())
@@ -0,0 +1,505 @@
+"""Long-lived, pooled MCP client sessions."""
+
+import asyncio
+import importlib.util
+import logging
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import (
+    AsyncContextManager,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+import anyio
+import httpx
+from mcp import ClientSession
+from mcp.shared.exceptions import McpError
+from mcp.types import CONNECTION_CLOSED
+
+from api.src.settings import ConfiguredBaseSettings
+from api.src.utils.metrics import mcp_sessions_open, metrics
+from api.src.utils.priority import (
+    PriorityLimiter,
+    PriorityStats,
+    set_priority_metrics,
+)
+
+logger = logging.getLogger(__name__)
+
+SessionOpener = Callable[[], AsyncContextManager[ClientSession]]
+"""Factory returning a context manager which yields an initialised `ClientSession`."""
+
+
+class McpPoolSettings(ConfiguredBaseSettings):
+    """Settings for the MCP session pool."""
+
+    mcp_pool_size: int = 2
+    """Maximum number of initialised sessions kept open per MCP server"""
+    mcp_max_concurrent_requests: int = 16
+    """Maximum number of concurrent requests per MCP server, further requests queue by priority"""
+    mcp_http_max_connections: int = 20
+    """Maximum number of concurrent HTTP connections per MCP server"""
+    mcp_http_max_keepalive_connections: int = 20
+    """Maximum number of idle keep-alive HTTP connections per MCP server"""
+    mcp_http_keepalive_expiry: float = 30.0
+    """Seconds an idle keep-alive HTTP connection is kept open"""
+    mcp_http_timeout: float = 30.0
+    """Timeout in seconds for connecting to and writing to an MCP server over HTTP"""
+    mcp_http_read_timeout: float = 300.0
+    """Timeout in seconds to wait for the next event from an MCP server over HTTP"""
+    mcp_http2: bool = True
+    """Whether to use HTTP/2 when the `h2` package is installed"""
+    mcp_http_drain_timeout: float = 0.05
+    """Seconds spent reading the rest of a response closed early, so its connection is reused"""
+
+
+# region HTTP Client
+
+
+class SharedHttpClient:
+    """Async context manager handing out a shared `httpx.AsyncClient` without closing it.
+
+    The MCP streamable HTTP transport opens and closes the client it is given for every session.
+    Wrapping the shared client lets every pooled session for a server reuse one keep-alive
+    connection pool, which is closed by the `McpSessionManager` instead.
+    """
+
+    def __init__(self, client: httpx.AsyncClient):
+        self._client = client
+
+    async def __aenter__(self) -> httpx.AsyncClient:
+        """Return the shared client."""
+        return self._client
+
+    async def __aexit__(self, *exc_info) -> None:
+        """Leave the shared client open."""
+        return None
+
+    def __call__(self, **_) -> "SharedHttpClient":
+        """Act as an `McpHttpClientFactory` returning the shared client."""
+        return self
+
+
+class _DrainingStream(httpx.AsyncByteStream):
+    """Response body which reads what is left of itself before closing, within a timeout."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, timeout: float):
+        self._stream = stream
+        self._timeout = timeout
+        self._chunks: Optional[AsyncIterator[bytes]] = None
+        self._consumed = False
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        self._chunks = self._stream.__aiter__()
+        async for chunk in self._chunks:
+            yield chunk
+        self._consumed = True
+
+    async def aclose(self) -> None:
+        try:
+            if not self._consumed:
+                with anyio.move_on_after(self._timeout):
+                    async for _ in self._chunks or self._stream:
+                        pass
+        except (httpx.HTTPError, httpx.StreamError, OSError):
+            pass
+        finally:
+            await self._stream.aclose()
+
+
+class KeepAliveTransport(httpx.AsyncBaseTransport):
+    """Transport which drains responses closed before their end, keeping HTTP/1.1 connections alive.
+
+    The MCP streamable HTTP client stops reading a request's SSE stream once it has the response,
+    just before the server ends the stream. Closing an HTTP/1.1 response with unread body closes
+    its connection, so without draining every tool call opened a new TCP connection.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, drain_timeout: float):
+        self._transport = transport
+        self._drain_timeout = drain_timeout
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        """Send a request, wrapping the response's body so it is drained when closed."""
+        response = await self._transport.handle_async_request(request)
+        response.stream = _DrainingStream(response.stream, self._drain_timeout)
+        return response
+
+    async def aclose(self) -> None:
+        """Close the wrapped transport."""
+        await self._transport.aclose()
+
+
+def create_http_client(settings: McpPoolSettings) -> httpx.AsyncClient:
+    """Create a keep-alive HTTP client for an MCP server.
+
+    HTTP/2 is used when enabled and the optional `h2` package is installed.
+
+    Args:
+        settings (McpPoolSettings): The pool settings to configure the client with.
+
+    Returns:
+        httpx.AsyncClient: The configured HTTP client.
+
+    """
+    transport = httpx.AsyncHTTPTransport(
+        http2=settings.mcp_http2 and importlib.util.find_spec("h2") is not None,
+        limits=httpx.Limits(
+            max_connections=settings.mcp_http_max_connections,
+            max_keepalive_connections=settings.mcp_http_max_keepalive_connections,
+            keepalive_expiry=settings.mcp_http_keepalive_expiry,
+        ),
+    )
+    return httpx.AsyncClient(
+        follow_redirects=True,
+        transport=KeepAliveTransport(transport, settings.mcp_http_drain_timeout),
+        timeout=httpx.Timeout(
+            settings.mcp_http_timeout, read=settings.mcp_http_read_timeout
+        ),
+    )
+
+
+# endregion HTTP Client
+
+
+# region Pooled Connection
+
+
+class _PooledConnection:
+    """A single initialised MCP session kept open by a dedicated background task.
+
+    The transport context managers use anyio task groups, which must be entered and exited from
+    the same task. Owning them in a background task lets the connection be opened lazily from a
+    request and closed later from the application lifespan.
+    """
+
+    def __init__(self, opener: SessionOpener):
+        self._opener = opener
+        self._ready = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._error: Optional[BaseException] = None
+        self.session: Optional[ClientSession] = None
+        self.in_flight = 0
+
+    @property
+    def alive(self) -> bool:
+        """Whether the connection is open and can accept requests."""
+        return (
+            self.session is not None
+            and self._task is not None
+            and not self._task.done()
+            and not self._closing.is_set()
+        )
+
+    @property
+    def usable(self) -> bool:
+        """Whether the connection is open or still opening."""
+        return not self._closing.is_set() and (
+            self._task is None or not self._task.done()
+        )
+
+    async def open(self) -> None:
+        """Open the connection and wait until the session has been initialised.
+
+        Raises:
+            Exception: Any error raised while starting the transport or initialising the session.
+
+        """
+        self._task = asyncio.create_task(self._run())
+        await self.wait()
+
+    async def wait(self) -> None:
+        """Wait until the connection, opened by another request, has been initialised.
+
+        Raises:
+            Exception: Any error raised while starting the transport or initialising the session.
+            ConnectionError: If the connection was closed before it was initialised.
+
+        """
+        await self._ready.wait()
+        if self._error is not None:
+            raise self._error
+        if not self.alive:
+            raise ConnectionError("MCP connection closed before it was initialised")
+
+    async def close(self) -> None:
+        """Close the connection and wait for the transport to shut down.
+
+        A connection still opening is cancelled, so an abandoned transport, e.g. a server
+        subprocess, is shut down rather than left running.
+        """
+        self._closing.set()
+        if self._task is not None:
+            if not self._ready.is_set():
+                self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _run(self) -> None:
+        try:
+            async with self._opener() as session:
+                self.session = session
+                self._ready.set()
+                await self._closing.wait()
+        except Exception as err:  # pylint: disable=broad-exception-caught
+            if not self._ready.is_set():
+                self._error = err
+            else:
+                logger.warning("MCP connection closed unexpectedly: %s", err)
+        finally:
+            self.session = None
+            self._ready.set()
+
+
+# endregion Pooled Connection
+
+
+# region Session Pool
+
+
+def _is_connection_error(err: BaseException) -> bool:
+    """Check whether an error means the underlying connection can no longer be used.
+
+    Only transport errors count, other errors, e.g. a tool's invalid arguments, leave the session
+    open for the requests multiplexed on it.
+    """
+    if isinstance(err, McpError):
+        return err.error.code == CONNECTION_CLOSED
+    return isinstance(
+        err,
+        (
+            OSError,
+            httpx.TransportError,
+            anyio.ClosedResourceError,
+            anyio.BrokenResourceError,
+            anyio.EndOfStream,
+        ),
+    )
+
+
+class McpSessionPool:
+    """A pool of initialised `ClientSession` objects for a single MCP server.
+
+    Sessions are opened on demand, up to `size`. Each request is routed to the session with the
+    fewest requests in flight, and because MCP is JSON-RPC each session multiplexes concurrent
+    requests. A new session is only opened when every existing one is busy. Requests beyond
+    `max_requests` wait for a slot, handed out by priority (see `PriorityLimiter`).
+    """
+
+    def __init__(
+        self,
+        opener: SessionOpener,
+        size: int,
+        max_requests: int,
+        label: str = "",
+    ):
+        if size < 1:
+            raise ValueError("The pool size must be at least 1.")
+
+        self.label = label
+        """The name of the MCP server in metrics, which must not contain secrets"""
+        self._opener = opener
+        self._size = size
+        self._slots = PriorityLimiter(max_requests)
+        self._lock = asyncio.Lock()
+        self._connections: List[_PooledConnection] = []
+
+    def __len__(self) -> int:
+        """Return the number of open sessions."""
+        return len([connection for connection in self._connections if connection.alive])
+
+    async def _acquire(self) -> _PooledConnection:
+        async with self._lock:
+            self._connections = [
+                connection for connection in self._connections if connection.usable
+            ]
+
+            connection = min(self._connections, key=lambda c: c.in_flight, default=None)
+            opening = connection is None or (
+                connection.in_flight > 0 and len(self._connections) < self._size
+            )
+            if opening:
+                # reserve the slot, the connection is opened outside the lock
+                connection = _PooledConnection(self._opener)
+                self._connections.append(connection)
+            connection.in_flight += 1
+
+        try:
+            if opening:
+                await connection.open()
+            else:
+                await connection.wait()
+        except BaseException:
+            connection.in_flight -= 1
+            if opening:
+                await connection.close()
+            raise
+        return connection
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[ClientSession]:
+        """Borrow an initialised session from the pool.
+
+        If the request fails because the connection has gone away, the session is discarded so the
+        next request opens a fresh one.
+
+        Yields:
+            ClientSession: An initialised MCP client session.
+
+        """
+        async with self._slots.slot():
+            connection = await self._acquire()
+            try:
+                assert (
+                    connection.session is not None
+                ), "Pooled connection has no session"
+                yield connection.session
+            except BaseException as err:
+                if _is_connection_error(err):
+                    logger.warning("Discarding pooled MCP session after error: %s", err)
+                    await connection.close()
+                raise
+            finally:
+                connection.in_flight -= 1
+
+    def stats(self) -> Dict[str, PriorityStats]:
+        """Return statistics for the pool's request slots.
+
+        Returns:
+            Dict[str, PriorityStats]: The statistics by priority class.
+
+        """
+        return self._slots.stats()
+
+    async def close(self) -> None:
+        """Close every session in the pool."""
+        async with self._lock:
+            connections, self._connections = self._connections, []
+        await asyncio.gather(*[connection.close() for connection in connections])
+
+
+# endregion Session Pool
+
+
+# region Session Manager
+
+
+class McpSessionManager:
+    """Owner of the session pools and HTTP clients for every MCP server.
+
+    One manager is shared by the process, see `get_mcp_session_manager`.
+    """
+
+    def __init__(self, settings: McpPoolSettings):
+        """Initialise the manager with no pools."""
+        self._pools: Dict[str, McpSessionPool] = {}
+        self._http_clients: Dict[str, httpx.AsyncClient] = {}
+        self._settings = settings
+
+    @property
+    def settings(self) -> McpPoolSettings:
+        """Return the settings used to configure pools and HTTP clients."""
+        return self._settings
+
+    async def __aenter__(self) -> "McpSessionManager":
+        """Open the manager for the lifetime of the application."""
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        """Close all pooled sessions when the application shuts down."""
+        await self.close()
+
+    def pool(
+        self,
+        key: str,
+        opener: SessionOpener,
+        size: Optional[int] = None,
+        label: Optional[str] = None,
+    ) -> McpSessionPool:
+        """Get the pool for an MCP server, creating it on first use.
+
+        Args:
+            key (str): A key uniquely identifying the MCP server.
+            opener (SessionOpener): Factory used to open new sessions to the server.
+            size (Optional[int], optional): Maximum number of sessions for the server. Defaults to
+                the `MCP_POOL_SIZE` setting.
+            label (Optional[str], optional): The name of the server in metrics. Defaults to None,
+                using the key, which must then not contain secrets such as stdio arguments.
+
+        Returns:
+            McpSessionPool: The pool of sessions for the server.
+
+        """
+        if key not in self._pools:
+            self._pools[key] = McpSessionPool(
+                opener,
+                size or self._settings.mcp_pool_size,
+                self._settings.mcp_max_concurrent_requests,
+                label=label or key,
+            )
+        return self._pools[key]
+
+    def pools(self) -> Iterator[Tuple[str, McpSessionPool]]:
+        """Iterate over the pools, e.g. to collect their metrics.
+
+        Yields:
+            Tuple[str, McpSessionPool]: The label of each pool's server and the pool.
+
+        """
+        for pool in list(self._pools.values()):
+            yield pool.label, pool
+
+    def http_client(self, key: str) -> httpx.AsyncClient:
+        """Get the shared keep-alive HTTP client for an MCP server, creating it on first use.
+
+        Args:
+            key (str): A key uniquely identifying the MCP server.
+
+        Returns:
+            httpx.AsyncClient: The HTTP client shared by every session to the server.
+
+        """
+        if key not in self._http_clients:
+            self._http_clients[key] = create_http_client(self._settings)
+        return self._http_clients[key]
+
+    async def close(self) -> None:
+        """Close every pool and HTTP client managed by this instance."""
+        pools, self._pools = self._pools, {}
+        await asyncio.gather(*[pool.close() for pool in pools.values()])
+
+        # close the HTTP clients after the sessions, which terminate over them
+        clients, self._http_clients = self._http_clients, {}
+        await asyncio.gather(*[client.aclose() for client in clients.values()])
+
+
+@lru_cache(maxsize=1)
+def get_mcp_session_manager() -> McpSessionManager:
+    """Get the process-wide MCP session manager, configured from the environment on first use.
+
+    Returns:
+        McpSessionManager: The MCP session manager.
+
+    """
+    return McpSessionManager(McpPoolSettings())
+
+
+@metrics.collector
+def collect_mcp_pool_metrics() -> None:
+    """Set the open session and request slot metrics of each MCP session pool."""
+    mcp_sessions_open.clear()
+    # the manager is created by the first MCP server, there is nothing to report before
+    if get_mcp_session_manager.cache_info().currsize == 0:
+        return
+    for label, pool in get_mcp_session_manager().pools():
+        mcp_sessions_open.labels(label).set(len(pool))
+        set_priority_metrics(f"mcp:{label}", pool.stats())
+
+
+# endregion Session Manager
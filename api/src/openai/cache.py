@@ -0,0 +1,231 @@
+"""Exact-match cache of chat completions."""
+
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Annotated, Any, Optional, Tuple
+
+from cachetools import LRUCache
+from openai import NotGiven
+from openai.types.chat.chat_completion import ChatCompletion
+from pydantic import Field
+from pydantic_core import to_jsonable_python
+
+from api.src.pydantic import ConfiguredBaseModel
+from api.src.settings import ConfiguredBaseSettings
+from api.src.utils.metrics import (
+    completion_cache_bytes,
+    completion_cache_entries,
+    completion_cache_lookups,
+    metrics,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class CompletionCacheSettings(ConfiguredBaseSettings):
+    """Settings for the completion cache."""
+
+    completion_cache: bool = False
+    """Whether deterministic chat completions are cached"""
+    completion_cache_ttl: float = 3600.0
+    """Default seconds a cached completion is kept, agents may set their own TTL"""
+    completion_cache_max_bytes: int = 64 * 1024 * 1024
+    """Maximum total size in bytes of the completions cached in memory"""
+    completion_cache_disk: bool = False
+    """Whether completions are also cached in a local SQLite database shared between workers"""
+    completion_cache_path: Path = Path(".jarvis/completions.sqlite3")
+    """Path of the SQLite database used by the on-disk tier"""
+
+
+class CompletionCacheStats(ConfiguredBaseModel):
+    """Statistics for the completion cache."""
+
+    hits: Annotated[int, Field(description="Lookups answered from either tier")]
+    disk_hits: Annotated[int, Field(description="Lookups answered from the disk tier")]
+    misses: Annotated[int, Field(description="Lookups not found in the cache")]
+    entries: Annotated[int, Field(description="Completions cached in memory")]
+    nbytes: Annotated[int, Field(description="Size in bytes of the memory tier")]
+
+
+def completion_key(**request: Any) -> str:
+    """Return the canonical hash of a chat completion request.
+
+    Parameters which are not given are left out, so they do not change the key.
+
+    Args:
+        **request (Any): The parameters of the request, e.g. model, messages and tools.
+
+    Returns:
+        str: The SHA-256 hash of the request's canonical JSON.
+
+    """
+    request = {k: v for k, v in request.items() if not isinstance(v, NotGiven)}
+    return hashlib.sha256(
+        json.dumps(to_jsonable_python(request), sort_keys=True).encode()
+    ).hexdigest()
+
+
+# region Completion Cache
+
+
+class CompletionCache:
+    """Two-tier cache of chat completions keyed by `completion_key`.
+
+    The memory tier is an LRU bounded by the total size of the cached completions. The optional
+    disk tier is a SQLite database in WAL mode, so workers on the same host share completions.
+    Every entry expires after the TTL given when it was stored.
+    """
+
+    def __init__(self, settings: CompletionCacheSettings):
+        self.enabled = settings.completion_cache
+        self.ttl = settings.completion_cache_ttl
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory: LRUCache[str, Tuple[float, str]] = LRUCache(
+            maxsize=settings.completion_cache_max_bytes,
+            getsizeof=lambda entry: len(entry[1].encode()),
+        )
+
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        if self.enabled and settings.completion_cache_disk:
+            settings.completion_cache_path.parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(
+                settings.completion_cache_path,
+                check_same_thread=False,
+                isolation_level=None,
+                timeout=30,
+            )
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute("""
+                CREATE TABLE IF NOT EXISTS completions (
+                    key TEXT PRIMARY KEY,
+                    payload TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+                """)
+
+    def _remember(self, key: str, entry: Tuple[float, str]) -> None:
+        try:
+            self._memory[key] = entry
+        except ValueError:
+            # larger than the whole memory tier
+            logger.debug("Completion %s is too large to cache in memory", key)
+
+    def _get_disk(self, key: str) -> Optional[Tuple[float, str]]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT expires_at, payload FROM completions "
+                "WHERE key = ? AND expires_at > ?",
+                (key, time.time()),
+            ).fetchone()
+        return row
+
+    def _put_disk(self, key: str, expires_at: float, payload: str) -> None:
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO completions VALUES (?, ?, ?)",
+                (key, payload, expires_at),
+            )
+            self._connection.execute(
+                "DELETE FROM completions WHERE expires_at <= ?", (time.time(),)
+            )
+
+    async def get(self, key: str) -> Optional[ChatCompletion]:
+        """Get a cached completion.
+
+        Args:
+            key (str): The key of the request, see `completion_key`.
+
+        Returns:
+            Optional[ChatCompletion]: The cached completion, or None if it is not cached or has
+                expired.
+
+        """
+        entry = self._memory.get(key)
+        if entry is not None and entry[0] <= time.time():
+            del self._memory[key]
+            entry = None
+
+        if entry is None and self._connection is not None:
+            entry = await asyncio.to_thread(self._get_disk, key)
+            if entry is not None:
+                self.disk_hits += 1
+                self._remember(key, entry)
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return ChatCompletion.model_validate_json(entry[1])
+
+    async def put(
+        self, key: str, completion: ChatCompletion, ttl: Optional[float] = None
+    ) -> None:
+        """Cache a completion.
+
+        Args:
+            key (str): The key of the request, see `completion_key`.
+            completion (ChatCompletion): The completion to cache.
+            ttl (Optional[float], optional): Seconds the completion is kept. Defaults to None,
+                using `COMPLETION_CACHE_TTL`.
+
+        """
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        payload = completion.model_dump_json()
+        self._remember(key, (expires_at, payload))
+
+        if self._connection is not None:
+            await asyncio.to_thread(self._put_disk, key, expires_at, payload)
+
+    def stats(self) -> CompletionCacheStats:
+        """Return statistics for the cache.
+
+        Returns:
+            CompletionCacheStats: The hit and miss counters and the size of the memory tier.
+
+        """
+        return CompletionCacheStats(
+            hits=self.hits,
+            disk_hits=self.disk_hits,
+            misses=self.misses,
+            entries=len(self._memory),
+            nbytes=self._memory.currsize,
+        )
+
+
+@lru_cache(maxsize=1)
+def get_completion_cache() -> CompletionCache:
+    """Get the completion cache, configured from the environment.
+
+    Returns:
+        CompletionCache: The completion cache.
+
+    """
+    return CompletionCache(CompletionCacheSettings())
+
+
+@metrics.collector
+def collect_completion_cache_metrics() -> None:
+    """Set the completion cache metrics from its statistics, once the cache has been created."""
+    if get_completion_cache.cache_info().currsize == 0:
+        return
+    stats = get_completion_cache().stats()
+    completion_cache_lookups.labels("memory").set(stats.hits - stats.disk_hits)
+    completion_cache_lookups.labels("disk").set(stats.disk_hits)
+    completion_cache_lookups.labels("miss").set(stats.misses)
+    completion_cache_entries.labels().set(stats.entries)
+    completion_cache_bytes.labels().set(stats.nbytes)
+
+
+# endregion Completion Cache
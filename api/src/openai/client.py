@@ -12,7 +12,7 @@ from typing import (
     runtime_checkable,
 )
 
-from cachetools import TTLCache, cached
+from cachetools import LRUCache, cached
 from openai import AsyncAzureOpenAI, AsyncOpenAI, AzureOpenAI, OpenAI
 from pydantic import Field, SecretStr, model_serializer
 
@@ -79,7 +79,7 @@ def get_client(client: Callable[..., T], options: dict[str, Any]) -> T: ...
 
 
 @validate_options(Credentials)
-@cached(cache=TTLCache(maxsize=1, ttl=1800))
+@cached(cache=LRUCache(maxsize=8))
 def get_client(
     client: Callable[..., T], options: Union[CredentialsProtocol, dict[str, Any]]
 ) -> T:
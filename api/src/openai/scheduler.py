@@ -0,0 +1,484 @@
+"""Process-wide scheduling of requests to OpenAI deployments."""
+
+import asyncio
+import email.utils
+import json
+import logging
+import random
+import time
+from functools import lru_cache, partial
+from typing import Annotated, Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+from openai import (
+    APIConnectionError,
+    APIStatusError,
+    InternalServerError,
+    NotGiven,
+    RateLimitError,
+)
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+from pydantic import Field
+from pydantic_core import to_jsonable_python
+
+from api.src.openai.cache import completion_key
+from api.src.pydantic import ConfiguredBaseModel
+from api.src.settings import ConfiguredBaseSettings
+from api.src.utils.cassette import get_cassette
+from api.src.utils.metrics import (
+    llm_concurrency_limit,
+    llm_in_flight,
+    llm_queue_depth,
+    llm_queue_wait_seconds,
+    llm_queue_wait_seconds_max,
+    llm_retried_requests,
+    llm_scheduled_requests,
+    llm_throttled_requests,
+    metrics,
+)
+from api.src.utils.priority import (
+    Priority,
+    PriorityLimiter,
+    PriorityStats,
+    set_priority_metrics,
+)
+
+logger = logging.getLogger(__name__)
+
+R = TypeVar("R")
+
+
+class LlmSchedulerSettings(ConfiguredBaseSettings):
+    """Settings for the LLM scheduler."""
+
+    llm_requests_per_minute: Optional[int] = None
+    """Requests per minute allowed per deployment, unlimited when not set"""
+    llm_tokens_per_minute: Optional[int] = None
+    """Tokens per minute allowed per deployment, unlimited when not set"""
+    llm_completion_tokens_estimate: int = 512
+    """Completion tokens assumed for each request when reserving tokens per minute"""
+    llm_initial_concurrency: int = 8
+    """Concurrent requests allowed per deployment before any adjustment"""
+    llm_min_concurrency: int = 1
+    """Lowest concurrency limit the scheduler backs off to"""
+    llm_max_concurrency: int = 64
+    """Highest concurrency limit the scheduler grows to"""
+    llm_backoff_factor: float = 0.5
+    """Factor the concurrency limit is multiplied by when a request is rate limited"""
+    llm_max_retries: int = 4
+    """Retries for rate limited, failed or timed out requests"""
+
+
+class DeploymentStats(ConfiguredBaseModel):
+    """Statistics for the requests scheduled against a deployment."""
+
+    queue_depth: Annotated[int, Field(description="Requests waiting to start")]
+    in_flight: Annotated[int, Field(description="Requests executing")]
+    concurrency_limit: Annotated[
+        float, Field(description="Current limit on concurrent requests")
+    ]
+    requests: Annotated[int, Field(description="Requests started, including retries")]
+    throttled: Annotated[int, Field(description="Requests rejected with a 429")]
+    retries: Annotated[int, Field(description="Requests retried")]
+    wait_seconds_total: Annotated[
+        float, Field(description="Total seconds requests waited to start")
+    ]
+    wait_seconds_max: Annotated[
+        float, Field(description="Longest a request waited to start, in seconds")
+    ]
+    priorities: Annotated[
+        Dict[str, PriorityStats],
+        Field(description="Concurrency slot statistics by priority class"),
+    ]
+
+
+def estimate_tokens(request: Dict[str, Any]) -> int:
+    """Estimate the prompt tokens of a chat completion request.
+
+    Uses roughly four characters per token over the request's messages and tools, which is close
+    enough for reserving capacity without loading a tokenizer.
+
+    Args:
+        request (Dict[str, Any]): The parameters of the request.
+
+    Returns:
+        int: The estimated number of prompt tokens.
+
+    """
+    prompt = [
+        request.get(name)
+        for name in ("messages", "tools")
+        if not isinstance(request.get(name), NotGiven)
+    ]
+    return len(json.dumps(to_jsonable_python(prompt))) // 4 + 1
+
+
+def retry_after(err: APIStatusError) -> Optional[float]:
+    """Return the seconds to wait before retrying, from the response's headers.
+
+    Args:
+        err (APIStatusError): The error response.
+
+    Returns:
+        Optional[float]: The seconds to wait, or None if the response does not say.
+
+    """
+    headers = err.response.headers
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            value = headers["retry-after"]
+            try:
+                return float(value)
+            except ValueError:
+                return (
+                    email.utils.parsedate_to_datetime(value).timestamp() - time.time()
+                )
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+# region Token Bucket
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at a rate per minute.
+
+    The bucket does not wait itself, `delay` tells the caller how long until tokens are available,
+    so the scheduler can wait without holding a concurrency slot. A request larger than the bucket
+    waits for a full bucket.
+    """
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    def consume(self, amount: float) -> None:
+        """Take tokens without waiting, e.g. to correct an estimate; the balance may go negative.
+
+        Args:
+            amount (float): The number of tokens, negative amounts return tokens to the bucket.
+
+        """
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+    def delay(self, amount: float) -> float:
+        """Return the seconds until the tokens are available, without taking them.
+
+        Args:
+            amount (float): The number of tokens.
+
+        Returns:
+            float: The seconds to wait, 0 if the tokens are available now.
+
+        """
+        self._refill()
+        return max(0.0, (min(amount, self.capacity) - self.tokens) / self.rate)
+
+    def take(self, amount: float) -> None:
+        """Take tokens which `delay` reported as available.
+
+        Args:
+            amount (float): The number of tokens.
+
+        """
+        self.consume(min(amount, self.capacity))
+
+
+# endregion Token Bucket
+
+
+# region Scheduler
+
+
+class DeploymentScheduler:
+    """Schedules the requests to one deployment.
+
+    Requests wait for a concurrency slot, handed out by priority (see `PriorityLimiter`). A request
+    which then finds the deployment paused, or the requests or tokens per minute buckets empty,
+    gives its slot back, waits and queues again, so waiting never holds a slot. The concurrency
+    limit grows by one for every `limit` successful requests and is multiplied by the backoff
+    factor when a request is rate limited (AIMD). A 429 also pauses every request to the deployment
+    for the time given by its `retry-after` headers.
+    """
+
+    def __init__(self, name: str, settings: LlmSchedulerSettings):
+        self.name = name
+        self.settings = settings
+        self.paused_until = 0.0
+        self.requests = 0
+        self.throttled = 0
+        self.retries = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self._slots = PriorityLimiter(float(settings.llm_initial_concurrency))
+        self._request_bucket = (
+            TokenBucket(settings.llm_requests_per_minute)
+            if settings.llm_requests_per_minute
+            else None
+        )
+        self._token_bucket = (
+            TokenBucket(settings.llm_tokens_per_minute)
+            if settings.llm_tokens_per_minute
+            else None
+        )
+
+    @property
+    def limit(self) -> float:
+        """Return the current limit on concurrent requests."""
+        return self._slots.limit
+
+    @limit.setter
+    def limit(self, value: float) -> None:
+        self._slots.limit = value
+
+    def _capacity_delay(self, tokens: int) -> float:
+        """Return the seconds until a request may start, taking its share of the buckets if 0."""
+        delay = self.paused_until - time.monotonic()
+        if delay > 0:
+            return delay
+        buckets = [(self._request_bucket, 1), (self._token_bucket, tokens)]
+        buckets = [(bucket, amount) for bucket, amount in buckets if bucket is not None]
+        delay = max([bucket.delay(amount) for bucket, amount in buckets], default=0.0)
+        if delay > 0:
+            return delay
+        for bucket, amount in buckets:
+            bucket.take(amount)
+        return 0.0
+
+    def _started(self, queued: float) -> None:
+        waited = time.monotonic() - queued
+        self.wait_seconds_total += waited
+        self.wait_seconds_max = max(self.wait_seconds_max, waited)
+        self.requests += 1
+
+    def _succeeded(self, tokens: int, result: Any) -> None:
+        self.limit = min(
+            float(self.settings.llm_max_concurrency), self.limit + 1 / self.limit
+        )
+        usage = getattr(result, "usage", None)
+        if self._token_bucket is not None and usage is not None:
+            # correct the reservation with the tokens actually used
+            self._token_bucket.consume(usage.total_tokens - tokens)
+
+    def _rate_limited(self, err: RateLimitError, attempt: int) -> float:
+        self.throttled += 1
+        self.limit = max(
+            float(self.settings.llm_min_concurrency),
+            self.limit * self.settings.llm_backoff_factor,
+        )
+        delay = retry_after(err)
+        if delay is None:
+            delay = self._backoff(attempt)
+        self.paused_until = max(self.paused_until, time.monotonic() + delay)
+        return delay
+
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        return min(0.5 * 2**attempt, 30) * random.uniform(0.75, 1.25)
+
+    async def run(
+        self,
+        call: Callable[[], Awaitable[R]],
+        tokens: int,
+        priority: Optional[Priority] = None,
+        thread_id: Optional[str] = None,
+    ) -> R:
+        """Run a request once the deployment has capacity, retrying it when rate limited.
+
+        Args:
+            call (Callable[[], Awaitable[R]]): Makes the request.
+            tokens (int): The estimated tokens of the request.
+            priority (Optional[Priority], optional): The priority class of the request. Defaults
+                to None, using the current context's priority.
+            thread_id (Optional[str], optional): The thread the request is made for. Defaults to
+                None, using the current context's thread.
+
+        Returns:
+            R: The result of the request.
+
+        """
+        attempt = 0
+        queued = time.monotonic()
+        while True:
+            retrying = False
+            async with self._slots.slot(priority, thread_id):
+                # a paused deployment or empty buckets give the slot back to wait, then queue again
+                backoff = self._capacity_delay(tokens)
+                if not backoff:
+                    self._started(queued)
+                    try:
+                        result = await call()
+                    except RateLimitError as err:
+                        delay = self._rate_limited(err, attempt)
+                        logger.warning(
+                            "Rate limited by %s, retrying in %.1fs with concurrency %d",
+                            self.name,
+                            delay,
+                            int(self.limit),
+                        )
+                        if attempt >= self.settings.llm_max_retries:
+                            raise
+                        # the retry waits for the pause when it next holds a slot
+                        retrying = True
+                    except (APIConnectionError, InternalServerError) as err:
+                        if attempt >= self.settings.llm_max_retries:
+                            raise
+                        backoff = self._backoff(attempt)
+                        logger.warning(
+                            "%s failed, retrying in %.1fs: %s", self.name, backoff, err
+                        )
+                        retrying = True
+                    else:
+                        self._succeeded(tokens, result)
+                        return result
+
+            # wait without holding a slot
+            await asyncio.sleep(backoff)
+            if retrying:
+                attempt += 1
+                self.retries += 1
+                queued = time.monotonic()
+
+    def stats(self) -> DeploymentStats:
+        """Return statistics for the deployment.
+
+        Returns:
+            DeploymentStats: The queue, concurrency and wait time statistics.
+
+        """
+        return DeploymentStats(
+            queue_depth=self._slots.queued,
+            in_flight=self._slots.in_flight,
+            concurrency_limit=self.limit,
+            requests=self.requests,
+            throttled=self.throttled,
+            retries=self.retries,
+            wait_seconds_total=self.wait_seconds_total,
+            wait_seconds_max=self.wait_seconds_max,
+            priorities=self._slots.stats(),
+        )
+
+
+class LlmScheduler:
+    """Process-wide scheduler of chat completion requests, with one queue per deployment."""
+
+    def __init__(self, settings: LlmSchedulerSettings):
+        self.settings = settings
+        self._deployments: Dict[str, DeploymentScheduler] = {}
+
+    def deployment(self, name: str) -> DeploymentScheduler:
+        """Get the scheduler for a deployment.
+
+        Args:
+            name (str): The name of the deployment, i.e. the `model` of the request.
+
+        Returns:
+            DeploymentScheduler: The deployment's scheduler.
+
+        """
+        if name not in self._deployments:
+            self._deployments[name] = DeploymentScheduler(name, self.settings)
+        return self._deployments[name]
+
+    async def create_completion(
+        self,
+        client: Any,
+        priority: Optional[Priority] = None,
+        thread_id: Optional[str] = None,
+        **request: Any,
+    ) -> Any:
+        """Create a chat completion once its deployment has capacity.
+
+        The client's own retries are disabled, as the scheduler retries the request itself. For
+        streamed completions the request holds its concurrency slot until the stream starts.
+
+        Args:
+            client (Any): The OpenAI client.
+            priority (Optional[Priority], optional): The priority class of the request. Defaults
+                to None, using the current context's priority, see `prioritise`.
+            thread_id (Optional[str], optional): The thread the request is made for. Defaults to
+                None, using the current context's thread.
+            **request (Any): The parameters of the request, passed to `chat.completions.create`.
+
+        Returns:
+            Any: The completion, or the stream of completion chunks.
+
+        """
+        client = client.with_options(max_retries=0)
+        tokens = estimate_tokens(request) + self.settings.llm_completion_tokens_estimate
+
+        def create() -> Awaitable[Any]:
+            return client.chat.completions.create(**request)
+
+        cassette = get_cassette()
+        if cassette.mode != "off":
+            # record or replay the completion, still scheduled as if it were made
+            call, key, model = create, completion_key(**request), request["model"]
+            if request.get("stream"):
+                create = partial(cassette.stream, model, key, call, ChatCompletionChunk)
+            else:
+                create = partial(
+                    cassette.call, "completion", model, key, call, ChatCompletion
+                )
+
+        return await self.deployment(request["model"]).run(
+            create,
+            tokens,
+            priority=priority,
+            thread_id=thread_id,
+        )
+
+    def stats(self) -> Dict[str, DeploymentStats]:
+        """Return statistics for every deployment.
+
+        Returns:
+            Dict[str, DeploymentStats]: The statistics by deployment name.
+
+        """
+        return {
+            name: deployment.stats() for name, deployment in self._deployments.items()
+        }
+
+
+@lru_cache(maxsize=1)
+def get_llm_scheduler() -> LlmScheduler:
+    """Get the process-wide LLM scheduler, configured from the environment.
+
+    Returns:
+        LlmScheduler: The LLM scheduler.
+
+    """
+    return LlmScheduler(LlmSchedulerSettings())
+
+
+@metrics.collector
+def collect_llm_scheduler_metrics() -> None:
+    """Set the queue, concurrency and wait time metrics of each deployment's scheduler."""
+    # the scheduler is created by the first completion, there is nothing to report before
+    if get_llm_scheduler.cache_info().currsize == 0:
+        return
+    for name, stats in get_llm_scheduler().stats().items():
+        llm_queue_depth.labels(name).set(stats.queue_depth)
+        llm_in_flight.labels(name).set(stats.in_flight)
+        llm_concurrency_limit.labels(name).set(stats.concurrency_limit)
+        llm_scheduled_requests.labels(name).set(stats.requests)
+        llm_throttled_requests.labels(name).set(stats.throttled)
+        llm_retried_requests.labels(name).set(stats.retries)
+        llm_queue_wait_seconds.labels(name).set(stats.wait_seconds_total)
+        llm_queue_wait_seconds_max.labels(name).set(stats.wait_seconds_max)
+        set_priority_metrics(f"llm:{name}", stats.priorities)
+
+
+# endregion Scheduler
@@ -0,0 +1,88 @@
+"""Utilities for assembling streamed chat completions."""
+
+from typing import Dict, List, Tuple
+
+from openai.types.chat.chat_completion_chunk import ChoiceDeltaToolCall
+from openai.types.chat.chat_completion_message_tool_call import (
+    ChatCompletionMessageToolCall,
+    Function,
+)
+
+from api.src.messages.create import ChatCompletionMessageParam, create_message
+
+
+class StreamAccumulator:
+    """Assemble the deltas of a streamed chat completion into a complete assistant message.
+
+    Content deltas are concatenated and tool call fragments are merged by their `index`, so the
+    message can be appended to the conversation once the stream has finished.
+    """
+
+    def __init__(self):
+        self._content: List[str] = []
+        self._tool_calls: Dict[int, ChatCompletionMessageToolCall] = {}
+
+    @property
+    def content(self) -> str:
+        """Return the content streamed so far."""
+        return "".join(self._content)
+
+    @property
+    def tool_calls(self) -> List[ChatCompletionMessageToolCall]:
+        """Return the tool calls streamed so far, in the order the model produced them."""
+        return [self._tool_calls[index] for index in sorted(self._tool_calls)]
+
+    @property
+    def message(self) -> ChatCompletionMessageParam:
+        """Return the assistant message for the streamed completion."""
+        return create_message(
+            role="assistant",
+            content=self.content or None,
+            tool_calls=[
+                tool_call.model_dump(exclude_none=True) for tool_call in self.tool_calls
+            ]
+            or None,
+        )
+
+    def add_content(self, delta: str) -> None:
+        """Append a content delta.
+
+        Args:
+            delta (str): The content delta from the stream.
+
+        """
+        self._content.append(delta)
+
+    def add_tool_call(
+        self, fragment: ChoiceDeltaToolCall
+    ) -> Tuple[ChatCompletionMessageToolCall, bool]:
+        """Merge a tool call fragment into the tool call at the same index.
+
+        Args:
+            fragment (ChoiceDeltaToolCall): The tool call fragment from the stream.
+
+        Returns:
+            Tuple[ChatCompletionMessageToolCall, bool]: The tool call assembled so far, and
+                whether this fragment started a new tool call.
+
+        """
+        name = fragment.function.name if fragment.function else None
+        arguments = fragment.function.arguments if fragment.function else None
+
+        tool_call = self._tool_calls.get(fragment.index)
+        if tool_call is None:
+            tool_call = ChatCompletionMessageToolCall(
+                id=fragment.id or "",
+                type="function",
+                function=Function(name=name or "", arguments=arguments or ""),
+            )
+            self._tool_calls[fragment.index] = tool_call
+            return tool_call, True
+
+        if fragment.id:
+            tool_call.id = fragment.id
+        if name:
+            tool_call.function.name += name
+        if arguments:
+            tool_call.function.arguments += arguments
+        return tool_call, False
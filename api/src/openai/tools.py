@@ -1,14 +1,20 @@
 """Utility functions for creating tool choices and functions."""
 
-from typing import Any, List, Optional
+import copy
+import hashlib
+import json
+from typing import Annotated, Any, Iterable, List, Optional, Tuple
 
+from cachetools import LRUCache, cached
 from openai.types.chat.chat_completion_named_tool_choice_param import (
     ChatCompletionNamedToolChoiceParam,
     Function,
 )
 from openai.types.chat.chat_completion_tool_param import ChatCompletionToolParam
 from openai.types.shared_params import FunctionDefinition
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field
+
+from api.src.pydantic import ConfiguredBaseModel
 
 
 def create_tool(
@@ -50,7 +56,7 @@ def create_tool(
         _exclude.extend(defaults.keys())
 
     for key in _exclude or []:
-        schema["properties"].pop(key, None)
+        schema.get("properties", {}).pop(key, None)
 
     if not schema:
         raise ValueError("Parameters must be a Pydantic model or a dictionary.")
@@ -90,7 +96,8 @@ def create_tool(
     if "required" not in schema:
         schema["required"] = []
 
-    for key in schema["properties"]:
+    # an object schema may have no properties, e.g. a tool without arguments
+    for key in schema.get("properties", {}):
         if key not in schema["required"]:
             schema["required"].append(key)
 
@@ -105,6 +112,121 @@ def create_tool(
     )
 
 
+def strict_json_schema(schema: dict[str, Any]) -> dict[str, Any]:
+    """Return a copy of a JSON schema which meets the requirements of strict function calling.
+
+    Every object schema, including nested ones and definitions, allows no additional properties
+    and requires all of its properties. Properties which were optional accept null instead.
+
+    Args:
+        schema (dict[str, Any]): The JSON schema, which is not modified.
+
+    Returns:
+        dict[str, Any]: The strict JSON schema.
+
+    """
+
+    def nullable(subschema: dict[str, Any]) -> dict[str, Any]:
+        if isinstance(subschema.get("type"), str):
+            subschema["type"] = [subschema["type"], "null"]
+            if "enum" in subschema:
+                subschema["enum"] = [*subschema["enum"], None]
+            return subschema
+        return {"anyOf": [subschema, {"type": "null"}]}
+
+    def visit(node: Any):
+        if isinstance(node, list):
+            for item in node:
+                visit(item)
+        if not isinstance(node, dict):
+            return
+
+        for value in node.values():
+            visit(value)
+
+        if node.get("type") == "object":
+            properties = node.setdefault("properties", {})
+            required = set(node.get("required", []))
+            for name, subschema in properties.items():
+                if name not in required and isinstance(subschema, dict):
+                    properties[name] = nullable(subschema)
+            node["required"] = list(properties)
+            node["additionalProperties"] = False
+
+    schema = copy.deepcopy(schema)
+    visit(schema)
+    return schema
+
+
+def _hash_tool(name: str, description: str, parameters: dict[str, Any]) -> str:
+    return hashlib.sha256(
+        json.dumps([name, description, parameters], sort_keys=True).encode()
+    ).hexdigest()
+
+
+@cached(
+    cache=LRUCache(maxsize=256),
+    key=lambda name, description, parameters: _hash_tool(name, description, parameters),
+)
+def create_client_tool(
+    name: str, description: str, parameters: dict[str, Any]
+) -> ChatCompletionToolParam:
+    """Create a tool definition for a tool supplied by the client, cached by its content hash.
+
+    Clients send the same tool definitions with every message, so each distinct definition is
+    only converted once. The returned definition is shared and must not be modified.
+
+    Args:
+        name (str): The name of the tool.
+        description (str): A description of what the tool does.
+        parameters (dict[str, Any]): The JSON schema of the tool's parameters.
+
+    Returns:
+        ChatCompletionToolParam: The tool definition.
+
+    """
+    return create_tool(name, description, copy.deepcopy(parameters))
+
+
+class ToolManifest(ConfiguredBaseModel):
+    """Immutable, versioned set of tool definitions.
+
+    Registries build a manifest when their tools change, so the tool schemas sent with every
+    request are generated once rather than on every round trip.
+    """
+
+    model_config = ConfigDict(frozen=True)
+
+    version: Annotated[
+        int, Field(description="Incremented each time the registered tools change")
+    ]
+    tools: Annotated[
+        Tuple[ChatCompletionToolParam, ...],
+        Field(description="The tool definitions, in registration order"),
+    ]
+    digest: Annotated[
+        str, Field(description="SHA-256 hash of the tool definitions' content")
+    ]
+
+    @classmethod
+    def build(
+        cls, version: int, tools: Iterable[ChatCompletionToolParam]
+    ) -> "ToolManifest":
+        """Build a manifest from tool definitions.
+
+        Args:
+            version (int): The version of the manifest.
+            tools (Iterable[ChatCompletionToolParam]): The tool definitions.
+
+        Returns:
+            ToolManifest: The manifest.
+
+        """
+        tools = tuple(tools)
+        digest = hashlib.sha256(json.dumps(tools, sort_keys=True).encode()).hexdigest()
+        return cls.model_construct(version=version, tools=tools, digest=digest)
+
+
 def tool_choice(name: str) -> ChatCompletionNamedToolChoiceParam:
     """Create a named tool choice to be used in the OpenAI API.
 
@@ -1,9 +1,23 @@
 """Utility functions for working with Pydantic models."""
 
+import hashlib
 import inspect
-from typing import Any, Dict, List, Optional, Sequence, Type, TypeGuard, TypeVar
+import json
+from typing import (
+    Any,
+    Dict,
+    Hashable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    TypeGuard,
+    TypeVar,
+)
 
 import pydantic
+from cachetools import LRUCache
 from pydantic import BaseModel, ConfigDict, create_model
 
 
@@ -59,6 +73,28 @@ def create_simple_model(
     return create_model(model_name, **field_definitions)  # type: ignore
 
 
+# Models built from JSON schemas, keyed by the name and hash of the schema. Both caches are bounded,
+# so servers whose schemas keep changing do not grow them forever
+_schema_models: LRUCache[Tuple[str, str], Type[BaseModel]] = LRUCache(maxsize=1024)
+# Nested models, keyed by their name and fields so identical definitions share a class
+_nested_models: LRUCache[Hashable, Type[BaseModel]] = LRUCache(maxsize=4096)
+
+
+def schema_hash(schema: Dict[str, Any]) -> str:
+    """Return a stable hash of a JSON schema.
+
+    Args:
+        schema (Dict[str, Any]): The JSON schema.
+
+    Returns:
+        str: The SHA-256 hash of the schema's canonical JSON.
+
+    """
+    return hashlib.sha256(
+        json.dumps(schema, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
 def model_from_schema(
     name: str,
     schema: Dict[str, Any],
@@ -71,6 +107,10 @@ def model_from_schema(
       - Nested objects and arrays
       - Default values and required fields.
 
+    Models are cached by name and schema hash, so building the same schema again returns the same
+    class. Nested models with the same name and fields, such as a `$defs` entry shared by many tools
+    of a server, are built once and shared.
+
     Args:
         name: Name of the generated Pydantic model
         schema: JSON schema dict
@@ -80,6 +120,13 @@ def model_from_schema(
         A dynamically generated Pydantic BaseModel subclass
 
     """
+    key = (name, schema_hash(schema))
+    if definitions is None and key in _schema_models:
+        return _schema_models[key]
+
+    # only top-level models are cached by schema, nested ones are shared by their fields
+    top_level = definitions is None
+
     # Collect definitions from the root schema
     definitions = definitions or {}
     for defs_key in ("definitions", "$defs"):
@@ -102,7 +149,8 @@ def model_from_schema(
         # Handle $ref
         if "$ref" in subschema:
             ref_schema = _resolve_ref(subschema["$ref"])
-            return _build(ref_schema, model_name)
+            # name shared definitions after themselves so they are shared between tools
+            return _build(ref_schema, subschema["$ref"].rsplit("/", 1)[-1])
 
         schema_type = subschema.get("type")
         # Array: build item type recursively
@@ -126,8 +174,19 @@ def model_from_schema(
                     field_type = Optional[field_type]  # type: ignore
                 fields[prop_name] = (field_type, default)
 
-            # Create and return a new Pydantic model
-            return create_model(model_name, __base__=BaseModel, **fields)  # type: ignore
+            # Create and return a new Pydantic model, reusing an identical one if built before
+            model_key = (
+                model_name,
+                tuple(
+                    (field, field_type, repr(default))
+                    for field, (field_type, default) in fields.items()
+                ),
+            )
+            if model_key not in _nested_models:
+                _nested_models[model_key] = create_model(
+                    model_name, __base__=BaseModel, **fields
+                )  # type: ignore
+            return _nested_models[model_key]
 
         # Primitive types mapping
         mapping = {
@@ -148,7 +207,13 @@ def model_from_schema(
     # Build and return the top-level model
     top_model = _build(schema, name)
     if isinstance(top_model, type) and issubclass(top_model, BaseModel):
-        top_model.__name__ = name
-        return top_model  # type: ignore
-    # If top schema isn't an object, wrap into a model with a single field 'value'
-    return create_model(name, __base__=BaseModel, value=(top_model, ...))  # type: ignore
+        if top_model.__name__ != name:
+            # the schema is a reference to a shared model, rename a subclass not the original
+            top_model = create_model(name, __base__=top_model)
+    else:
+        # If top schema isn't an object, wrap into a model with a single field 'value'
+        top_model = create_model(name, __base__=BaseModel, value=(top_model, ...))
+
+    if top_level:
+        _schema_models[key] = top_model
+    return top_model  # type: ignore
@@ -0,0 +1 @@
+"""Functions and classes for managing runs."""
@@ -0,0 +1,318 @@
+"""Eagerly executed runs with replayable event buffers."""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import AsyncGenerator, AsyncIterator, Deque, Dict, Optional, Tuple
+
+from ag_ui.core import BaseEvent, EventType, RunErrorEvent
+from ag_ui.encoder import EventEncoder
+
+from api.src.runs.store import get_run_store
+from api.src.settings import ConfiguredBaseSettings
+from api.src.utils.metrics import (
+    active_runs,
+    metrics,
+    observe_stream,
+    pending_runs,
+    retained_runs,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class RunManagerSettings(ConfiguredBaseSettings):
+    """Settings for executing runs."""
+
+    run_eager_start: bool = False
+    """Whether runs start when created rather than when streamed, for a single worker only"""
+    run_buffer_size: int = 2048
+    """Maximum number of events buffered per run for replay to reconnecting clients"""
+    run_grace_period: float = 30.0
+    """Seconds a run keeps executing without a connected client before it is cancelled"""
+    run_retention: float = 60.0
+    """Seconds a finished run is kept so clients can replay its events"""
+
+
+# region Run
+
+
+class Run:
+    """A run executing in the background, buffering its events for any number of readers.
+
+    Events are numbered with increasing sequence IDs and kept in a ring buffer, so a client which
+    reconnects with the ID of the last event it received resumes where it left off without
+    re-running the agent. A run with no readers is cancelled after the grace period.
+    """
+
+    def __init__(
+        self,
+        run_id: str,
+        generator: AsyncGenerator[str, None],
+        settings: RunManagerSettings,
+    ):
+        self.run_id = run_id
+        self.finished_at: Optional[float] = None
+        self._settings = settings
+        self._events: Deque[Tuple[int, str]] = deque(maxlen=settings.run_buffer_size)
+        self._sequence = 0
+        self._updated = asyncio.Event()
+        self._readers = 0
+        self._grace_timer: Optional[asyncio.TimerHandle] = None
+        self._task = asyncio.create_task(self._execute(generator))
+        self._start_grace_timer()
+
+    @property
+    def done(self) -> bool:
+        """Whether the run has finished executing."""
+        return self.finished_at is not None
+
+    def cancel(self) -> None:
+        """Cancel the run."""
+        self._task.cancel()
+
+    def can_resume(self, last_event_id: Optional[int]) -> bool:
+        """Check whether every event after an event ID is still buffered.
+
+        Args:
+            last_event_id (Optional[int]): The ID of the last event the client received, None
+                if it received none.
+
+        Returns:
+            bool: False if some of the later events were dropped from the buffer.
+
+        """
+        oldest = self._events[0][0] if self._events else self._sequence + 1
+        return (last_event_id or 0) >= oldest - 1
+
+    def _append(self, data: str) -> None:
+        self._sequence += 1
+        self._events.append((self._sequence, data))
+
+        # wake every reader waiting for the next event
+        self._updated.set()
+        self._updated = asyncio.Event()
+
+    async def _execute(self, generator: AsyncGenerator[str, None]) -> None:
+        try:
+            async for data in generator:
+                self._append(data)
+        except asyncio.CancelledError:
+            logger.info("Run %s cancelled", self.run_id)
+            raise
+        except Exception as err:  # pylint: disable=broad-exception-caught
+            logger.exception("Run %s failed", self.run_id)
+            self._append(
+                EventEncoder().encode(
+                    RunErrorEvent(type=EventType.RUN_ERROR, message=str(err))
+                )
+            )
+        finally:
+            await generator.aclose()
+            self.finished_at = time.monotonic()
+            self._cancel_grace_timer()
+            self._updated.set()
+
+    def _start_grace_timer(self) -> None:
+        if self._readers == 0 and not self.done:
+            self._grace_timer = asyncio.get_running_loop().call_later(
+                self._settings.run_grace_period, self.cancel
+            )
+
+    def _cancel_grace_timer(self) -> None:
+        if self._grace_timer is not None:
+            self._grace_timer.cancel()
+            self._grace_timer = None
+
+    async def stream(self, last_event_id: Optional[int] = None) -> AsyncIterator[str]:
+        """Stream the run's events as SSE messages, replaying any buffered events first.
+
+        If events the client has not received were dropped from the buffer, e.g. because it fell
+        too far behind, the stream ends with a `RUN_ERROR` event rather than skipping them.
+
+        Args:
+            last_event_id (Optional[int], optional): The ID of the last event the client
+                received. Only later events are sent. Defaults to None, sending every event.
+
+        Yields:
+            str: SSE messages, each with its sequence ID.
+
+        """
+        self._readers += 1
+        self._cancel_grace_timer()
+        try:
+            cursor = last_event_id or 0
+            while True:
+                updated = self._updated
+                if not self.can_resume(cursor):
+                    logger.warning(
+                        "Run %s dropped events after %s before they were read",
+                        self.run_id,
+                        cursor,
+                    )
+                    # no ID, the client has not received the events after the cursor
+                    yield EventEncoder().encode(
+                        RunErrorEvent(
+                            type=EventType.RUN_ERROR,
+                            message=f"Events after {cursor} are no longer buffered",
+                        )
+                    )
+                    return
+
+                for sequence, data in list(self._events):
+                    if sequence > cursor:
+                        cursor = sequence
+                        yield f"id: {sequence}\n{data}"
+
+                if self.done and cursor >= self._sequence:
+                    return
+                await updated.wait()
+        finally:
+            self._readers -= 1
+            self._start_grace_timer()
+
+
+async def catch_run_error(
+    run_id: str, events: AsyncGenerator[BaseEvent, None]
+) -> AsyncGenerator[BaseEvent, None]:
+    """Yield a run's events, ending with a `RUN_ERROR` event rather than raising if the run fails.
+
+    Runs streamed in the request that started them use this, as `Run` does for background runs.
+
+    Args:
+        run_id (str): The ID of the run.
+        events (AsyncGenerator[BaseEvent, None]): The run's events.
+
+    Yields:
+        BaseEvent: The run's events.
+
+    """
+    try:
+        async for event in events:
+            yield event
+    except Exception as err:  # pylint: disable=broad-exception-caught
+        logger.exception("Run %s failed", run_id)
+        yield RunErrorEvent(type=EventType.RUN_ERROR, message=str(err))
+    finally:
+        await events.aclose()
+
+
+# endregion Run
+
+
+# region Run Manager
+
+
+class RunManager:
+    """Manager of the runs executing in this process."""
+
+    def __init__(self, namespace: str, settings: RunManagerSettings):
+        self.namespace = namespace
+        self.settings = settings
+        self._runs: Dict[str, Run] = {}
+
+    def __len__(self) -> int:
+        """Return the number of runs still executing."""
+        return len([run for run in self._runs.values() if not run.done])
+
+    def _purge(self) -> None:
+        expired = time.monotonic() - self.settings.run_retention
+        for run_id in [
+            run_id
+            for run_id, run in self._runs.items()
+            if run.done and run.finished_at <= expired
+        ]:
+            del self._runs[run_id]
+
+    def start(self, run_id: str, generator: AsyncGenerator[str, None]) -> Run:
+        """Start executing a run in the background.
+
+        Args:
+            run_id (str): The ID of the run.
+            generator (AsyncGenerator[str, None]): The generator producing the run's SSE events.
+
+        Returns:
+            Run: The executing run.
+
+        """
+        self._purge()
+        if run_id in self._runs:
+            self._runs[run_id].cancel()
+
+        run = Run(run_id, observe_stream(self.namespace, generator), self.settings)
+        self._runs[run_id] = run
+        return run
+
+    def get(self, run_id: str) -> Optional[Run]:
+        """Get a run which is executing or was recently finished.
+
+        Args:
+            run_id (str): The ID of the run.
+
+        Returns:
+            Optional[Run]: The run, or None if it is unknown to this process.
+
+        """
+        self._purge()
+        return self._runs.get(run_id)
+
+    async def close(self) -> None:
+        """Cancel every run and wait for them to finish."""
+        runs, self._runs = list(self._runs.values()), {}
+        for run in runs:
+            run.cancel()
+        await asyncio.gather(*[run._task for run in runs], return_exceptions=True)
+
+
+_run_managers: Dict[str, RunManager] = {}
+
+
+def get_run_manager(namespace: str) -> RunManager:
+    """Get the run manager for a namespace.
+
+    Args:
+        namespace (str): The namespace of the runs, e.g. the name of the service.
+
+    Returns:
+        RunManager: The run manager for the namespace.
+
+    """
+    if namespace not in _run_managers:
+        _run_managers[namespace] = RunManager(namespace, RunManagerSettings())
+    return _run_managers[namespace]
+
+
+async def close_run_managers() -> None:
+    """Cancel the runs of every run manager."""
+    await asyncio.gather(*[manager.close() for manager in _run_managers.values()])
+
+
+@metrics.collector
+async def collect_run_metrics() -> None:
+    """Set the gauges of executing, retained and pending runs for each namespace."""
+    for namespace, manager in _run_managers.items():
+        active_runs.labels(namespace).set(len(manager))
+        retained_runs.labels(namespace).set(len(manager._runs))
+        stats = await get_run_store(namespace).stats()
+        pending_runs.labels(namespace).set(stats.entries)
+
+
+def parse_last_event_id(value: Optional[str]) -> Optional[int]:
+    """Parse the value of a `Last-Event-ID` header.
+
+    Args:
+        value (Optional[str]): The header value.
+
+    Returns:
+        Optional[int]: The sequence ID of the last event, or None if the header is missing or
+            invalid.
+
+    """
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+# endregion Run Manager
@@ -0,0 +1,310 @@
+"""Bounded, expiring stores for pending runs."""
+
+import asyncio
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Annotated, Literal, Optional, Tuple
+
+from pydantic import Field
+
+from api.src.pydantic import ConfiguredBaseModel
+from api.src.settings import ConfiguredBaseSettings
+
+
+class RunStoreSettings(ConfiguredBaseSettings):
+    """Settings for the run store."""
+
+    run_store_backend: Literal["memory", "sqlite"] = "memory"
+    """Backend holding pending runs; use `sqlite` to share runs between workers"""
+    run_store_path: Path = Path(".jarvis/runs.sqlite3")
+    """Path of the SQLite database used by the `sqlite` backend"""
+    run_store_ttl: float = 300.0
+    """Seconds a pending run is kept before it expires"""
+    run_store_max_entries: int = 1000
+    """Maximum number of pending runs kept per namespace"""
+    run_store_max_bytes: int = 16 * 1024 * 1024
+    """Maximum total size in bytes of the pending runs kept per namespace"""
+
+
+class RunStoreStats(ConfiguredBaseModel):
+    """Statistics for a run store."""
+
+    entries: Annotated[int, Field(description="Number of pending runs in the store")]
+    nbytes: Annotated[int, Field(description="Total size in bytes of pending runs")]
+    evictions: Annotated[
+        int, Field(description="Runs evicted to stay within the store's limits")
+    ]
+    expirations: Annotated[int, Field(description="Runs removed after their TTL")]
+
+
+# region Run Store
+
+
+class RunStore(ABC):
+    """Store of pending runs, keyed by run ID.
+
+    A run is stored when it is started and taken exactly once when its stream is opened. Entries
+    expire after `ttl` seconds, and the oldest entries are evicted first (FIFO) to stay within
+    `max_entries` and `max_bytes`. As an entry is only ever read by taking it, evicting by age is
+    the same as evicting the least recently used. Sizes are the UTF-8 encoded length of the payload.
+    """
+
+    def __init__(self, namespace: str, settings: RunStoreSettings):
+        self.namespace = namespace
+        self.ttl = settings.run_store_ttl
+        self.max_entries = settings.run_store_max_entries
+        self.max_bytes = settings.run_store_max_bytes
+        self.evictions = 0
+        self.expirations = 0
+
+    @abstractmethod
+    async def put(self, run_id: str, payload: str) -> None:
+        """Store a pending run.
+
+        Args:
+            run_id (str): The ID of the run.
+            payload (str): The serialised run.
+
+        """
+
+    @abstractmethod
+    async def pop(self, run_id: str) -> Optional[str]:
+        """Remove and return a pending run.
+
+        Args:
+            run_id (str): The ID of the run.
+
+        Returns:
+            Optional[str]: The serialised run, or None if it does not exist or has expired.
+
+        """
+
+    @abstractmethod
+    async def stats(self) -> RunStoreStats:
+        """Return statistics for the store.
+
+        Returns:
+            RunStoreStats: The number and size of the pending runs and eviction counters.
+
+        """
+
+
+class MemoryRunStore(RunStore):
+    """In-process run store.
+
+    Runs stored here can only be streamed from the worker which started them.
+    """
+
+    def __init__(self, namespace: str, settings: RunStoreSettings):
+        super().__init__(namespace, settings)
+        self._entries: OrderedDict[str, Tuple[float, int, str]] = OrderedDict()
+        self._nbytes = 0
+
+    def _remove(self, run_id: str) -> str:
+        _, nbytes, payload = self._entries.pop(run_id)
+        self._nbytes -= nbytes
+        return payload
+
+    def _purge(self) -> None:
+        now = time.monotonic()
+        for run_id in [
+            k for k, (expires, _, _) in self._entries.items() if expires <= now
+        ]:
+            self._remove(run_id)
+            self.expirations += 1
+
+        # evict the oldest runs until both limits are met
+        while self._entries and (
+            len(self._entries) > self.max_entries or self._nbytes > self.max_bytes
+        ):
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    async def put(self, run_id: str, payload: str) -> None:
+        """Store a pending run in memory."""
+        if run_id in self._entries:
+            self._remove(run_id)
+
+        nbytes = len(payload.encode())
+        self._entries[run_id] = (time.monotonic() + self.ttl, nbytes, payload)
+        self._nbytes += nbytes
+        self._purge()
+
+    async def pop(self, run_id: str) -> Optional[str]:
+        """Remove and return a pending run from memory."""
+        self._purge()
+        if run_id not in self._entries:
+            return None
+        return self._remove(run_id)
+
+    async def stats(self) -> RunStoreStats:
+        """Return statistics for the runs held in memory."""
+        self._purge()
+        return RunStoreStats(
+            entries=len(self._entries),
+            nbytes=self._nbytes,
+            evictions=self.evictions,
+            expirations=self.expirations,
+        )
+
+
+class SqliteRunStore(RunStore):
+    """Run store backed by a local SQLite database in WAL mode.
+
+    Every worker on the host opens the same database, so a run started on one worker can be
+    streamed from another.
+    """
+
+    def __init__(self, namespace: str, settings: RunStoreSettings):
+        super().__init__(namespace, settings)
+        settings.run_store_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            settings.run_store_path,
+            check_same_thread=False,
+            isolation_level=None,
+            timeout=30,
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS runs (
+                namespace TEXT NOT NULL,
+                run_id TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                nbytes INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (namespace, run_id)
+            )
+            """)
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS runs_created_at ON runs (namespace, created_at)"
+        )
+
+    def _purge(self, cursor: sqlite3.Cursor) -> None:
+        cursor.execute(
+            "DELETE FROM runs WHERE namespace = ? AND expires_at <= ?",
+            (self.namespace, time.time()),
+        )
+        self.expirations += cursor.rowcount
+
+        entries, nbytes = cursor.execute(
+            "SELECT COUNT(*), COALESCE(SUM(nbytes), 0) FROM runs WHERE namespace = ?",
+            (self.namespace,),
+        ).fetchone()
+        if entries <= self.max_entries and nbytes <= self.max_bytes:
+            return
+
+        # evict the oldest runs until both limits are met
+        evict = []
+        rows = cursor.execute(
+            "SELECT run_id, nbytes FROM runs WHERE namespace = ? ORDER BY created_at",
+            (self.namespace,),
+        ).fetchall()
+        for run_id, size in rows:
+            if entries <= self.max_entries and nbytes <= self.max_bytes:
+                break
+            evict.append((self.namespace, run_id))
+            entries -= 1
+            nbytes -= size
+
+        cursor.executemany("DELETE FROM runs WHERE namespace = ? AND run_id = ?", evict)
+        self.evictions += len(evict)
+
+    def _put(self, run_id: str, payload: str) -> None:
+        now = time.time()
+        with self._lock:
+            cursor = self._connection.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                cursor.execute(
+                    "INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        self.namespace,
+                        run_id,
+                        payload,
+                        len(payload.encode()),
+                        now + self.ttl,
+                        now,
+                    ),
+                )
+                self._purge(cursor)
+                cursor.execute("COMMIT")
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+
+    def _pop(self, run_id: str) -> Optional[str]:
+        with self._lock:
+            cursor = self._connection.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                row = cursor.execute(
+                    "SELECT payload FROM runs "
+                    "WHERE namespace = ? AND run_id = ? AND expires_at > ?",
+                    (self.namespace, run_id, time.time()),
+                ).fetchone()
+                cursor.execute(
+                    "DELETE FROM runs WHERE namespace = ? AND run_id = ?",
+                    (self.namespace, run_id),
+                )
+                cursor.execute("COMMIT")
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+        return row[0] if row else None
+
+    def _stats(self) -> RunStoreStats:
+        with self._lock:
+            entries, nbytes = self._connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(nbytes), 0) FROM runs "
+                "WHERE namespace = ? AND expires_at > ?",
+                (self.namespace, time.time()),
+            ).fetchone()
+        return RunStoreStats(
+            entries=entries,
+            nbytes=nbytes,
+            evictions=self.evictions,
+            expirations=self.expirations,
+        )
+
+    async def put(self, run_id: str, payload: str) -> None:
+        """Store a pending run in the database."""
+        await asyncio.to_thread(self._put, run_id, payload)
+
+    async def pop(self, run_id: str) -> Optional[str]:
+        """Remove and return a pending run from the database."""
+        return await asyncio.to_thread(self._pop, run_id)
+
+    async def stats(self) -> RunStoreStats:
+        """Return statistics for the runs held in the database."""
+        return await asyncio.to_thread(self._stats)
+
+
+@lru_cache(maxsize=None)
+def get_run_store(namespace: str) -> RunStore:
+    """Get the run store for a namespace, using the backend configured in the settings.
+
+    Args:
+        namespace (str): The namespace of the runs, e.g. the name of the service.
+
+    Returns:
+        RunStore: The run store for the namespace.
+
+    """
+    settings = RunStoreSettings()
+    match settings.run_store_backend:
+        case "sqlite":
+            return SqliteRunStore(namespace, settings)
+        case _:
+            return MemoryRunStore(namespace, settings)
+
+
+# endregion Run Store
@@ -6,7 +6,6 @@ from typing import Annotated
 
 from pydantic import BeforeValidator
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from uvicorn.logging import DefaultFormatter
 
 
 class ConfiguredBaseSettings(BaseSettings):
@@ -33,6 +32,10 @@ class Settings(ConfiguredBaseSettings):
         int, BeforeValidator(lambda x: logging.getLevelNamesMapping()[x])
     ] = "INFO"
 
+    # Chat settings
+    chat_max_concurrent_agents: int = 4
+    """Maximum number of agents the chat orchestrator runs at the same time in one turn"""
+
     # Other settings can be added here as needed
 
 
@@ -47,13 +50,18 @@ def get_settings() -> Settings:
     return Settings()
 
 
-# elsewhere:
-env = get_settings()
+def configure_logging() -> None:
+    """Configure logging at the level in the settings, using uvicorn's formatter.
+
+    Called when the application starts rather than on import, so importing the API does not build
+    the settings.
+    """
+    from uvicorn.logging import DefaultFormatter
 
-# Configure logging
-logging.basicConfig(level=env.log_level)
+    logging.basicConfig(level=get_settings().log_level)
 
-# Set the default formatter for all loggers to the uvicorn DefaultFormatter
-root_logger = logging.getLogger()
-for handler in root_logger.handlers:
-    handler.setFormatter(DefaultFormatter(fmt="%(levelprefix)s %(message)s"))
+    # Set the default formatter for all loggers to the uvicorn DefaultFormatter
+    root_logger = logging.getLogger()
+    root_logger.setLevel(get_settings().log_level)
+    for handler in root_logger.handlers:
+        handler.setFormatter(DefaultFormatter(fmt="%(levelprefix)s %(message)s"))
@@ -1,16 +1,16 @@
 """Base class for tools."""
 
-import json
-from typing import Any, Generic, Type, TypeVar, Union, overload
+from typing import Annotated, Any, Generic, Type, TypeVar, Union, overload
 
 from openai.types.chat.chat_completion_message_tool_call import (
     ChatCompletionMessageToolCall,
 )
 from openai.types.chat.chat_completion_tool_param import ChatCompletionToolParam
-from pydantic import BaseModel, PrivateAttr, ValidationError
+from pydantic import BaseModel, Field, ValidationError
 
 from api.src.messages.create import ChatCompletionToolMessageParam, create_message
 from api.src.openai.tools import create_tool
+from api.src.pydantic import ConfiguredBaseModel
 from api.src.utils.options import BaseOptions, validate_options
 
 T = TypeVar("T", bound=BaseModel)
@@ -23,6 +23,15 @@ class BaseToolOptions(BaseOptions):
     tool_call: ChatCompletionMessageToolCall
 
 
+class ToolCallContext(ConfiguredBaseModel, Generic[T]):
+    """Context for a single invocation of a tool."""
+
+    tool_call_id: Annotated[
+        str, Field(description="ID of the tool call being answered")
+    ]
+    args: Annotated[T, Field(description="The validated arguments for the tool call")]
+
+
 class BaseTool(Generic[T]):
     """Base class for tools."""
 
@@ -33,9 +42,6 @@ class BaseTool(Generic[T]):
     strict: bool = True
     """Whether to enforce strict validation of tool arguments."""
 
-    _tool_call_id: str | None = PrivateAttr(default=None)
-    _tool_args: T | None = PrivateAttr(default=None)
-
     @overload
     async def run(self, options: BaseToolOptions) -> ChatCompletionToolMessageParam: ...
 
@@ -51,26 +57,27 @@ class BaseTool(Generic[T]):
 
     def initialise_tool_call(
         self, options: BaseToolOptions
-    ) -> ChatCompletionToolMessageParam | None:
-        """Initialise the tool with the provided options.
+    ) -> Union[ToolCallContext[T], ChatCompletionToolMessageParam]:
+        """Parse and validate a tool call into the context for a single invocation.
 
-        Parses and validates the tool call arguments using the tool's schema. If validation fails,
-        returns a tool message containing the validation error. If arguments are missing, returns
-        a tool message indicating that tool arguments must be set. Otherwise, returns None.
+        The context is returned rather than stored on the tool, so a single tool instance can serve
+        any number of concurrent calls. If validation fails, returns a tool message containing the
+        validation error. If arguments are missing, returns a tool message indicating that tool
+        arguments must be set.
 
         Args:
             options (BaseToolOptions): The options containing the tool call and its arguments.
 
         Returns:
-            ChatCompletionToolMessageParam | None: A tool message with error details if validation
-            fails, or None if initialization is successful.
+            Union[ToolCallContext[T], ChatCompletionToolMessageParam]: The context for the call, or
+                a tool message with error details if validation fails.
 
         """
-        self._tool_call_id = options.tool_call.id
-
         try:
-            args = json.loads(options.tool_call.function.arguments)
-            self._tool_args = self.tool_call_schema.model_validate(args)
+            # parse and validate the arguments in one pass with the model's compiled validator
+            tool_args = self.tool_call_schema.model_validate_json(
+                options.tool_call.function.arguments
+            )
         except ValidationError as err:
             # add a message for the agent
             return create_message(
@@ -80,15 +87,15 @@ class BaseTool(Generic[T]):
                 tool_call_id=options.tool_call.id,
             )
 
-        if not self._tool_args:
+        if not tool_args:
             return create_message(
                 content="Tool args must be set.",
                 role="tool",
                 name=self.name,
-                toolCallId=options.tool_call.id,
+                tool_call_id=options.tool_call.id,
             )
 
-        return None
+        return ToolCallContext(tool_call_id=options.tool_call.id, args=tool_args)
 
     @property
     def card(self) -> ChatCompletionToolParam:
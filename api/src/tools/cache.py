@@ -0,0 +1,205 @@
+"""TTL caches for the results of read-only tools."""
+
+import asyncio
+import logging
+import time
+from typing import Annotated, Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple
+
+from cachetools import LRUCache
+from mcp.types import CallToolResult
+from pydantic import BaseModel, Field
+
+from api.src.pydantic import ConfiguredBaseModel
+from api.src.utils.priority import Priority, prioritise
+
+logger = logging.getLogger(__name__)
+
+
+class ToolCachePolicy(ConfiguredBaseModel):
+    """How the results of a read-only tool are cached."""
+
+    ttl: Annotated[
+        float,
+        Field(gt=0, description="Seconds a result is fresh and served from cache"),
+    ]
+    stale_while_revalidate: Annotated[
+        float,
+        Field(
+            default=0,
+            ge=0,
+            description="Seconds after `ttl` a stale result is still served while it is "
+            "refreshed in the background",
+        ),
+    ]
+    max_entries: Annotated[
+        int, Field(default=256, gt=0, description="Maximum number of cached results")
+    ]
+    key: Annotated[
+        Optional[Callable[[BaseModel], Hashable]],
+        Field(
+            default=None,
+            description="Derives the cache key from the validated arguments (default: the "
+            "arguments as JSON)",
+        ),
+    ]
+    invalidated_by: Annotated[
+        Set[str],
+        Field(
+            default_factory=set,
+            description="Tools whose successful calls clear this tool's cached results",
+        ),
+    ]
+
+
+class ToolCacheStats(ConfiguredBaseModel):
+    """Statistics for a tool's result cache."""
+
+    hits: Annotated[int, Field(description="Calls answered with a fresh result")]
+    stale_hits: Annotated[int, Field(description="Calls answered with a stale result")]
+    misses: Annotated[int, Field(description="Calls made to the tool")]
+    revalidations: Annotated[
+        int, Field(description="Stale results refreshed in the background")
+    ]
+    invalidations: Annotated[int, Field(description="Times the cache was cleared")]
+    entries: Annotated[int, Field(description="Number of cached results")]
+
+
+# region Tool Result Cache
+
+
+class ToolResultCache:
+    """LRU cache of a tool's results with a TTL and stale-while-revalidate.
+
+    Only successful results are cached. A result older than the TTL but within the
+    stale-while-revalidate window is returned immediately while a single background call refreshes
+    it.
+    """
+
+    def __init__(self, policy: ToolCachePolicy):
+        self.policy = policy
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.invalidations = 0
+        self._results: LRUCache[Hashable, Tuple[float, CallToolResult]] = LRUCache(
+            maxsize=policy.max_entries
+        )
+        self._refreshing: Dict[Hashable, asyncio.Task] = {}
+        # bumped by `invalidate`, so calls started before it do not store their results
+        self._generation = 0
+
+    def key(self, args: BaseModel) -> Hashable:
+        """Return the cache key for a call's validated arguments.
+
+        Args:
+            args (BaseModel): The validated arguments.
+
+        Returns:
+            Hashable: The cache key.
+
+        """
+        if self.policy.key is not None:
+            return self.policy.key(args)
+        return args.model_dump_json(exclude_none=True, exclude_unset=True)
+
+    async def _call(
+        self, key: Hashable, call: Callable[[], Awaitable[CallToolResult]]
+    ) -> CallToolResult:
+        generation = self._generation
+        result = await call()
+        if result is not None and not result.isError and generation == self._generation:
+            self._results[key] = (time.monotonic(), result)
+        return result
+
+    def _revalidate(
+        self, key: Hashable, call: Callable[[], Awaitable[CallToolResult]]
+    ) -> None:
+        if key in self._refreshing:
+            return
+
+        async def refresh():
+            try:
+                with prioritise(Priority.BACKGROUND):
+                    await self._call(key, call)
+                self.revalidations += 1
+            except Exception as err:  # pylint: disable=broad-exception-caught
+                logger.warning("Unable to revalidate cached tool result: %s", err)
+
+        task = asyncio.create_task(refresh())
+        self._refreshing[key] = task
+        # also runs when the task is cancelled before it starts, e.g. at shutdown
+        task.add_done_callback(lambda _: self._refreshed(key, task))
+
+    def _refreshed(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._refreshing.get(key) is task:
+            del self._refreshing[key]
+
+    async def get_or_call(
+        self, key: Hashable, call: Callable[[], Awaitable[CallToolResult]]
+    ) -> CallToolResult:
+        """Return the cached result for a key, calling the tool if it is missing or expired.
+
+        Args:
+            key (Hashable): The cache key, see `key`.
+            call (Callable[[], Awaitable[CallToolResult]]): Calls the tool.
+
+        Returns:
+            CallToolResult: The tool's result.
+
+        """
+        entry = self._results.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry[0]
+            if age < self.policy.ttl:
+                self.hits += 1
+                return entry[1]
+            if age < self.policy.ttl + self.policy.stale_while_revalidate:
+                self.stale_hits += 1
+                self._revalidate(key, call)
+                return entry[1]
+
+        self.misses += 1
+        return await self._call(key, call)
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """Clear cached results.
+
+        Refreshes in flight are cancelled, and results of calls started before the invalidation
+        are not stored, so a stale result is not written back.
+
+        Args:
+            key (Optional[Hashable], optional): The key to clear. Defaults to None, clearing every
+                result.
+
+        """
+        self.invalidations += 1
+        self._generation += 1
+        if key is None:
+            self._results.clear()
+            refreshing, self._refreshing = self._refreshing, {}
+        else:
+            self._results.pop(key, None)
+            task = self._refreshing.pop(key, None)
+            refreshing = {} if task is None else {key: task}
+        for task in refreshing.values():
+            task.cancel()
+
+    def stats(self) -> ToolCacheStats:
+        """Return statistics for the cache.
+
+        Returns:
+            ToolCacheStats: The cache's counters and number of entries.
+
+        """
+        return ToolCacheStats(
+            hits=self.hits,
+            stale_hits=self.stale_hits,
+            misses=self.misses,
+            revalidations=self.revalidations,
+            invalidations=self.invalidations,
+            entries=len(self._results),
+        )
+
+
+# endregion Tool Result Cache
@@ -1,12 +1,20 @@
 """Tool Registry Module."""
 
-from typing import List, Optional
+import asyncio
+import logging
+from typing import Dict, List, Optional, Set
 
+from mcp.types import ListToolsResult
 from openai.types.chat.chat_completion_tool_param import ChatCompletionToolParam
 
 from api.src.mcp.base import BaseHttpMcpSession, MCPTool
-from api.src.pydantic import model_from_schema
+from api.src.mcp.manifest import get_manifest_cache
+from api.src.openai.tools import ToolManifest
 from api.src.tools.base import BaseTool
+from api.src.tools.cache import ToolCachePolicy, ToolCacheStats, ToolResultCache
+from api.src.utils.priority import Priority, prioritise
+
+logger = logging.getLogger(__name__)
 
 
 class ToolRegistry:
@@ -17,6 +25,13 @@ class ToolRegistry:
 
     def __init__(self):
         self._tools = {}
+        self._version = 0
+        self._manifest: Optional[ToolManifest] = None
+        # names of the tools registered from each MCP server
+        self._servers: Dict[str, Set[str]] = {}
+        self._revalidations: Set[asyncio.Task] = set()
+        # result caches of read-only tools, by tool name
+        self._caches: Dict[str, ToolResultCache] = {}
 
     def __getitem__(self, name: str) -> BaseTool:
         """Get a tool by its name.
@@ -59,38 +74,179 @@ class ToolRegistry:
 
         """
         self._tools[tool.name] = tool
+        self._attach_caches()
+        self._invalidate()
+
+    def unregister_tool(self, name: str):
+        """Remove a tool from the registry.
+
+        Args:
+            name (str): The name of the tool to remove.
+
+        Raises:
+            KeyError: If no tool with the specified name is registered.
+
+        """
+        if name not in self._tools:
+            raise KeyError(f"Tool '{name}' is not registered.")
+        del self._tools[name]
+        self._invalidate()
+
+    def cache_tool(self, name: str, policy: ToolCachePolicy):
+        """Cache the results of a read-only tool.
+
+        The policy applies to the tool whether or not it is registered yet, and its cache is kept
+        when the tool is registered again.
+
+        Args:
+            name (str): The name of the tool.
+            policy (ToolCachePolicy): How the tool's results are cached.
+
+        """
+        self._caches[name] = ToolResultCache(policy)
+        self._attach_caches()
+
+    def invalidate_cache(self, name: Optional[str] = None):
+        """Clear cached tool results.
+
+        Args:
+            name (Optional[str], optional): The tool whose results are cleared. Defaults to None,
+                clearing the results of every tool.
+
+        """
+        for cache_name, cache in self._caches.items():
+            if name is None or cache_name == name:
+                cache.invalidate()
+
+    def cache_stats(self) -> Dict[str, ToolCacheStats]:
+        """Return statistics for the result cache of each cached tool.
+
+        Returns:
+            Dict[str, ToolCacheStats]: The statistics by tool name.
+
+        """
+        return {name: cache.stats() for name, cache in self._caches.items()}
+
+    def _attach_caches(self):
+        for tool in self._tools.values():
+            if isinstance(tool, MCPTool):
+                tool.cache = self._caches.get(tool.name)
+                tool.invalidates = [
+                    cache
+                    for cache in self._caches.values()
+                    if tool.name in cache.policy.invalidated_by
+                ]
+
+    def _invalidate(self):
+        self._version += 1
+        self._manifest = None
 
     async def register_mcp_server(
         self,
         mcp_server: BaseHttpMcpSession,
         allowed_tools: Optional[set[str]] = None,
+        cached_tools: Optional[Dict[str, ToolCachePolicy]] = None,
     ):
         """Register tools from a given MCP server session.
 
         Retrieves the list of tools available from the provided `mcp_server` session,
         and registers each tool whose name is included in the `allowed_tools` set (if specified).
         For each eligible tool, constructs an `MCPTool` instance with the appropriate
-        name, description, input schema, and session, then registers it.
+        name, description, input schema, and session, then registers it. The model for each tool's
+        arguments is built from its input schema when the tool is first used.
+
+        The listed tools are cached on disk. When a cached list exists its tools are registered
+        immediately and the list is revalidated against the server in the background, see
+        `revalidating`.
 
         Args:
             mcp_server (BaseHttpMcpSession): The MCP server session to retrieve tools from.
             allowed_tools (Optional[set[str]], optional): A set of tool names to allow for
                 registration. If None, all tools from the server will be registered. Defaults to
                 None.
+            cached_tools (Optional[Dict[str, ToolCachePolicy]], optional): Cache policies for the
+                server's read-only tools, by tool name. Defaults to None.
 
         """
+        for name, policy in (cached_tools or {}).items():
+            self.cache_tool(name, policy)
+
+        cache = get_manifest_cache()
+        cached = await cache.load(mcp_server.pool_key)
+        if cached is not None:
+            self._register_mcp_tools(mcp_server, cached, allowed_tools)
+            task = asyncio.create_task(
+                self._revalidate_mcp_server(mcp_server, cached, allowed_tools)
+            )
+            self._revalidations.add(task)
+            task.add_done_callback(self._revalidations.discard)
+            return
+
         tools = await mcp_server.list_tools()
+        self._register_mcp_tools(mcp_server, tools, allowed_tools)
+        await cache.save(mcp_server.pool_key, tools)
+
+    def _register_mcp_tools(
+        self,
+        mcp_server: BaseHttpMcpSession,
+        tools: ListToolsResult,
+        allowed_tools: Optional[set[str]],
+    ):
+        registered = set()
         for tool in tools.tools:
             if allowed_tools is None or tool.name in allowed_tools:
                 mcp_tool = MCPTool(
                     name=tool.name,
                     description=tool.description,
-                    tool_call_schema=model_from_schema(tool.name, tool.inputSchema),
+                    tool_call_schema=tool.inputSchema,
                     session=mcp_server,
                 )
                 self.register_tool(mcp_tool)
+                registered.add(tool.name)
+
+        # remove tools the server no longer lists
+        for name in self._servers.get(mcp_server.pool_key, set()) - registered:
+            self.unregister_tool(name)
+        self._servers[mcp_server.pool_key] = registered
+
+    async def _revalidate_mcp_server(
+        self,
+        mcp_server: BaseHttpMcpSession,
+        cached: ListToolsResult,
+        allowed_tools: Optional[set[str]],
+    ):
+        try:
+            with prioritise(Priority.BACKGROUND):
+                tools = await mcp_server.list_tools()
+        except Exception as err:  # pylint: disable=broad-exception-caught
+            logger.warning(
+                "Unable to revalidate the tools of %s, using the cached tools: %s",
+                mcp_server.pool_key,
+                err,
+            )
+            return
+
+        if tools != cached:
+            logger.info("Tools of %s have changed", mcp_server.pool_key)
+            self._register_mcp_tools(mcp_server, tools, allowed_tools)
+            await get_manifest_cache().save(mcp_server.pool_key, tools)
+
+    @property
+    def revalidating(self) -> bool:
+        """Whether tools registered from cached manifests are being revalidated."""
+        return bool(self._revalidations)
+
+    @property
+    def manifest(self) -> ToolManifest:
+        """Return the manifest of registered tools, built when the tools last changed."""
+        if self._manifest is None:
+            self._manifest = ToolManifest.build(
+                self._version,
+                [i.card for i in self._tools.values() if isinstance(i, BaseTool)],
+            )
+        return self._manifest
 
     @property
     def tools(self) -> List[ChatCompletionToolParam]:
         """Return a list of all registered tools."""
-        return [i.card for i in self._tools.values() if isinstance(i, BaseTool)]
+        return list(self.manifest.tools)
@@ -0,0 +1,362 @@
+"""Record and replay of LLM and MCP traffic."""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from functools import lru_cache
+from pathlib import Path
+from typing import (
+    Annotated,
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    List,
+    Literal,
+    Optional,
+    TextIO,
+    Tuple,
+    TypeVar,
+)
+
+from pydantic import BaseModel, Field
+from pydantic_core import to_jsonable_python
+
+from api.src.pydantic import ConfiguredBaseModel
+from api.src.settings import ConfiguredBaseSettings
+from api.src.utils.metrics import cassette_calls, cassette_fallbacks, metrics
+
+logger = logging.getLogger(__name__)
+
+M = TypeVar("M", bound=BaseModel)
+
+EntryKind = Literal["completion", "call_tool", "list_tools"]
+
+
+class CassetteSettings(ConfiguredBaseSettings):
+    """Settings for recording and replaying LLM and MCP traffic."""
+
+    cassette_mode: Literal["off", "record", "replay"] = "off"
+    """Whether LLM and MCP calls are recorded to, or replayed from, the cassette"""
+    cassette_path: Path = Path(".jarvis/cassette.jsonl")
+    """Path of the cassette, compressed when it ends in `.gz`"""
+    cassette_time_scale: float = 1.0
+    """Multiplier of the recorded delays when replaying, 0 replays without delay"""
+
+
+class CassetteEntry(ConfiguredBaseModel):
+    """A recorded call and its response."""
+
+    kind: Annotated[EntryKind, Field(description="The kind of call")]
+    name: Annotated[str, Field(description="The model or the tool called")]
+    key: Annotated[str, Field(description="Hash of the call's request")]
+    latency: Annotated[
+        float, Field(description="Seconds until the response, or the stream, started")
+    ]
+    response: Annotated[
+        Optional[Any],
+        Field(default=None, description="The response, unless it was streamed"),
+    ]
+    chunks: Annotated[
+        Optional[List[Tuple[float, Any]]],
+        Field(
+            default=None,
+            description="The streamed chunks, each with its offset in seconds from the start "
+            "of the stream",
+        ),
+    ]
+
+
+class CassetteStats(ConfiguredBaseModel):
+    """Statistics for the cassette."""
+
+    recorded: Annotated[int, Field(description="Calls recorded")]
+    replayed: Annotated[int, Field(description="Calls answered from the cassette")]
+    fallbacks: Annotated[
+        int,
+        Field(
+            description="Replayed calls answered by another request to the same model or tool"
+        ),
+    ]
+
+
+class CassetteMissError(LookupError):
+    """Raised when replaying a call the cassette has no response for."""
+
+
+def cassette_key(*parts: Any) -> str:
+    """Return the hash identifying a request in a cassette.
+
+    Args:
+        *parts (Any): The parts of the request, e.g. the server, tool and arguments.
+
+    Returns:
+        str: The SHA-256 hash of the parts' canonical JSON.
+
+    """
+    return hashlib.sha256(
+        json.dumps(to_jsonable_python(parts), sort_keys=True).encode()
+    ).hexdigest()
+
+
+# region Cassette
+
+
+class Cassette:
+    """Records LLM and MCP calls to a JSON lines file, or answers them from one.
+
+    In record mode each call is made and appended to the cassette with its latency, and streamed
+    completions with the offset of every chunk. In replay mode calls are answered from the cassette
+    after the recorded delays, multiplied by `CASSETTE_TIME_SCALE`. A call is matched by the hash of
+    its request, falling back to the recorded calls to the same model or tool in order, so
+    workloads which vary e.g. ids still replay.
+    """
+
+    def __init__(self, settings: CassetteSettings):
+        self.mode = settings.cassette_mode
+        self.path = settings.cassette_path
+        self.time_scale = settings.cassette_time_scale
+        self.recorded = 0
+        self.replayed = 0
+        self.fallbacks = 0
+        self._file: Optional[TextIO] = None
+        # recorded lines waiting to be written, appended on the event loop and written by a thread
+        self._pending: Deque[str] = deque()
+        self._file_lock = threading.Lock()
+        self._writer: Optional[asyncio.Future] = None
+        self._by_key: Dict[str, Deque[CassetteEntry]] = defaultdict(deque)
+        self._by_name: Dict[Tuple[str, str], List[CassetteEntry]] = defaultdict(list)
+        self._next: Dict[Tuple[str, str], int] = defaultdict(int)
+
+        if self.mode == "replay":
+            self._load()
+
+    def _open(self, mode: str) -> TextIO:
+        if self.path.suffix == ".gz":
+            return gzip.open(self.path, mode + "t", encoding="utf-8")
+        return open(self.path, mode, encoding="utf-8")
+
+    def _load(self) -> None:
+        with self._open("r") as file:
+            for line in file:
+                if line.strip():
+                    entry = CassetteEntry.model_validate_json(line)
+                    self._by_key[entry.key].append(entry)
+                    self._by_name[(entry.kind, entry.name)].append(entry)
+        logger.info(
+            "Replaying %d calls from %s",
+            sum(map(len, self._by_name.values())),
+            self.path,
+        )
+
+    def _write(self, entry: CassetteEntry) -> None:
+        self._pending.append(entry.model_dump_json(exclude_none=True) + "\n")
+        self.recorded += 1
+        if self._writer is None or self._writer.done():
+            self._start_writer()
+
+    def _start_writer(self) -> None:
+        # the file is written in a thread, so recording does not block the event loop
+        self._writer = asyncio.ensure_future(asyncio.to_thread(self._write_pending))
+        self._writer.add_done_callback(self._writer_done)
+
+    def _writer_done(self, writer: asyncio.Future) -> None:
+        if not writer.cancelled() and writer.exception() is not None:
+            # the lines stay buffered, the next call recorded or `close` tries again
+            logger.error("Failed to write the cassette", exc_info=writer.exception())
+            return
+        # lines appended after the thread found none left are written by another thread
+        if self._pending:
+            self._start_writer()
+
+    def _write_pending(self) -> None:
+        with self._file_lock:
+            if not self._pending:
+                return
+            if self._file is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._file = self._open("a")
+            while self._pending:
+                self._file.write(self._pending.popleft())
+            # flush once per batch rather than per call
+            self._file.flush()
+
+    def _find(self, kind: EntryKind, name: str, key: str) -> CassetteEntry:
+        entries = self._by_key.get(key)
+        if entries:
+            # calls with the same request are answered in the order they were recorded, the last
+            # answer repeats once they run out
+            entry = entries.popleft() if len(entries) > 1 else entries[0]
+        else:
+            recorded = self._by_name.get((kind, name))
+            if not recorded:
+                raise CassetteMissError(f"No recorded {kind} calls to {name}")
+            index = self._next[(kind, name)]
+            self._next[(kind, name)] = index + 1
+            entry = recorded[index % len(recorded)]
+            self.fallbacks += 1
+
+        self.replayed += 1
+        return entry
+
+    async def _sleep(self, seconds: float) -> None:
+        if self.time_scale and seconds > 0:
+            await asyncio.sleep(seconds * self.time_scale)
+
+    async def call(
+        self,
+        kind: EntryKind,
+        name: str,
+        key: str,
+        call: Callable[[], Awaitable[M]],
+        model: type[M],
+    ) -> M:
+        """Make a call which is not streamed, recording or replaying it.
+
+        Args:
+            kind (EntryKind): The kind of call.
+            name (str): The model or the tool called.
+            key (str): The hash of the request, see `cassette_key`.
+            call (Callable[[], Awaitable[M]]): Makes the call.
+            model (type[M]): The type of the response.
+
+        Returns:
+            M: The response.
+
+        """
+        if self.mode == "replay":
+            entry = self._find(kind, name, key)
+            await self._sleep(entry.latency)
+            return model.model_validate(entry.response)
+
+        start = time.monotonic()
+        response = await call()
+        if self.mode == "record":
+            self._write(
+                CassetteEntry(
+                    kind=kind,
+                    name=name,
+                    key=key,
+                    latency=time.monotonic() - start,
+                    response=response.model_dump(mode="json", exclude_unset=True),
+                )
+            )
+        return response
+
+    async def stream(
+        self,
+        name: str,
+        key: str,
+        call: Callable[[], Awaitable[AsyncIterator[M]]],
+        model: type[M],
+    ) -> AsyncIterator[M]:
+        """Start a streamed completion, recording or replaying it.
+
+        Args:
+            name (str): The model called.
+            key (str): The hash of the request, see `cassette_key`.
+            call (Callable[[], Awaitable[AsyncIterator[M]]]): Starts the stream.
+            model (type[M]): The type of the chunks.
+
+        Returns:
+            AsyncIterator[M]: The stream of chunks.
+
+        """
+        if self.mode == "replay":
+            entry = self._find("completion", name, key)
+            await self._sleep(entry.latency)
+            return self._replay_chunks(entry, model)
+
+        start = time.monotonic()
+        stream = await call()
+        if self.mode == "record":
+            return self._record_chunks(name, key, time.monotonic() - start, stream)
+        return stream
+
+    async def _replay_chunks(
+        self, entry: CassetteEntry, model: type[M]
+    ) -> AsyncIterator[M]:
+        start = time.monotonic()
+        for offset, chunk in entry.chunks or []:
+            if self.time_scale:
+                # keep to the recorded offsets, however long the consumer takes
+                delay = start + offset * self.time_scale - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            yield model.model_validate(chunk)
+
+    async def _record_chunks(
+        self, name: str, key: str, latency: float, stream: AsyncIterator[M]
+    ) -> AsyncIterator[M]:
+        start = time.monotonic()
+        chunks: List[Tuple[float, Any]] = []
+        try:
+            async for chunk in stream:
+                chunks.append(
+                    (
+                        time.monotonic() - start,
+                        chunk.model_dump(mode="json", exclude_unset=True),
+                    )
+                )
+                yield chunk
+        finally:
+            self._write(
+                CassetteEntry(
+                    kind="completion",
+                    name=name,
+                    key=key,
+                    latency=latency,
+                    chunks=chunks,
+                )
+            )
+
+    def close(self) -> None:
+        """Write the calls still buffered and close the cassette's file."""
+        self._write_pending()
+        with self._file_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def stats(self) -> CassetteStats:
+        """Return statistics for the cassette.
+
+        Returns:
+            CassetteStats: The number of recorded and replayed calls.
+
+        """
+        return CassetteStats(
+            recorded=self.recorded, replayed=self.replayed, fallbacks=self.fallbacks
+        )
+
+
+@lru_cache(maxsize=1)
+def get_cassette() -> Cassette:
+    """Get the cassette, configured from the environment.
+
+    Returns:
+        Cassette: The cassette.
+
+    """
+    return Cassette(CassetteSettings())
+
+
+@metrics.collector
+def collect_cassette_metrics() -> None:
+    """Set the cassette metrics from its statistics, once the cassette has been created."""
+    if get_cassette.cache_info().currsize == 0:
+        return
+    stats = get_cassette().stats()
+    cassette_calls.labels("recorded").set(stats.recorded)
+    cassette_calls.labels("replayed").set(stats.replayed)
+    cassette_fallbacks.labels().set(stats.fallbacks)
+
+
+# endregion Cassette
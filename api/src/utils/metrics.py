@@ -0,0 +1,598 @@
+"""In-process counters, gauges and histograms, exposed in the Prometheus text format."""
+
+import asyncio
+import inspect
+import logging
+import math
+from bisect import bisect_left
+from functools import lru_cache
+from typing import (
+    AsyncGenerator,
+    Awaitable,
+    Callable,
+    Dict,
+    Generic,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+from api.src.settings import ConfiguredBaseSettings
+
+logger = logging.getLogger(__name__)
+
+C = TypeVar("C")
+
+Collector = Callable[[], Union[None, Awaitable[None]]]
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+"""Upper bounds in seconds of the buckets of latency histograms"""
+
+
+class MetricsSettings(ConfiguredBaseSettings):
+    """Settings for metrics."""
+
+    metrics_loop_lag_interval: float = 0.5
+    """Seconds between samples of the event loop's lag, 0 disables sampling"""
+
+
+@lru_cache(maxsize=1)
+def get_metrics_settings() -> MetricsSettings:
+    """Get the metrics settings, configured from the environment.
+
+    Returns:
+        MetricsSettings: The metrics settings.
+
+    """
+    return MetricsSettings()
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = (
+        '{}="{}"'.format(
+            name,
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+        )
+        for name, value in zip(names, values)
+    )
+    return "{" + ",".join(pairs) + "}"
+
+
+# region Metrics
+
+
+class _Metric(Generic[C]):
+    """A metric with a child for each combination of label values.
+
+    Metrics are only recorded from the event loop's thread, so children are plain objects updated
+    without locks, and looking one up is a single dictionary access.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._children: Dict[Tuple[str, ...], C] = {}
+
+    def _child(self) -> C:
+        raise NotImplementedError
+
+    def labels(self, *values: str) -> C:
+        """Return the child for label values, creating it on first use.
+
+        Args:
+            *values (str): The value of each label, in the order the labels were declared.
+
+        Returns:
+            C: The child recording the metric for the values.
+
+        """
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.label_names):
+                raise ValueError(
+                    f"{self.name} expects the labels {self.label_names}, got {values}"
+                )
+            child = self._children[values] = self._child()
+        return child
+
+    def clear(self) -> None:
+        """Remove every child, e.g. before a collector sets the current values of a gauge."""
+        self._children.clear()
+
+    def _samples(self) -> Iterator[Tuple[str, str, float]]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        """Render the metric in the Prometheus text format.
+
+        Returns:
+            List[str]: The lines of the metric.
+
+        """
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        lines.extend(
+            f"{name}{labels} {_format_value(value)}"
+            for name, labels, value in self._samples()
+        )
+        return lines
+
+
+class Value:
+    """The value of a counter or gauge."""
+
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1) -> None:
+        """Add to the value."""
+        self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        """Subtract from the value."""
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        """Set the value."""
+        self.value = value
+
+
+class Total(Value):
+    """The value of a counter, which only increases, also when set from a collector's statistics.
+
+    Collectors set counters from the totals of objects which may be replaced, e.g. an agent
+    registered again, so a total lower than the last one set counts again from zero instead of
+    looking like a reset of the counter.
+    """
+
+    __slots__ = ("last",)
+
+    def __init__(self):
+        super().__init__()
+        self.last = 0.0
+
+    def set(self, value: float) -> None:
+        """Add what a total grew by since it was last set."""
+        self.value += value - self.last if value >= self.last else value
+        self.last = value
+
+
+class Counter(_Metric[Value]):
+    """A total which only increases."""
+
+    kind = "counter"
+
+    def _child(self) -> Value:
+        return Total()
+
+    def _samples(self) -> Iterator[Tuple[str, str, float]]:
+        for values, child in list(self._children.items()):
+            yield self.name, _format_labels(self.label_names, values), child.value
+
+
+class Gauge(Counter):
+    """A value which goes up and down."""
+
+    kind = "gauge"
+
+    def _child(self) -> Value:
+        return Value()
+
+
+class Observations:
+    """The observations of a histogram, counted by bucket."""
+
+    __slots__ = ("buckets", "counts", "sum")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """Record an observation."""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class Histogram(_Metric[Observations]):
+    """The distribution of observations, counted in buckets."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def _child(self) -> Observations:
+        return Observations(self.buckets)
+
+    def _samples(self) -> Iterator[Tuple[str, str, float]]:
+        names = (*self.label_names, "le")
+        for values, child in list(self._children.items()):
+            # counts are kept per bucket and made cumulative when rendered
+            total = 0
+            for bound, count in zip((*self.buckets, math.inf), child.counts):
+                total += count
+                yield (
+                    f"{self.name}_bucket",
+                    _format_labels(names, (*values, _format_value(bound))),
+                    total,
+                )
+            labels = _format_labels(self.label_names, values)
+            yield f"{self.name}_sum", labels, child.sum
+            yield f"{self.name}_count", labels, total
+
+
+# endregion Metrics
+
+
+# region Registry
+
+
+class MetricsRegistry:
+    """The metrics of the process, and collectors updating gauges when they are rendered."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Collector] = []
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"The metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(
+        self, name: str, documentation: str, labels: Sequence[str] = ()
+    ) -> Counter:
+        """Register a counter.
+
+        Args:
+            name (str): The name of the counter, ending `_total`.
+            documentation (str): What the counter counts.
+            labels (Sequence[str], optional): The names of the counter's labels. Defaults to ().
+
+        Returns:
+            Counter: The counter.
+
+        """
+        return self._register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Gauge:
+        """Register a gauge.
+
+        Args:
+            name (str): The name of the gauge.
+            documentation (str): What the gauge measures.
+            labels (Sequence[str], optional): The names of the gauge's labels. Defaults to ().
+
+        Returns:
+            Gauge: The gauge.
+
+        """
+        return self._register(Gauge(name, documentation, labels))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        """Register a histogram.
+
+        Args:
+            name (str): The name of the histogram.
+            documentation (str): What the histogram observes.
+            labels (Sequence[str], optional): The names of the histogram's labels. Defaults to ().
+            buckets (Sequence[float], optional): The upper bounds of the buckets. Defaults to
+                LATENCY_BUCKETS.
+
+        Returns:
+            Histogram: The histogram.
+
+        """
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def collector(self, collector: Collector) -> Collector:
+        """Register a function setting gauges each time the metrics are rendered.
+
+        Args:
+            collector (Collector): The function, which may be a coroutine function.
+
+        Returns:
+            Collector: The function, so it can be used as a decorator.
+
+        """
+        self._collectors.append(collector)
+        return collector
+
+    async def render(self) -> str:
+        """Run the collectors and render every metric in the Prometheus text format.
+
+        Returns:
+            str: The metrics.
+
+        """
+        for collector in self._collectors:
+            try:
+                result = collector()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception:  # pylint: disable=broad-exception-caught
+                logger.exception("Metrics collector %s failed", collector.__name__)
+
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+# endregion Registry
+
+
+# region Application Metrics
+
+llm_request_seconds = metrics.histogram(
+    "jarvis_llm_request_seconds",
+    "Seconds to get a completion, from the LLM or the completion cache",
+    ["model", "agent", "source"],
+)
+llm_tokens = metrics.counter(
+    "jarvis_llm_tokens_total",
+    "Tokens used by completions from the LLM",
+    ["model", "agent", "kind"],
+)
+mcp_call_seconds = metrics.histogram(
+    "jarvis_mcp_call_seconds", "Seconds to call an MCP tool", ["server", "tool"]
+)
+mcp_call_errors = metrics.counter(
+    "jarvis_mcp_call_errors_total",
+    "MCP tool calls which raised or returned an error",
+    ["server", "tool"],
+)
+tool_loop_iterations = metrics.histogram(
+    "jarvis_tool_loop_iterations",
+    "Rounds of tool calls made to answer a message",
+    ["agent"],
+    buckets=(0, 1, 2, 3, 4, 6, 8, 12, 16),
+)
+sse_events = metrics.counter(
+    "jarvis_sse_events_total", "SSE events produced by runs", ["service"]
+)
+sse_bytes = metrics.counter(
+    "jarvis_sse_bytes_total", "Bytes of SSE events produced by runs", ["service"]
+)
+sse_run_events = metrics.histogram(
+    "jarvis_sse_run_events",
+    "SSE events produced by each run",
+    ["service"],
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000),
+)
+sse_run_bytes = metrics.histogram(
+    "jarvis_sse_run_bytes",
+    "Bytes of SSE events produced by each run",
+    ["service"],
+    buckets=tuple(2**power for power in range(8, 22, 2)),
+)
+active_runs = metrics.gauge("jarvis_runs_active", "Runs still executing", ["service"])
+retained_runs = metrics.gauge(
+    "jarvis_runs_retained",
+    "Runs executing or kept so clients can replay their events",
+    ["service"],
+)
+pending_runs = metrics.gauge(
+    "jarvis_runs_pending",
+    "Runs stored until their stream is opened",
+    ["service"],
+)
+llm_queue_depth = metrics.gauge(
+    "jarvis_llm_queue_depth", "Completions waiting to start", ["deployment"]
+)
+llm_in_flight = metrics.gauge(
+    "jarvis_llm_in_flight", "Completions executing", ["deployment"]
+)
+llm_concurrency_limit = metrics.gauge(
+    "jarvis_llm_concurrency_limit",
+    "Current AIMD limit on concurrent completions",
+    ["deployment"],
+)
+llm_scheduled_requests = metrics.counter(
+    "jarvis_llm_scheduled_requests_total",
+    "Completions started by the scheduler, including retries",
+    ["deployment"],
+)
+llm_throttled_requests = metrics.counter(
+    "jarvis_llm_throttled_requests_total",
+    "Completions rejected with a 429",
+    ["deployment"],
+)
+llm_retried_requests = metrics.counter(
+    "jarvis_llm_retried_requests_total", "Completions retried", ["deployment"]
+)
+llm_queue_wait_seconds = metrics.counter(
+    "jarvis_llm_queue_wait_seconds_total",
+    "Total seconds completions waited to start",
+    ["deployment"],
+)
+llm_queue_wait_seconds_max = metrics.gauge(
+    "jarvis_llm_queue_wait_seconds_max",
+    "Longest a completion waited to start, in seconds",
+    ["deployment"],
+)
+priority_queued = metrics.gauge(
+    "jarvis_priority_queued",
+    "Calls waiting for a concurrency slot",
+    ["limiter", "priority"],
+)
+priority_started = metrics.counter(
+    "jarvis_priority_started_total",
+    "Calls given a concurrency slot",
+    ["limiter", "priority"],
+)
+priority_wait_seconds = metrics.counter(
+    "jarvis_priority_wait_seconds_total",
+    "Total seconds calls waited for a concurrency slot",
+    ["limiter", "priority"],
+)
+priority_wait_seconds_max = metrics.gauge(
+    "jarvis_priority_wait_seconds_max",
+    "Longest a call waited for a concurrency slot, in seconds",
+    ["limiter", "priority"],
+)
+completion_cache_lookups = metrics.counter(
+    "jarvis_completion_cache_lookups_total",
+    "Completion cache lookups, by the tier answering them or miss",
+    ["result"],
+)
+completion_cache_entries = metrics.gauge(
+    "jarvis_completion_cache_entries", "Completions cached in memory"
+)
+completion_cache_bytes = metrics.gauge(
+    "jarvis_completion_cache_bytes",
+    "Size in bytes of the completion cache's memory tier",
+)
+single_flight_calls = metrics.counter(
+    "jarvis_single_flight_calls_total",
+    "Calls of a single-flight group, by whether they executed or awaited an identical call",
+    ["group", "result"],
+)
+single_flight_in_flight = metrics.gauge(
+    "jarvis_single_flight_in_flight",
+    "Calls of a single-flight group currently executing",
+    ["group"],
+)
+mcp_sessions_open = metrics.gauge(
+    "jarvis_mcp_sessions_open", "Open pooled MCP sessions", ["pool"]
+)
+cassette_calls = metrics.counter(
+    "jarvis_cassette_calls_total",
+    "Calls recorded to or replayed from the cassette",
+    ["result"],
+)
+cassette_fallbacks = metrics.counter(
+    "jarvis_cassette_fallbacks_total",
+    "Replayed calls answered by another request to the same model or tool",
+)
+tool_cache_lookups = metrics.counter(
+    "jarvis_tool_cache_lookups_total",
+    "Calls of cached tools, by whether they were answered from the cache",
+    ["agent", "tool", "result"],
+)
+tool_cache_revalidations = metrics.counter(
+    "jarvis_tool_cache_revalidations_total",
+    "Stale tool results refreshed in the background",
+    ["agent", "tool"],
+)
+tool_cache_invalidations = metrics.counter(
+    "jarvis_tool_cache_invalidations_total",
+    "Times a tool's result cache was cleared",
+    ["agent", "tool"],
+)
+tool_cache_entries = metrics.gauge(
+    "jarvis_tool_cache_entries", "Results in a tool's cache", ["agent", "tool"]
+)
+event_loop_lag_seconds = metrics.histogram(
+    "jarvis_event_loop_lag_seconds",
+    "Seconds the event loop was late running a scheduled callback",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+)
+
+
+async def observe_stream(
+    service: str, stream: AsyncGenerator[str, None]
+) -> AsyncGenerator[str, None]:
+    """Count the SSE events and bytes of a run's stream as they pass through.
+
+    Args:
+        service (str): The service producing the run, e.g. `chat`.
+        stream (AsyncGenerator[str, None]): The run's encoded SSE events, closed when this
+            generator is.
+
+    Yields:
+        str: The events, unchanged.
+
+    """
+    events_total = sse_events.labels(service)
+    bytes_total = sse_bytes.labels(service)
+    events = 0
+    size = 0
+    try:
+        async for data in stream:
+            events += 1
+            nbytes = len(data.encode())
+            size += nbytes
+            events_total.inc()
+            bytes_total.inc(nbytes)
+            yield data
+    finally:
+        sse_run_events.labels(service).observe(events)
+        sse_run_bytes.labels(service).observe(size)
+        await stream.aclose()
+
+
+class LoopLagMonitor:
+    """Samples how late the event loop runs a callback, while it is entered.
+
+    A callback scheduled to run after the interval is late by however long other callbacks held
+    the loop, which is what every request waits for when the loop is busy.
+    """
+
+    def __init__(self, settings: Optional[MetricsSettings] = None):
+        self.interval = (settings or get_metrics_settings()).metrics_loop_lag_interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def __aenter__(self) -> "LoopLagMonitor":
+        """Start sampling."""
+        if self.interval > 0:
+            self._task = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        """Stop sampling."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        lag = event_loop_lag_seconds.labels()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag.observe(max(loop.time() - start - self.interval, 0.0))
+
+
+# endregion Application Metrics
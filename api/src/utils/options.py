@@ -1,10 +1,10 @@
 """Options module for the example."""
 
 import inspect
-from functools import wraps
+from functools import lru_cache, wraps
 from typing import Callable, ParamSpec, Type, TypeVar
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, TypeAdapter
 
 # Define a generic type variable bound to BaseOptions.
 T = TypeVar("T", bound="BaseModel")
@@ -12,13 +12,32 @@ P = ParamSpec("P")
 R = TypeVar("R")
 
 
+@lru_cache(maxsize=None)
+def get_type_adapter(expected: Type[T]) -> TypeAdapter[T]:
+    """Return a cached `TypeAdapter` for validating options.
+
+    Args:
+        expected (Type[T]): The options model.
+
+    Returns:
+        TypeAdapter[T]: The type adapter for the model.
+
+    """
+    return TypeAdapter(expected)
+
+
 def validate_options(expected: Type[T]) -> Callable[[Callable[P, R]], Callable[P, R]]:
     """Convert options to expected type.
 
     This decorator inspects the 'options' argument:
-      - If it is a dict, it converts it using `expected.model_validate`.
+      - If it is a dict, it converts it using a cached `TypeAdapter` for `expected`.
       - Otherwise, it passes the value along as-is.
 
+    The function's signature is inspected once, when it is decorated, so each call only looks up
+    the `options` argument by keyword or position. Coroutine functions are wrapped in a coroutine
+    function, and functions without an `options` parameter are returned unchanged. Callers which
+    already hold an `expected` instance can skip the wrapper entirely by calling `__wrapped__`.
+
     Note:
       For best type checking, consider annotating your function's `options` parameter
       as Union[T, dict] so that both types are accepted by static checkers.
@@ -27,20 +46,52 @@ def validate_options(expected: Type[T]) -> Callable[[Callable[P, R]], Callable[P
     if not issubclass(expected, BaseModel):
         raise ValueError("The expected type must be a subclass of BaseModel.")
 
+    adapter = get_type_adapter(expected)
+
     def decorator(func: Callable[P, R]) -> Callable[P, R]:
+        parameters = list(inspect.signature(func).parameters.values())
+        parameter = next((p for p in parameters if p.name == "options"), None)
+        if parameter is None:
+            return func
+
+        # the position of 'options' if it can be passed positionally
+        position = (
+            parameters.index(parameter)
+            if parameter.kind
+            in (
+                inspect.Parameter.POSITIONAL_ONLY,
+                inspect.Parameter.POSITIONAL_OR_KEYWORD,
+            )
+            else None
+        )
+        default = parameter.default if isinstance(parameter.default, dict) else None
+
+        def convert(args: tuple, kwargs: dict) -> tuple:
+            if "options" in kwargs:
+                if isinstance(kwargs["options"], dict):
+                    kwargs["options"] = adapter.validate_python(kwargs["options"])
+            elif position is not None and position < len(args):
+                if isinstance(args[position], dict):
+                    args = (
+                        *args[:position],
+                        adapter.validate_python(args[position]),
+                        *args[position + 1 :],
+                    )
+            elif default is not None:
+                kwargs["options"] = adapter.validate_python(default)
+            return args
+
+        if inspect.iscoroutinefunction(func):
+
+            @wraps(func)
+            async def async_wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+                return await func(*convert(args, kwargs), **kwargs)
+
+            return async_wrapper  # type: ignore
+
         @wraps(func)
         def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
-            # Bind the arguments to the function's signature.
-            sig = inspect.signature(func)
-            bound_args = sig.bind(*args, **kwargs)
-            bound_args.apply_defaults()
-
-            # If 'options' is present and is a dict, validate it.
-            if "options" in bound_args.arguments:
-                value = bound_args.arguments["options"]
-                if isinstance(value, dict):
-                    bound_args.arguments["options"] = expected.model_validate(value)
-            return func(*bound_args.args, **bound_args.kwargs)
+            return func(*convert(args, kwargs), **kwargs)
 
         return wrapper
 
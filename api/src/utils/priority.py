@@ -0,0 +1,281 @@
+"""Priority classes and priority-aware concurrency limits for outbound calls."""
+
+import asyncio
+import heapq
+import itertools
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from functools import lru_cache
+from typing import Annotated, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from pydantic import Field
+
+from api.src.pydantic import ConfiguredBaseModel
+from api.src.settings import ConfiguredBaseSettings
+from api.src.utils.metrics import (
+    priority_queued,
+    priority_started,
+    priority_wait_seconds,
+    priority_wait_seconds_max,
+)
+
+
+class Priority(IntEnum):
+    """Priority classes of outbound LLM and MCP calls, lower values are served first."""
+
+    INTERACTIVE = 0
+    """The first turn of a request a user is waiting on"""
+    NESTED = 1
+    """Agent and tool calls made while handling a request"""
+    BACKGROUND = 2
+    """Refreshes nobody is waiting on"""
+
+
+class PrioritySettings(ConfiguredBaseSettings):
+    """Settings for priority scheduling."""
+
+    priority_aging_seconds: float = 2.0
+    """Seconds a queued call waits before it is served as if one class higher"""
+    priority_fairness_seconds: float = 0.5
+    """Seconds a call is held back for each call of the same thread already queued or running"""
+
+
+class PriorityStats(ConfiguredBaseModel):
+    """Statistics for the calls of a priority class."""
+
+    queued: Annotated[int, Field(description="Calls waiting for a slot")]
+    started: Annotated[int, Field(description="Calls given a slot")]
+    wait_seconds_total: Annotated[
+        float, Field(description="Total seconds calls waited for a slot")
+    ]
+    wait_seconds_max: Annotated[
+        float, Field(description="Longest a call waited for a slot, in seconds")
+    ]
+
+
+@lru_cache(maxsize=1)
+def get_priority_settings() -> PrioritySettings:
+    """Get the priority settings, configured from the environment.
+
+    Returns:
+        PrioritySettings: The priority settings.
+
+    """
+    return PrioritySettings()
+
+
+# region Context
+
+_priority: ContextVar[Priority] = ContextVar("priority", default=Priority.NESTED)
+_thread_id: ContextVar[Optional[str]] = ContextVar("priority_thread_id", default=None)
+
+
+def current_priority() -> Tuple[Priority, Optional[str]]:
+    """Return the priority and thread of calls made in the current context.
+
+    Returns:
+        Tuple[Priority, Optional[str]]: The priority class, `NESTED` unless set, and the thread
+            the calls are made for, if known.
+
+    """
+    return _priority.get(), _thread_id.get()
+
+
+@contextmanager
+def prioritise(priority: Priority, thread_id: Optional[str] = None) -> Iterator[None]:
+    """Set the priority of the calls made within the block.
+
+    Tasks created within the block keep the priority, as they copy the current context. Do not use
+    it across the `yield` of an async generator, pass the priority to the call instead.
+
+    Args:
+        priority (Priority): The priority class of the calls.
+        thread_id (Optional[str], optional): The thread the calls are made for. Defaults to None,
+            keeping the current thread.
+
+    """
+    priority_token = _priority.set(priority)
+    thread_token = _thread_id.set(thread_id) if thread_id is not None else None
+    try:
+        yield
+    finally:
+        if thread_token is not None:
+            _thread_id.reset(thread_token)
+        _priority.reset(priority_token)
+
+
+# endregion Context
+
+
+# region Priority Limiter
+
+
+class _Waiter:
+    """A call waiting for a slot."""
+
+    def __init__(self, priority: Priority, thread_id: Optional[str]):
+        self.priority = priority
+        self.thread_id = thread_id
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+
+class PriorityLimiter:
+    """Limit on concurrent calls which hands free slots out by priority.
+
+    A queued call is ordered by a deadline: the time it was queued, plus `PRIORITY_AGING_SECONDS`
+    for each class below `INTERACTIVE`, plus `PRIORITY_FAIRNESS_SECONDS` for each call of the same
+    thread already queued or running. Interactive calls therefore go first, a long chain of calls
+    from one thread cannot crowd out other threads, and a call which has waited long enough is
+    served ahead of newer calls of a higher class, so no class starves.
+    """
+
+    def __init__(self, limit: float, settings: Optional[PrioritySettings] = None):
+        settings = settings or get_priority_settings()
+        self._limit = limit
+        self.in_flight = 0
+        self._aging = settings.priority_aging_seconds
+        self._fairness = settings.priority_fairness_seconds
+        self._heap: List[Tuple[float, int, _Waiter]] = []
+        self._sequence = itertools.count()
+        self._threads: Dict[Optional[str], int] = defaultdict(int)
+        self._queued: Dict[Priority, int] = defaultdict(int)
+        self._started: Dict[Priority, int] = defaultdict(int)
+        self._wait_total: Dict[Priority, float] = defaultdict(float)
+        self._wait_max: Dict[Priority, float] = defaultdict(float)
+
+    @property
+    def limit(self) -> float:
+        """Return the limit on concurrent calls, only its integer part is used."""
+        return self._limit
+
+    @limit.setter
+    def limit(self, value: float) -> None:
+        self._limit = value
+        # a raised limit frees slots for the calls already queued
+        self._wake()
+
+    @property
+    def queued(self) -> int:
+        """Return the number of calls waiting for a slot."""
+        return sum(self._queued.values())
+
+    def _deadline(self, priority: Priority, thread_id: Optional[str]) -> float:
+        deadline = time.monotonic() + priority * self._aging
+        if thread_id is not None:
+            deadline += self._threads[thread_id] * self._fairness
+        return deadline
+
+    def _wake(self) -> None:
+        while self._heap and self.in_flight < int(self.limit):
+            _, _, waiter = heapq.heappop(self._heap)
+            if not waiter.future.done():
+                # hand the slot to the waiter
+                self._queued[waiter.priority] -= 1
+                self.in_flight += 1
+                waiter.future.set_result(None)
+
+    def _forget(self, thread_id: Optional[str]) -> None:
+        self._threads[thread_id] -= 1
+        if not self._threads[thread_id]:
+            del self._threads[thread_id]
+
+    def _release(self, thread_id: Optional[str]) -> None:
+        self.in_flight -= 1
+        self._forget(thread_id)
+        self._wake()
+
+    def _started_after(self, priority: Priority, queued: float) -> None:
+        waited = time.monotonic() - queued
+        self._started[priority] += 1
+        self._wait_total[priority] += waited
+        self._wait_max[priority] = max(self._wait_max[priority], waited)
+
+    @asynccontextmanager
+    async def slot(
+        self, priority: Optional[Priority] = None, thread_id: Optional[str] = None
+    ) -> AsyncIterator[None]:
+        """Hold a slot for the duration of the block, waiting for one if none is free.
+
+        Args:
+            priority (Optional[Priority], optional): The priority class of the call. Defaults to
+                None, using the current context's priority.
+            thread_id (Optional[str], optional): The thread the call is made for. Defaults to
+                None, using the current context's thread.
+
+        """
+        context_priority, context_thread_id = current_priority()
+        priority = context_priority if priority is None else priority
+        thread_id = context_thread_id if thread_id is None else thread_id
+
+        queued = time.monotonic()
+        if not self.queued and self.in_flight < int(self.limit):
+            self.in_flight += 1
+            self._threads[thread_id] += 1
+        else:
+            waiter = _Waiter(priority, thread_id)
+            heapq.heappush(
+                self._heap,
+                (self._deadline(priority, thread_id), next(self._sequence), waiter),
+            )
+            self._queued[priority] += 1
+            self._threads[thread_id] += 1
+            try:
+                await waiter.future
+            except asyncio.CancelledError:
+                if waiter.future.cancelled():
+                    # left in the heap, it is skipped when popped
+                    self._queued[priority] -= 1
+                    self._forget(thread_id)
+                else:
+                    # the slot was handed over as the caller was cancelled
+                    self._release(thread_id)
+                raise
+
+        self._started_after(priority, queued)
+        try:
+            yield
+        finally:
+            self._release(thread_id)
+
+    def stats(self) -> Dict[str, PriorityStats]:
+        """Return statistics for each priority class.
+
+        Returns:
+            Dict[str, PriorityStats]: The statistics by the lower case name of the class.
+
+        """
+        return {
+            priority.name.lower(): PriorityStats(
+                queued=self._queued[priority],
+                started=self._started[priority],
+                wait_seconds_total=self._wait_total[priority],
+                wait_seconds_max=self._wait_max[priority],
+            )
+            for priority in Priority
+        }
+
+
+def set_priority_metrics(limiter: str, stats: Dict[str, PriorityStats]) -> None:
+    """Set the priority metrics of a limiter from its statistics, for a metrics collector.
+
+    Args:
+        limiter (str): The name of the limiter, e.g. `llm:<deployment>`.
+        stats (Dict[str, PriorityStats]): The statistics by priority class, see
+            `PriorityLimiter.stats`.
+
+    """
+    for priority, priority_stats in stats.items():
+        priority_queued.labels(limiter, priority).set(priority_stats.queued)
+        priority_started.labels(limiter, priority).set(priority_stats.started)
+        priority_wait_seconds.labels(limiter, priority).set(
+            priority_stats.wait_seconds_total
+        )
+        priority_wait_seconds_max.labels(limiter, priority).set(
+            priority_stats.wait_seconds_max
+        )
+
+
+# endregion Priority Limiter
@@ -0,0 +1,117 @@
+"""Coalescing of identical concurrent calls."""
+
+import asyncio
+from typing import Annotated, Awaitable, Callable, Dict, Hashable, TypeVar
+
+from pydantic import Field
+
+from api.src.pydantic import ConfiguredBaseModel
+from api.src.utils.metrics import metrics, single_flight_calls, single_flight_in_flight
+
+R = TypeVar("R")
+
+
+class SingleFlightStats(ConfiguredBaseModel):
+    """Statistics for a single-flight group."""
+
+    calls: Annotated[int, Field(description="Calls which were executed")]
+    coalesced: Annotated[
+        int, Field(description="Calls which awaited an identical call in flight")
+    ]
+    in_flight: Annotated[int, Field(description="Calls currently executing")]
+
+
+class _Flight:
+    """A call in flight and the number of callers awaiting it."""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Group of calls in which concurrent calls with the same key share one execution.
+
+    The first caller for a key starts the call, and callers arriving before it finishes await the
+    same result or exception. A caller which is cancelled stops waiting without affecting the
+    others; the call itself is only cancelled once every caller has stopped waiting.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.coalesced = 0
+        self._flights: Dict[Hashable, _Flight] = {}
+
+    def _forget(self, key: Hashable, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[R]]) -> R:
+        """Execute a call, or await the identical call already in flight.
+
+        Args:
+            key (Hashable): Identifies identical calls.
+            call (Callable[[], Awaitable[R]]): Makes the call.
+
+        Returns:
+            R: The result of the call.
+
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(call()))
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            self._flights[key] = flight
+            self.calls += 1
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # nobody is waiting for the result, later callers start a new call
+                self._forget(key, flight)
+                flight.task.cancel()
+
+    def stats(self) -> SingleFlightStats:
+        """Return statistics for the group.
+
+        Returns:
+            SingleFlightStats: The number of executed, coalesced and in-flight calls.
+
+        """
+        return SingleFlightStats(
+            calls=self.calls, coalesced=self.coalesced, in_flight=len(self._flights)
+        )
+
+
+_single_flights: Dict[str, SingleFlight] = {}
+
+
+def get_single_flight(name: str) -> SingleFlight:
+    """Get the single-flight group with a name.
+
+    Args:
+        name (str): The name of the group, e.g. the kind of call it coalesces.
+
+    Returns:
+        SingleFlight: The group.
+
+    """
+    if name not in _single_flights:
+        _single_flights[name] = SingleFlight(name)
+    return _single_flights[name]
+
+
+@metrics.collector
+def collect_single_flight_metrics() -> None:
+    """Set the executed, coalesced and in-flight call metrics of each single-flight group."""
+    for name, group in _single_flights.items():
+        stats = group.stats()
+        single_flight_calls.labels(name, "executed").set(stats.calls)
+        single_flight_calls.labels(name, "coalesced").set(stats.coalesced)
+        single_flight_in_flight.labels(name).set(stats.in_flight)
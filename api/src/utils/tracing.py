@@ -0,0 +1,256 @@
+"""Optional OpenTelemetry tracing of runs, agents, tools and MCP calls.
+
+Tracing is off unless `TRACING_EXPORTER` is set, and then needs the `tracing` extra. While it is off
+every helper here returns without creating spans, so the instrumented code pays for one check.
+
+Spans of a run carry its `thread_id` and `run_id`, which are kept as OpenTelemetry baggage so they
+follow the run's context into tasks and, through `inject` and `extract`, into A2A messages.
+"""
+
+import inspect
+import logging
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+from typing import (
+    Any,
+    AsyncGenerator,
+    Callable,
+    Dict,
+    Iterator,
+    Literal,
+    Optional,
+    ParamSpec,
+    TextIO,
+    TypeVar,
+)
+
+from api.src.settings import ConfiguredBaseSettings
+
+try:
+    from opentelemetry import baggage, propagate, trace
+    from opentelemetry import context as otel_context
+except ImportError:  # pragma: no cover
+    trace = None
+
+logger = logging.getLogger(__name__)
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+RUN_ATTRIBUTES = ("thread_id", "run_id")
+
+
+class TracingSettings(ConfiguredBaseSettings):
+    """Settings for tracing."""
+
+    tracing_exporter: Literal["none", "console", "file", "otlp"] = "none"
+    """Where spans are exported, `none` turns tracing off"""
+    tracing_file: Path = Path(".jarvis/traces.jsonl")
+    """File the `file` exporter appends spans to, one JSON object per line"""
+    tracing_service_name: str = "jarvis"
+    """Service name of the exported spans"""
+
+
+class _Tracing:
+    """The tracer, once tracing is configured."""
+
+    def __init__(self):
+        self.tracer: Optional[Any] = None
+        self.provider: Optional[Any] = None
+        self.file: Optional[TextIO] = None
+
+
+_tracing = _Tracing()
+
+
+def configure_tracing(settings: Optional[TracingSettings] = None) -> None:
+    """Start exporting spans, if an exporter is configured.
+
+    The OTLP exporter sends spans over HTTP to `OTEL_EXPORTER_OTLP_ENDPOINT`, defaulting to a
+    collector on localhost.
+
+    Args:
+        settings (Optional[TracingSettings], optional): The tracing settings. Defaults to None,
+            reading them from the environment.
+
+    """
+    settings = settings or TracingSettings()
+    if settings.tracing_exporter == "none":
+        return
+    if trace is None:
+        logger.warning(
+            "TRACING_EXPORTER is %s but OpenTelemetry is not installed, install the "
+            "`tracing` extra to export spans",
+            settings.tracing_exporter,
+        )
+        return
+
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+
+    match settings.tracing_exporter:
+        case "otlp":
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+                OTLPSpanExporter,
+            )
+
+            exporter = OTLPSpanExporter()
+        case "file":
+            settings.tracing_file.parent.mkdir(parents=True, exist_ok=True)
+            _tracing.file = open(settings.tracing_file, "a", encoding="utf-8")
+            exporter = ConsoleSpanExporter(
+                out=_tracing.file,
+                formatter=lambda span: span.to_json(indent=None) + "\n",
+            )
+        case _:
+            exporter = ConsoleSpanExporter()
+
+    _tracing.provider = TracerProvider(
+        resource=Resource.create({"service.name": settings.tracing_service_name})
+    )
+    _tracing.provider.add_span_processor(BatchSpanProcessor(exporter))
+    _tracing.tracer = _tracing.provider.get_tracer(__name__)
+    logger.info("Exporting spans to %s", settings.tracing_exporter)
+
+
+def shutdown_tracing() -> None:
+    """Export the remaining spans and stop tracing."""
+    if _tracing.provider is not None:
+        _tracing.provider.shutdown()
+    if _tracing.file is not None:
+        _tracing.file.close()
+    _tracing.__init__()
+
+
+def _attributes(attributes: Dict[str, Any]) -> Dict[str, Any]:
+    for key in RUN_ATTRIBUTES:
+        if key not in attributes:
+            attributes[key] = baggage.get_baggage(key)
+    return {key: value for key, value in attributes.items() if value is not None}
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[None]:
+    """Trace the block as a span, a child of the current span.
+
+    The span records any exception raised in the block. Do not use it across the `yield` of an
+    async generator, see `traced_run`.
+
+    Args:
+        name (str): The name of the span.
+        **attributes (Any): The span's attributes, the run's `thread_id` and `run_id` are added.
+
+    """
+    if _tracing.tracer is None:
+        yield
+        return
+
+    with _tracing.tracer.start_as_current_span(
+        name, attributes=_attributes(attributes)
+    ):
+        yield
+
+
+async def _trace_stream(
+    name: str, stream: AsyncGenerator[T, None], thread_id: str, run_id: str
+) -> AsyncGenerator[T, None]:
+    context = baggage.set_baggage("thread_id", thread_id)
+    context = baggage.set_baggage("run_id", run_id, context)
+    run_span = _tracing.tracer.start_span(
+        name, context=context, attributes={"thread_id": thread_id, "run_id": run_id}
+    )
+    context = trace.set_span_in_context(run_span, context)
+    try:
+        while True:
+            # the span is current while the generator runs, but not while the consumer does,
+            # so tasks the generator creates inherit it
+            token = otel_context.attach(context)
+            try:
+                item = await anext(stream)
+            except StopAsyncIteration:
+                break
+            except Exception as err:
+                run_span.record_exception(err)
+                run_span.set_status(trace.StatusCode.ERROR, str(err))
+                raise
+            finally:
+                otel_context.detach(token)
+            yield item
+    finally:
+        run_span.end()
+        await stream.aclose()
+
+
+def traced_run(
+    name: str,
+) -> Callable[
+    [Callable[P, AsyncGenerator[T, None]]], Callable[P, AsyncGenerator[T, None]]
+]:
+    """Trace the async generator producing a run's events as a span.
+
+    The decorated function takes the run's `RunAgentInput` as its `message` argument. The span lasts
+    until the generator is exhausted or closed, and is the parent of the spans of the work it
+    does, including in the tasks it creates. The generator is returned unwrapped while tracing is
+    off.
+
+    Args:
+        name (str): The name of the run's span.
+
+    Returns:
+        Callable: The decorator.
+
+    """
+
+    def decorator(
+        func: Callable[P, AsyncGenerator[T, None]],
+    ) -> Callable[P, AsyncGenerator[T, None]]:
+        signature = inspect.signature(func)
+
+        @wraps(func)
+        def wrapper(*args: P.args, **kwargs: P.kwargs) -> AsyncGenerator[T, None]:
+            stream = func(*args, **kwargs)
+            if _tracing.tracer is None:
+                return stream
+
+            message = signature.bind(*args, **kwargs).arguments["message"]
+            return _trace_stream(name, stream, message.thread_id, message.run_id)
+
+        return wrapper
+
+    return decorator
+
+
+def inject(carrier: Dict[str, Any]) -> Dict[str, Any]:
+    """Add the current trace context and run IDs to a carrier, e.g. A2A message metadata.
+
+    Args:
+        carrier (Dict[str, Any]): The carrier, changed in place.
+
+    Returns:
+        Dict[str, Any]: The carrier.
+
+    """
+    if _tracing.tracer is not None:
+        propagate.inject(carrier)
+    return carrier
+
+
+@contextmanager
+def extract(carrier: Optional[Dict[str, Any]]) -> Iterator[None]:
+    """Continue the trace context of a carrier within the block.
+
+    Args:
+        carrier (Optional[Dict[str, Any]]): The carrier, e.g. A2A message metadata.
+
+    """
+    if _tracing.tracer is None or not carrier:
+        yield
+        return
+
+    token = otel_context.attach(propagate.extract(carrier))
+    try:
+        yield
+    finally:
+        otel_context.detach(token)
@@ -0,0 +1,61 @@
+"""Capture the GitHub MCP server's tools as the fixture of the micro benchmarks.
+
+Connects to the GitHub MCP server the way the GitHub agent does, configured by the same
+environment, e.g. `GITHUB_TOKEN` and `USE_STDIO`, and writes its `list_tools` result in the format
+of the MCP manifest cache, so the benchmarks build the schemas the agents actually receive.
+
+Usage:
+    python -m benchmarks.capture_tools
+    python -m benchmarks.capture_tools --output /tmp/github_mcp_tools.json
+"""
+
+import argparse
+import asyncio
+from pathlib import Path
+
+from api.src.agents.github import get_github_settings, get_stdio_params
+from api.src.mcp.base import BaseHttpMcpSession
+from api.src.mcp.pool import get_mcp_session_manager
+
+FIXTURE = Path(__file__).parent / "fixtures" / "github_mcp_tools.json"
+
+
+async def main(output: Path) -> int:
+    """Capture the tools and write them to a file.
+
+    Args:
+        output (Path): The file to write.
+
+    Returns:
+        int: The number of tools captured.
+
+    """
+    settings = get_github_settings()
+    session = BaseHttpMcpSession(
+        session_id="capture-github-mcp-tools",
+        stdio_parameters=get_stdio_params(settings),
+        url=settings.github_mcp_url,
+        headers={"Authorization": f"Bearer {settings.github_token.get_secret_value()}"},
+        use_stdio=settings.use_stdio,
+    )
+    try:
+        tools = await session.list_tools()
+    finally:
+        await get_mcp_session_manager().close()
+
+    output.write_text(
+        tools.model_dump_json(by_alias=True, exclude_none=True, indent=2) + "\n",
+        encoding="utf-8",
+    )
+    return len(tools.tools)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--output", type=Path, default=FIXTURE, help="File to write the tools to"
+    )
+    args = parser.parse_args()
+
+    count = asyncio.run(main(args.output))
+    print(f"Captured {count} tools to {args.output}")
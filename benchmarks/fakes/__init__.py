@@ -0,0 +1 @@
+"""Fake Azure OpenAI and MCP servers, so benchmarks run offline and deterministically."""
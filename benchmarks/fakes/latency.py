@@ -0,0 +1,63 @@
+"""Latency distributions for the fake servers."""
+
+import math
+import random
+from typing import Annotated, Literal, Optional
+
+from pydantic import Field
+
+from api.src.pydantic import ConfiguredBaseModel
+
+
+class LatencyDistribution(ConfiguredBaseModel):
+    """Distribution of a delay in seconds."""
+
+    distribution: Annotated[
+        Literal["constant", "uniform", "normal", "lognormal"],
+        Field(default="constant", description="Shape of the distribution"),
+    ]
+    mean: Annotated[
+        float, Field(default=0.0, ge=0, description="Mean delay in seconds")
+    ]
+    stddev: Annotated[
+        float,
+        Field(
+            default=0.0,
+            ge=0,
+            description="Standard deviation in seconds, or the half-width of a uniform "
+            "distribution",
+        ),
+    ]
+    minimum: Annotated[
+        float, Field(default=0.0, ge=0, description="Shortest delay in seconds")
+    ]
+    maximum: Annotated[
+        Optional[float],
+        Field(default=None, ge=0, description="Longest delay in seconds"),
+    ]
+
+    def sample(self, rng: random.Random) -> float:
+        """Draw a delay from the distribution.
+
+        Args:
+            rng (random.Random): The random number generator, seeded for repeatable runs.
+
+        Returns:
+            float: The delay in seconds.
+
+        """
+        if self.distribution == "uniform":
+            delay = rng.uniform(self.mean - self.stddev, self.mean + self.stddev)
+        elif self.distribution == "normal":
+            delay = rng.gauss(self.mean, self.stddev)
+        elif self.distribution == "lognormal" and self.mean > 0:
+            # parameters of the underlying normal giving the requested mean and deviation
+            sigma = math.sqrt(math.log(1 + (self.stddev / self.mean) ** 2))
+            delay = rng.lognormvariate(math.log(self.mean) - sigma**2 / 2, sigma)
+        else:
+            delay = self.mean
+
+        delay = max(delay, self.minimum)
+        if self.maximum is not None:
+            delay = min(delay, self.maximum)
+        return delay
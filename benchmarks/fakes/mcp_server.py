@@ -0,0 +1,236 @@
+"""Scripted MCP server, over stdio or streamable HTTP.
+
+Lists the tools in its script and answers each call with the tool's scripted result after a
+configurable latency. The default script has the GitHub tools the agents use, so the API can run
+against it in place of the GitHub MCP server.
+
+Point the GitHub agents at it with:
+    GITHUB_MCP_STDIO_COMMAND="python -m benchmarks.fakes.mcp_server"
+    USE_STDIO=false GITHUB_MCP_URL=http://127.0.0.1:8002/mcp/
+
+Usage:
+    python -m benchmarks.fakes.mcp_server
+    python -m benchmarks.fakes.mcp_server --transport http --port 8002 --latency 0.05
+"""
+
+import argparse
+import asyncio
+import json
+import random
+from contextlib import asynccontextmanager
+from typing import Annotated, Any, AsyncIterator, Dict, List, Optional
+
+import anyio
+import uvicorn
+from mcp import types
+from mcp.server.lowlevel import Server
+from mcp.server.stdio import stdio_server
+from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+from pydantic import Field
+from starlette.applications import Starlette
+from starlette.routing import Mount
+
+from api.src.pydantic import ConfiguredBaseModel
+from benchmarks.fakes.latency import LatencyDistribution
+
+
+class ScriptedTool(ConfiguredBaseModel):
+    """A tool of the scripted MCP server."""
+
+    name: Annotated[str, Field(description="The name of the tool")]
+    description: Annotated[
+        str, Field(default="", description="The description of the tool")
+    ]
+    input_schema: Annotated[
+        Dict[str, Any],
+        Field(
+            default_factory=lambda: {"type": "object", "properties": {}},
+            description="JSON schema of the tool's arguments",
+        ),
+    ]
+    result: Annotated[
+        str,
+        Field(
+            default="{arguments}",
+            description="Text of the result, `{arguments}` is replaced with the arguments as "
+            "JSON",
+        ),
+    ]
+    is_error: Annotated[
+        bool, Field(default=False, description="Whether the result is an error")
+    ]
+    latency: Annotated[
+        LatencyDistribution,
+        Field(
+            default_factory=LatencyDistribution, description="Delay before answering"
+        ),
+    ]
+
+
+def _github_tools() -> List[ScriptedTool]:
+    return [
+        ScriptedTool(
+            name="list_notifications",
+            description="Lists all GitHub notifications for the authenticated user.",
+            input_schema={
+                "type": "object",
+                "properties": {
+                    "filter": {
+                        "type": "string",
+                        "enum": [
+                            "default",
+                            "include_read_notifications",
+                            "only_participating",
+                        ],
+                        "description": "Filter notifications",
+                    },
+                    "owner": {"type": "string", "description": "Repository owner"},
+                    "repo": {"type": "string", "description": "Repository name"},
+                },
+            },
+            result=json.dumps(
+                [
+                    {
+                        "id": "1",
+                        "reason": "review_requested",
+                        "subject": {"title": "Add caching", "type": "PullRequest"},
+                        "repository": {"full_name": "octo/jarvis"},
+                    }
+                ]
+            ),
+        ),
+        ScriptedTool(
+            name="get_notification_details",
+            description="Get detailed information for a specific GitHub notification.",
+            input_schema={
+                "type": "object",
+                "properties": {
+                    "notificationID": {
+                        "type": "string",
+                        "description": "The ID of the notification",
+                    }
+                },
+                "required": ["notificationID"],
+            },
+            result='{"notification": {arguments}, "unread": true}',
+        ),
+    ]
+
+
+class FakeMcpConfig(ConfiguredBaseModel):
+    """Configuration of the scripted MCP server."""
+
+    tools: Annotated[
+        List[ScriptedTool],
+        Field(default_factory=_github_tools, description="The tools to serve"),
+    ]
+    seed: Annotated[int, Field(default=0, description="Seed of the latency samples")]
+
+
+def create_server(config: Optional[FakeMcpConfig] = None) -> Server:
+    """Create the scripted MCP server.
+
+    Args:
+        config (Optional[FakeMcpConfig], optional): The tools to serve. Defaults to None, serving
+            the GitHub notification tools.
+
+    Returns:
+        Server: The MCP server, to run over any transport.
+
+    """
+    config = config or FakeMcpConfig()
+    tools = {tool.name: tool for tool in config.tools}
+    rng = random.Random(config.seed)
+    server = Server("fake-mcp")
+
+    @server.list_tools()
+    async def list_tools() -> List[types.Tool]:
+        return [
+            types.Tool(
+                name=tool.name,
+                description=tool.description,
+                inputSchema=tool.input_schema,
+            )
+            for tool in tools.values()
+        ]
+
+    @server.call_tool()
+    async def call_tool(name: str, arguments: Dict[str, Any]) -> List[types.Content]:
+        tool = tools.get(name)
+        if tool is None:
+            raise ValueError(f"Unknown tool: {name}")
+
+        await asyncio.sleep(tool.latency.sample(rng))
+        text = tool.result.replace("{arguments}", json.dumps(arguments, sort_keys=True))
+        if tool.is_error:
+            # the server reports exceptions as error results
+            raise ValueError(text)
+        return [types.TextContent(type="text", text=text)]
+
+    return server
+
+
+async def run_stdio(config: Optional[FakeMcpConfig] = None) -> None:
+    """Serve the scripted MCP server over stdio until the client disconnects.
+
+    Args:
+        config (Optional[FakeMcpConfig], optional): The tools to serve. Defaults to None.
+
+    """
+    server = create_server(config)
+    async with stdio_server() as (read, write):
+        await server.run(read, write, server.create_initialization_options())
+
+
+def create_http_app(config: Optional[FakeMcpConfig] = None) -> Starlette:
+    """Create an application serving the scripted MCP server over streamable HTTP at `/mcp/`.
+
+    Args:
+        config (Optional[FakeMcpConfig], optional): The tools to serve. Defaults to None.
+
+    Returns:
+        Starlette: The application.
+
+    """
+    manager = StreamableHTTPSessionManager(app=create_server(config))
+
+    @asynccontextmanager
+    async def lifespan(_: Starlette) -> AsyncIterator[None]:
+        async with manager.run():
+            yield
+
+    return Starlette(
+        routes=[Mount("/mcp", app=manager.handle_request)], lifespan=lifespan
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--config", help="JSON file of a FakeMcpConfig")
+    parser.add_argument(
+        "--transport", choices=["stdio", "http"], default="stdio", help="Transport"
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Host to listen on")
+    parser.add_argument("--port", type=int, default=8002, help="Port to listen on")
+    parser.add_argument(
+        "--latency", type=float, help="Mean seconds before every tool answers"
+    )
+    args = parser.parse_args()
+
+    config = FakeMcpConfig()
+    if args.config:
+        with open(args.config, encoding="utf-8") as file:
+            config = FakeMcpConfig.model_validate_json(file.read())
+    if args.latency is not None:
+        for scripted_tool in config.tools:
+            scripted_tool.latency = LatencyDistribution(mean=args.latency)
+
+    if args.transport == "stdio":
+        anyio.run(run_stdio, config)
+    else:
+        uvicorn.run(
+            create_http_app(config),
+            host=args.host,
+            port=args.port,
+            log_level="warning",
+        )
@@ -0,0 +1,344 @@
+"""Fake OpenAI-compatible chat completions server.
+
+Answers chat completion requests, streamed or not, from a script of turns after a configurable
+latency, and can reject requests with a 429 to exercise rate limiting. It serves both the Azure
+OpenAI path, `/openai/deployments/{deployment}/chat/completions`, and the OpenAI path,
+`/v1/chat/completions`.
+
+Point the API at it with:
+    OPENAI_API_BASE=http://127.0.0.1:8001 OPENAI_API_KEY=fake OPENAI_API_VERSION=2024-10-21
+
+Usage:
+    python -m benchmarks.fakes.openai_server --port 8001
+    python -m benchmarks.fakes.openai_server --config script.json --ttft 0.2 --inter-token 0.01
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+import uuid
+from typing import Annotated, Any, AsyncIterator, Dict, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import Field
+
+from api.src.pydantic import ConfiguredBaseModel
+from benchmarks.fakes.latency import LatencyDistribution
+
+
+class ScriptedToolCall(ConfiguredBaseModel):
+    """A tool call the fake model makes."""
+
+    name: Annotated[str, Field(description="The name of the tool to call")]
+    arguments: Annotated[
+        Dict[str, Any],
+        Field(default_factory=dict, description="The arguments of the call"),
+    ]
+
+
+class ScriptedTurn(ConfiguredBaseModel):
+    """A response of the fake model."""
+
+    content: Annotated[
+        Optional[str], Field(default=None, description="The text of the response")
+    ]
+    tool_calls: Annotated[
+        List[ScriptedToolCall],
+        Field(
+            default_factory=list,
+            description="The tool calls of the response, calls to tools the request does not "
+            "offer are left out",
+        ),
+    ]
+
+
+class RateLimitInjection(ConfiguredBaseModel):
+    """Which requests the fake server rejects with a 429."""
+
+    every: Annotated[
+        Optional[int],
+        Field(default=None, gt=0, description="Reject every nth request"),
+    ]
+    probability: Annotated[
+        float,
+        Field(default=0.0, ge=0, le=1, description="Chance of rejecting a request"),
+    ]
+    retry_after_ms: Annotated[
+        int,
+        Field(default=100, ge=0, description="The `retry-after-ms` header of a 429"),
+    ]
+
+
+class FakeOpenAIConfig(ConfiguredBaseModel):
+    """Configuration of the fake OpenAI server."""
+
+    script: Annotated[
+        List[ScriptedTurn],
+        Field(
+            default_factory=lambda: [
+                ScriptedTurn(content="Hello from the fake OpenAI server.")
+            ],
+            description="Responses by turn, the turn being the number of assistant tool calls "
+            "after the last user message; the last response is repeated",
+        ),
+    ]
+    time_to_first_token: Annotated[
+        LatencyDistribution,
+        Field(
+            default_factory=LatencyDistribution,
+            description="Delay before the first token, or before a response which is not "
+            "streamed",
+        ),
+    ]
+    inter_token: Annotated[
+        LatencyDistribution,
+        Field(
+            default_factory=LatencyDistribution,
+            description="Delay between streamed tokens",
+        ),
+    ]
+    chars_per_token: Annotated[
+        int, Field(default=4, gt=0, description="Characters in each streamed token")
+    ]
+    rate_limit: Annotated[
+        RateLimitInjection,
+        Field(default_factory=RateLimitInjection, description="429 injection"),
+    ]
+    seed: Annotated[int, Field(default=0, description="Seed of the latency samples")]
+
+
+def _turn(messages: List[Dict[str, Any]]) -> int:
+    turn = 0
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            break
+        if message.get("role") == "assistant" and message.get("tool_calls"):
+            turn += 1
+    return turn
+
+
+def _chunks(text: str, size: int) -> List[str]:
+    return [text[i : i + size] for i in range(0, len(text), size)] or [""]
+
+
+class FakeOpenAI:
+    """Fake OpenAI server, see the module's documentation."""
+
+    def __init__(self, config: Optional[FakeOpenAIConfig] = None):
+        self.config = config or FakeOpenAIConfig()
+        self.requests = 0
+        self.rate_limited = 0
+        self.in_flight = 0
+        self._rng = random.Random(self.config.seed)
+
+        self.app = FastAPI(title="Fake OpenAI")
+        self.app.post("/openai/deployments/{deployment}/chat/completions")(
+            self.chat_completions
+        )
+        self.app.post("/v1/chat/completions")(self.chat_completions)
+        self.app.post("/chat/completions")(self.chat_completions)
+        self.app.get("/stats")(self.stats)
+
+    def _should_rate_limit(self) -> bool:
+        injection = self.config.rate_limit
+        if injection.every and self.requests % injection.every == 0:
+            return True
+        return self._rng.random() < injection.probability
+
+    async def stats(self) -> Dict[str, int]:
+        """Return the number of requests served, rejected and in flight."""
+        return {
+            "requests": self.requests,
+            "rate_limited": self.rate_limited,
+            "in_flight": self.in_flight,
+        }
+
+    async def chat_completions(self, request: Request, deployment: str = ""):
+        """Answer a chat completion request from the script."""
+        self.requests += 1
+        if self._should_rate_limit():
+            self.rate_limited += 1
+            retry_after_ms = self.config.rate_limit.retry_after_ms
+            return JSONResponse(
+                {"error": {"code": "429", "message": "Rate limit is exceeded."}},
+                status_code=429,
+                headers={
+                    "retry-after-ms": str(retry_after_ms),
+                    "retry-after": str(math.ceil(retry_after_ms / 1000)),
+                },
+            )
+
+        body = await request.json()
+        messages = body.get("messages", [])
+        script = self.config.script
+        turn = script[min(_turn(messages), len(script) - 1)]
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        model = body.get("model") or deployment
+        offered = {tool["function"]["name"] for tool in body.get("tools") or []}
+        tool_calls = [
+            {
+                "id": f"call_{uuid.uuid4().hex[:24]}",
+                "type": "function",
+                "function": {
+                    "name": tool_call.name,
+                    "arguments": json.dumps(tool_call.arguments),
+                },
+            }
+            for tool_call in turn.tool_calls
+            if tool_call.name in offered
+        ]
+
+        if body.get("stream"):
+            return StreamingResponse(
+                self._stream(completion_id, model, turn, tool_calls),
+                media_type="text/event-stream",
+            )
+
+        self.in_flight += 1
+        try:
+            await asyncio.sleep(self.config.time_to_first_token.sample(self._rng))
+        finally:
+            self.in_flight -= 1
+
+        prompt_tokens = len(json.dumps(messages)) // self.config.chars_per_token
+        completion_tokens = (
+            len(turn.content or "")
+            + sum(len(call["function"]["arguments"]) for call in tool_calls)
+        ) // self.config.chars_per_token
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {
+                        "role": "assistant",
+                        "content": turn.content,
+                        "tool_calls": tool_calls or None,
+                    },
+                    "finish_reason": "tool_calls" if tool_calls else "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    async def _stream(
+        self,
+        completion_id: str,
+        model: str,
+        turn: ScriptedTurn,
+        tool_calls: List[Dict[str, Any]],
+    ) -> AsyncIterator[str]:
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> str:
+            return (
+                "data: "
+                + json.dumps(
+                    {
+                        "id": completion_id,
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": model,
+                        "choices": [
+                            {"index": 0, "delta": delta, "finish_reason": finish_reason}
+                        ],
+                    }
+                )
+                + "\n\n"
+            )
+
+        size = self.config.chars_per_token
+        self.in_flight += 1
+        try:
+            await asyncio.sleep(self.config.time_to_first_token.sample(self._rng))
+            yield chunk({"role": "assistant", "content": ""})
+
+            if turn.content:
+                for token in _chunks(turn.content, size):
+                    yield chunk({"content": token})
+                    await asyncio.sleep(self.config.inter_token.sample(self._rng))
+
+            for index, tool_call in enumerate(tool_calls):
+                yield chunk(
+                    {
+                        "tool_calls": [
+                            {
+                                "index": index,
+                                "id": tool_call["id"],
+                                "type": "function",
+                                "function": {
+                                    "name": tool_call["function"]["name"],
+                                    "arguments": "",
+                                },
+                            }
+                        ]
+                    }
+                )
+                for token in _chunks(tool_call["function"]["arguments"], size):
+                    yield chunk(
+                        {
+                            "tool_calls": [
+                                {"index": index, "function": {"arguments": token}}
+                            ]
+                        }
+                    )
+                    await asyncio.sleep(self.config.inter_token.sample(self._rng))
+
+            yield chunk({}, "tool_calls" if tool_calls else "stop")
+            yield "data: [DONE]\n\n"
+        finally:
+            self.in_flight -= 1
+
+
+def create_app(config: Optional[FakeOpenAIConfig] = None) -> FastAPI:
+    """Create the fake OpenAI server's application.
+
+    Args:
+        config (Optional[FakeOpenAIConfig], optional): The script, latencies and 429 injection.
+            Defaults to None, answering every request immediately with a short greeting.
+
+    Returns:
+        FastAPI: The application.
+
+    """
+    return FakeOpenAI(config).app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--config", help="JSON file of a FakeOpenAIConfig")
+    parser.add_argument("--host", default="127.0.0.1", help="Host to listen on")
+    parser.add_argument("--port", type=int, default=8001, help="Port to listen on")
+    parser.add_argument(
+        "--ttft", type=float, help="Mean time to first token in seconds"
+    )
+    parser.add_argument(
+        "--inter-token", type=float, help="Mean seconds between streamed tokens"
+    )
+    parser.add_argument(
+        "--rate-limit-every", type=int, help="Reject every nth request with a 429"
+    )
+    args = parser.parse_args()
+
+    config = FakeOpenAIConfig()
+    if args.config:
+        with open(args.config, encoding="utf-8") as file:
+            config = FakeOpenAIConfig.model_validate_json(file.read())
+    if args.ttft is not None:
+        config.time_to_first_token = LatencyDistribution(mean=args.ttft)
+    if args.inter_token is not None:
+        config.inter_token = LatencyDistribution(mean=args.inter_token)
+    if args.rate_limit_every is not None:
+        config.rate_limit.every = args.rate_limit_every
+
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
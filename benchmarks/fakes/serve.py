@@ -0,0 +1,44 @@
+"""Serve an ASGI application in-process for the duration of a benchmark."""
+
+import asyncio
+import socket
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
+
+import uvicorn
+
+
+def free_port() -> int:
+    """Return a free local TCP port."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@asynccontextmanager
+async def serve(app: Any, port: int = 0) -> AsyncIterator[str]:
+    """Serve an application with uvicorn on localhost until the block exits.
+
+    Args:
+        app (Any): The ASGI application.
+        port (int, optional): The port to listen on. Defaults to 0, picking a free port.
+
+    Yields:
+        str: The base URL of the server, e.g. `http://127.0.0.1:8000`.
+
+    """
+    port = port or free_port()
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    task = asyncio.create_task(server.serve())
+    try:
+        while not server.started:
+            if task.done():
+                # surface the start-up error
+                await task
+            await asyncio.sleep(0.01)
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        await task
@@ -0,0 +1,448 @@
+"""Load generator for the chat and agent SSE APIs.
+
+Starts runs at a fixed or Poisson arrival rate, with at most `--concurrency` in flight, and
+measures for each run the time to the first event, the time to the first text delta and the total
+run time. Runs use the two-step flow, `/start` then `/stream/{runId}`, or the single-request flow
+which streams the run from the POST; `--flow both` compares them.
+
+By default the API is served in-process on localhost, against in-process fake OpenAI and MCP
+servers (see `benchmarks.fakes`), so the numbers measure the orchestration code alone. Use
+`--no-fakes` to keep the environment's settings, e.g. to replay a cassette, or `--url` to load an
+API which is already running.
+
+Usage:
+    python -m benchmarks.load --requests 200 --rate 20 --concurrency 50
+    python -m benchmarks.load --target agent --flow both --json > load.json
+    python -m benchmarks.load --url http://127.0.0.1:8000 --duration 60 --rate 5
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import statistics
+import time
+import uuid
+from contextlib import AsyncExitStack
+from typing import Annotated, Any, Dict, List, Optional
+
+import httpx
+from pydantic import Field
+
+from api.src.pydantic import ConfiguredBaseModel
+
+DEFAULT_AGENT = "github-notification-agent"
+
+
+class RunResult(ConfiguredBaseModel):
+    """Measurements of a single run."""
+
+    first_event: Annotated[
+        Optional[float], Field(default=None, description="Seconds to the first event")
+    ]
+    first_text: Annotated[
+        Optional[float],
+        Field(default=None, description="Seconds to the first text delta"),
+    ]
+    total: Annotated[float, Field(default=0.0, description="Seconds to the last event")]
+    events: Annotated[int, Field(default=0, description="Events received")]
+    error: Annotated[
+        Optional[str], Field(default=None, description="Why the run failed, if it did")
+    ]
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Return the nearest-rank percentile of a list of values.
+
+    Args:
+        values (List[float]): The values, in any order.
+        q (float): The percentile, from 0 to 100.
+
+    Returns:
+        float: The percentile.
+
+    """
+    ordered = sorted(values)
+    return ordered[max(math.ceil(q / 100 * len(ordered)) - 1, 0)]
+
+
+def histogram(values: List[float]) -> List[List[float]]:
+    """Count values in millisecond buckets, four to each doubling.
+
+    Args:
+        values (List[float]): The values in seconds.
+
+    Returns:
+        List[List[float]]: The upper bound in milliseconds and count of each bucket, from the
+            first to the last non-empty one.
+
+    """
+    counts: Dict[int, int] = {}
+    for value in values:
+        bucket = math.ceil(math.log2(max(value * 1000, 1)) * 4)
+        counts[bucket] = counts.get(bucket, 0) + 1
+    if not counts:
+        return []
+    return [
+        [round(2 ** (bucket / 4), 1), counts.get(bucket, 0)]
+        for bucket in range(min(counts), max(counts) + 1)
+    ]
+
+
+def summarise(values: List[float]) -> Optional[Dict[str, Any]]:
+    """Summarise a latency in milliseconds.
+
+    Args:
+        values (List[float]): The latencies in seconds.
+
+    Returns:
+        Optional[Dict[str, Any]]: The percentiles, mean, max and histogram, or None if there are
+            no values.
+
+    """
+    if not values:
+        return None
+    return {
+        "p50": round(percentile(values, 50) * 1000, 2),
+        "p95": round(percentile(values, 95) * 1000, 2),
+        "p99": round(percentile(values, 99) * 1000, 2),
+        "mean": round(statistics.fmean(values) * 1000, 2),
+        "max": round(max(values) * 1000, 2),
+        "histogram": histogram(values),
+    }
+
+
+# region Runs
+
+
+def run_input() -> Dict[str, Any]:
+    """Return the `RunAgentInput` of a new run in a new thread."""
+    return {
+        "threadId": uuid.uuid4().hex,
+        "runId": uuid.uuid4().hex,
+        "state": {},
+        "messages": [
+            {"id": uuid.uuid4().hex, "role": "user", "content": "Any notifications?"}
+        ],
+        "tools": [],
+        "context": [],
+        "forwardedProps": {},
+    }
+
+
+async def run_once(
+    client: httpx.AsyncClient, target: str, flow: str, agent_id: str
+) -> RunResult:
+    """Make a run and measure it.
+
+    Args:
+        client (httpx.AsyncClient): Client for the API.
+        target (str): `chat` or `agent`.
+        flow (str): `two-step` or `single`.
+        agent_id (str): The agent to run when the target is `agent`.
+
+    Returns:
+        RunResult: The run's measurements.
+
+    """
+    base = "/api/v1/chat" if target == "chat" else "/api/v1/agent"
+    path = base if target == "chat" else f"{base}/{agent_id}"
+    body = run_input()
+    result = RunResult()
+    start = time.perf_counter()
+    try:
+        if flow == "two-step":
+            response = await client.post(f"{path}/start", json=body)
+            response.raise_for_status()
+            request = client.stream("GET", f"{base}/stream/{response.json()['runId']}")
+        else:
+            request = client.stream(
+                "POST", path, json=body, headers={"accept": "text/event-stream"}
+            )
+
+        finished = False
+        async with request as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                elapsed = time.perf_counter() - start
+                event = json.loads(line[5:])
+                result.events += 1
+                if result.first_event is None:
+                    result.first_event = elapsed
+                if (
+                    event["type"] == "TEXT_MESSAGE_CONTENT"
+                    and result.first_text is None
+                ):
+                    result.first_text = elapsed
+                if event["type"] == "RUN_ERROR":
+                    result.error = event.get("message", "RUN_ERROR")
+                finished = finished or event["type"] == "RUN_FINISHED"
+
+        if not finished and result.error is None:
+            result.error = "stream ended before RUN_FINISHED"
+    except (httpx.HTTPError, json.JSONDecodeError, KeyError) as err:
+        result.error = f"{type(err).__name__}: {err}"
+
+    result.total = time.perf_counter() - start
+    return result
+
+
+async def generate(
+    client: httpx.AsyncClient, args: argparse.Namespace, flow: str
+) -> Dict[str, Any]:
+    """Start runs at the arrival rate and report their measurements.
+
+    Args:
+        client (httpx.AsyncClient): Client for the API.
+        args (argparse.Namespace): The command line arguments.
+        flow (str): `two-step` or `single`.
+
+    Returns:
+        Dict[str, Any]: The report.
+
+    """
+    rng = random.Random(args.seed)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    results: List[RunResult] = []
+
+    async def run() -> None:
+        try:
+            results.append(await run_once(client, args.target, flow, args.agent_id))
+        finally:
+            semaphore.release()
+
+    tasks: List[asyncio.Task] = []
+    start = time.perf_counter()
+    while len(tasks) < args.requests and (
+        not args.duration or time.perf_counter() - start < args.duration
+    ):
+        await semaphore.acquire()
+        tasks.append(asyncio.create_task(run()))
+        if args.rate:
+            interval = (
+                rng.expovariate(args.rate)
+                if args.arrival == "poisson"
+                else 1 / args.rate
+            )
+            await asyncio.sleep(interval)
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+
+    succeeded = [result for result in results if result.error is None]
+    errors: Dict[str, int] = {}
+    for result in results:
+        if result.error is not None:
+            errors[result.error] = errors.get(result.error, 0) + 1
+
+    return {
+        "target": args.target,
+        "flow": flow,
+        "requests": len(results),
+        "concurrency": args.concurrency,
+        "rate": args.rate,
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(len(succeeded) / elapsed, 2),
+        "events_per_second": round(sum(r.events for r in results) / elapsed, 2),
+        "error_rate": round(1 - len(succeeded) / len(results), 4) if results else 0,
+        "errors": errors,
+        "time_to_first_event_ms": summarise(
+            [r.first_event for r in succeeded if r.first_event is not None]
+        ),
+        "time_to_first_text_ms": summarise(
+            [r.first_text for r in succeeded if r.first_text is not None]
+        ),
+        "total_ms": summarise([r.total for r in succeeded]),
+    }
+
+
+# endregion Runs
+
+
+# region Set-up
+
+
+def fake_openai_config() -> Any:
+    """Return a script in which the chat calls the agent and the agent calls a tool."""
+    from benchmarks.fakes.latency import LatencyDistribution
+    from benchmarks.fakes.openai_server import (
+        FakeOpenAIConfig,
+        ScriptedToolCall,
+        ScriptedTurn,
+    )
+
+    return FakeOpenAIConfig(
+        script=[
+            ScriptedTurn(
+                content="Let me check.",
+                tool_calls=[
+                    ScriptedToolCall(
+                        name=DEFAULT_AGENT, arguments={"text": "List them"}
+                    ),
+                    ScriptedToolCall(name="list_notifications"),
+                ],
+            ),
+            ScriptedTurn(content="You have one pull request waiting for your review."),
+        ],
+        time_to_first_token=LatencyDistribution(
+            distribution="lognormal", mean=0.3, stddev=0.1
+        ),
+        inter_token=LatencyDistribution(mean=0.01),
+    )
+
+
+async def start_api(stack: AsyncExitStack, args: argparse.Namespace) -> str:
+    """Serve the API in-process, with the fake servers unless `--no-fakes` is given.
+
+    Args:
+        stack (AsyncExitStack): Stops the servers when it is closed.
+        args (argparse.Namespace): The command line arguments.
+
+    Returns:
+        str: The API's base URL.
+
+    """
+    from benchmarks.fakes.serve import serve
+
+    if not args.no_fakes:
+        from benchmarks.fakes.latency import LatencyDistribution
+        from benchmarks.fakes.mcp_server import FakeMcpConfig, create_http_app
+        from benchmarks.fakes.openai_server import create_app
+
+        mcp_config = FakeMcpConfig()
+        for tool in mcp_config.tools:
+            tool.latency = LatencyDistribution(mean=args.tool_latency)
+
+        openai_url = await stack.enter_async_context(
+            serve(create_app(fake_openai_config()))
+        )
+        mcp_url = await stack.enter_async_context(serve(create_http_app(mcp_config)))
+        # settings are read when the API first uses them, after this
+        os.environ.update(
+            OPENAI_API_BASE=openai_url,
+            OPENAI_API_KEY="fake",
+            OPENAI_API_VERSION="2024-10-21",
+            GITHUB_TOKEN="fake",
+            USE_STDIO="false",
+            GITHUB_MCP_URL=f"{mcp_url}/mcp/",
+            MCP_MANIFEST_CACHE="false",
+        )
+
+    from api.main import app
+
+    return await stack.enter_async_context(serve(app))
+
+
+async def wait_until_ready(client: httpx.AsyncClient, timeout: float) -> None:
+    """Wait for `GET /ready` to answer 200.
+
+    Args:
+        client (httpx.AsyncClient): Client for the API.
+        timeout (float): Seconds to wait.
+
+    """
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        try:
+            if (await client.get("/ready")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.1)
+    raise TimeoutError(f"The API was not ready within {timeout}s")
+
+
+# endregion Set-up
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    """Print a report as text."""
+    print(
+        f"{report['target']} {report['flow']}: {report['requests']} runs in "
+        f"{report['duration_s']}s, {report['throughput_rps']} runs/s, "
+        f"{report['events_per_second']} events/s, error rate {report['error_rate']:.2%}"
+    )
+    for error, count in report["errors"].items():
+        print(f"  {count} x {error}")
+    for name in ("time_to_first_event_ms", "time_to_first_text_ms", "total_ms"):
+        summary = report[name]
+        if summary is None:
+            continue
+        print(
+            f"  {name:<24}p50 {summary['p50']:>9.1f}  p95 {summary['p95']:>9.1f}  "
+            f"p99 {summary['p99']:>9.1f}  max {summary['max']:>9.1f}"
+        )
+
+    histogram_ = (report["total_ms"] or {}).get("histogram", [])
+    if histogram_:
+        print("  total_ms histogram:")
+        peak = max(count for _, count in histogram_)
+        for upper, count in histogram_:
+            print(
+                f"    <= {upper:>9.1f} ms {count:>6} {'#' * round(40 * count / peak)}"
+            )
+
+
+async def main(args: argparse.Namespace) -> None:
+    """Run the load test."""
+    async with AsyncExitStack() as stack:
+        url = args.url or await start_api(stack, args)
+        client = await stack.enter_async_context(
+            httpx.AsyncClient(
+                base_url=url,
+                timeout=args.timeout,
+                limits=httpx.Limits(max_connections=args.concurrency * 2),
+            )
+        )
+        await wait_until_ready(client, args.timeout)
+
+        flows = ["two-step", "single"] if args.flow == "both" else [args.flow]
+        if args.warmup:
+            await asyncio.gather(
+                *[
+                    run_once(client, args.target, flows[0], args.agent_id)
+                    for _ in range(args.warmup)
+                ]
+            )
+        reports = [await generate(client, args, flow) for flow in flows]
+
+    if args.json:
+        print(json.dumps(reports, indent=2))
+        return
+    for report in reports:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="Base URL of a running API")
+    parser.add_argument(
+        "--no-fakes",
+        action="store_true",
+        help="Serve the API in-process with the environment's settings",
+    )
+    parser.add_argument("--target", choices=["chat", "agent"], default="chat")
+    parser.add_argument("--agent-id", default=DEFAULT_AGENT, help="Agent to run")
+    parser.add_argument(
+        "--flow", choices=["two-step", "single", "both"], default="two-step"
+    )
+    parser.add_argument("--requests", type=int, default=100, help="Runs to start")
+    parser.add_argument(
+        "--duration", type=float, default=0, help="Stop starting runs after seconds"
+    )
+    parser.add_argument(
+        "--rate", type=float, default=10, help="Runs started per second, 0 for no limit"
+    )
+    parser.add_argument("--arrival", choices=["poisson", "constant"], default="poisson")
+    parser.add_argument("--concurrency", type=int, default=50, help="Runs in flight")
+    parser.add_argument("--warmup", type=int, default=2, help="Runs before measuring")
+    parser.add_argument(
+        "--tool-latency", type=float, default=0.05, help="Seconds the fake tools take"
+    )
+    parser.add_argument("--timeout", type=float, default=60, help="Seconds per request")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the arrivals")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,125 @@
+"""Benchmark for building the argument models of MCP tools.
+
+Registers a server advertising many tools which share `$defs`, then measures registration, building
+the tool manifest, using a handful of the tools, building every model, and building every model
+again from the schema cache.
+
+Usage:
+    python -m benchmarks.mcp_models --tools 60 --used 5
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Any, Dict
+
+from mcp.types import ListToolsResult, Tool
+
+from api.src import pydantic as models
+from api.src.mcp.base import BaseHttpMcpSession
+from api.src.tools.registry import ToolRegistry
+
+DEFS: Dict[str, Any] = {
+    "Label": {
+        "type": "object",
+        "properties": {"name": {"type": "string"}, "color": {"type": "string"}},
+        "required": ["name"],
+    },
+    "User": {
+        "type": "object",
+        "properties": {"login": {"type": "string"}, "id": {"type": "integer"}},
+        "required": ["login"],
+    },
+}
+
+
+def input_schema(i: int) -> Dict[str, Any]:
+    """Return the input schema of a tool, referencing the shared definitions."""
+    return {
+        "type": "object",
+        "$defs": DEFS,
+        "properties": {
+            "owner": {"type": "string"},
+            "repo": {"type": "string"},
+            f"field_{i}": {"type": "integer"},
+            "labels": {"type": "array", "items": {"$ref": "#/$defs/Label"}},
+            "assignees": {"type": "array", "items": {"$ref": "#/$defs/User"}},
+            "filter": {
+                "type": "object",
+                "properties": {
+                    "state": {"type": "string"},
+                    "author": {"$ref": "#/$defs/User"},
+                },
+            },
+        },
+        "required": ["owner", "repo"],
+    }
+
+
+class BenchmarkSession(BaseHttpMcpSession):
+    """MCP session advertising a fixed list of tools."""
+
+    tool_count: int = 60
+
+    async def list_tools(self) -> ListToolsResult:
+        """Return the advertised tools."""
+        return ListToolsResult(
+            tools=[
+                Tool(name=f"tool_{i}", description="Tool.", inputSchema=input_schema(i))
+                for i in range(self.tool_count)
+            ]
+        )
+
+
+def elapsed_ms(start: float) -> float:
+    """Return the milliseconds elapsed since `start`."""
+    return (time.perf_counter() - start) * 1000
+
+
+async def main(tools: int, used: int):
+    """Run the benchmark."""
+    session = BenchmarkSession(session_id="benchmark", tool_count=tools)
+    listed = (await session.list_tools()).tools
+
+    start = time.perf_counter()
+    registry = ToolRegistry()
+    await registry.register_mcp_server(session)
+    registered = elapsed_ms(start)
+
+    # the cards are built from the input schemas, so no model is built yet
+    start = time.perf_counter()
+    registry.tools
+    manifest = elapsed_ms(start)
+    manifest_models = len(models._schema_models)
+
+    start = time.perf_counter()
+    for i in range(used):
+        registry[f"tool_{i}"].tool_call_schema
+    first_use = elapsed_ms(start)
+
+    start = time.perf_counter()
+    for tool in listed:
+        registry[tool.name].tool_call_schema
+    all_models = elapsed_ms(start)
+
+    start = time.perf_counter()
+    for tool in listed:
+        models.model_from_schema(tool.name, tool.inputSchema)
+    cached = elapsed_ms(start)
+
+    print(f"{tools} tools advertised, {used} used")
+    print(f"  register server:         {registered:8.2f} ms")
+    print(f"  build manifest:          {manifest:8.2f} ms")
+    print(f"  models built by it:      {manifest_models:8d}")
+    print(f"  build {used:>3} used models:    {first_use:8.2f} ms")
+    print(f"  build all models:        {all_models + first_use:8.2f} ms")
+    print(f"  rebuild from cache:      {cached:8.2f} ms")
+    print(f"  nested models built:     {len(models._nested_models) - tools:8d}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tools", type=int, default=60, help="Tools advertised")
+    parser.add_argument("--used", type=int, default=5, help="Tools used")
+    args = parser.parse_args()
+    asyncio.run(main(args.tools, args.used))
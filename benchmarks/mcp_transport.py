@@ -0,0 +1,190 @@
+"""Throughput benchmark of the MCP stdio and streamable HTTP transports.
+
+Runs the scripted MCP server in a subprocess, over stdio and then over HTTP, and calls one of its
+tools many times through `BaseHttpMcpSession`, so the calls go through the same session pool as
+the agents' calls. Both servers answer after the same latency, so the difference between the runs
+is the transport.
+
+Usage:
+    python -m benchmarks.mcp_transport --calls 1000 --concurrency 50
+    python -m benchmarks.mcp_transport --transport http --pool-size 4 --latency 0.01
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List
+
+import httpx
+from mcp.client.stdio import StdioServerParameters
+
+from api.src.mcp.base import BaseHttpMcpSession
+from api.src.mcp.pool import get_mcp_session_manager
+from benchmarks.fakes.serve import free_port
+from benchmarks.load import percentile
+
+SERVER = [sys.executable, "-m", "benchmarks.fakes.mcp_server"]
+
+
+@asynccontextmanager
+async def http_server(latency: float) -> AsyncIterator[str]:
+    """Run the scripted MCP server over HTTP in a subprocess until the block exits.
+
+    Args:
+        latency (float): Mean seconds before every tool answers.
+
+    Yields:
+        str: The URL of the server's MCP endpoint.
+
+    """
+    port = free_port()
+    process = await asyncio.create_subprocess_exec(
+        *SERVER,
+        "--transport",
+        "http",
+        "--port",
+        str(port),
+        "--latency",
+        str(latency),
+    )
+    try:
+        async with httpx.AsyncClient() as client:
+            while True:
+                try:
+                    await client.get(f"http://127.0.0.1:{port}/")
+                    break
+                except httpx.ConnectError:
+                    if process.returncode is not None:
+                        raise RuntimeError("The MCP server exited on start-up")
+                    await asyncio.sleep(0.05)
+        yield f"http://127.0.0.1:{port}/mcp/"
+    finally:
+        process.terminate()
+        await process.wait()
+
+
+async def run(
+    session: BaseHttpMcpSession, calls: int, concurrency: int
+) -> Dict[str, Any]:
+    """Call the server's `list_notifications` tool and time the calls.
+
+    Args:
+        session (BaseHttpMcpSession): The session to the server.
+        calls (int): The number of calls.
+        concurrency (int): The number of calls in flight at once.
+
+    Returns:
+        Dict[str, Any]: The throughput and latency percentiles of the calls.
+
+    """
+    # open every pooled session before timing
+    await asyncio.gather(
+        *[
+            session.call_tool(name="list_notifications", tool_args={})
+            for _ in range(session.pool_size)
+        ]
+    )
+
+    latencies: List[float] = []
+    errors = 0
+    remaining = iter(range(calls))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            start = time.perf_counter()
+            result = await session.call_tool(
+                name="list_notifications", tool_args={"owner": "octo"}
+            )
+            latencies.append(time.perf_counter() - start)
+            errors += result.isError
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+
+    return {
+        "calls": calls,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "calls_per_second": round(calls / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+async def main(args: argparse.Namespace) -> Dict[str, Dict[str, Any]]:
+    """Run the benchmark for each transport.
+
+    Args:
+        args (argparse.Namespace): The command line arguments.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: The results by transport.
+
+    """
+    report = {}
+    try:
+        if args.transport in ("stdio", "both"):
+            session = BaseHttpMcpSession(
+                session_id="benchmark-stdio",
+                use_stdio=True,
+                stdio_parameters=StdioServerParameters(
+                    command=SERVER[0],
+                    args=[*SERVER[1:], "--latency", str(args.latency)],
+                ),
+                pool_size=args.pool_size,
+            )
+            report["stdio"] = await run(session, args.calls, args.concurrency)
+
+        if args.transport in ("http", "both"):
+            async with http_server(args.latency) as url:
+                session = BaseHttpMcpSession(
+                    session_id="benchmark-http", url=url, pool_size=args.pool_size
+                )
+                report["http"] = await run(session, args.calls, args.concurrency)
+                # close the sessions while the server is still up
+                await get_mcp_session_manager().close()
+    finally:
+        await get_mcp_session_manager().close()
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--transport",
+        choices=["stdio", "http", "both"],
+        default="both",
+        help="Transports to benchmark",
+    )
+    parser.add_argument("--calls", type=int, default=1000, help="Number of calls")
+    parser.add_argument(
+        "--concurrency", type=int, default=50, help="Calls in flight at once"
+    )
+    parser.add_argument(
+        "--pool-size", type=int, default=2, help="Pooled sessions per transport"
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="Mean seconds before every tool answers",
+    )
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for transport, result in report.items():
+            print(
+                f"{transport:>5}: {result['calls_per_second']:>8} calls/s, "
+                f"p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms, "
+                f"p99 {result['p99_ms']} ms, {result['errors']} errors"
+            )
@@ -0,0 +1,506 @@
+"""Microbenchmark suite for the per-request helpers, with regression thresholds.
+
+Times the helpers run for every request or round trip on realistic inputs, such as the GitHub MCP
+server's tool schemas in `benchmarks/fixtures/github_mcp_tools.json`, captured from the server with
+`python -m benchmarks.capture_tools`. Each benchmark is timed as the best of `--repeat` runs of a
+loop calibrated to last at least `--min-time` seconds, in microseconds per call.
+
+Save the results of a run with `--save` and compare a later run with them with `--compare`. A
+benchmark regresses when its best time is more than its threshold slower than the saved one, and
+the run then exits with status 1. Results record the interpreter, platform and commit they were
+measured on, as timings are only comparable on the same machine.
+
+Usage:
+    python -m benchmarks.micro --save .jarvis/benchmarks/baseline.json
+    python -m benchmarks.micro --compare .jarvis/benchmarks/baseline.json
+    python -m benchmarks.micro --filter create_tool --repeat 10
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import timeit
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Annotated, Any, Callable, Dict, List, Optional, Tuple
+
+from a2a.types import AgentCapabilities, AgentSkill
+from ag_ui.core import EventType, TextMessageContentEvent, ToolCallArgsEvent
+from ag_ui.encoder import EventEncoder
+from mcp.types import ListToolsResult, Tool
+from pydantic import BaseModel, Field
+
+from api.src import pydantic as models
+from api.src.agents.base import BaseAgent
+from api.src.agents.registry import A2AOptions, AgentRegistry
+from api.src.messages.create import create_message
+from api.src.messages.message import ChatMessage
+from api.src.openai.tools import (
+    create_client_tool,
+    create_tool,
+    strict_json_schema,
+)
+from api.src.pydantic import ConfiguredBaseModel
+from api.src.utils.options import validate_options
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+DEFAULT_THRESHOLD = 0.25
+
+Setup = Callable[[], Callable[[], Any]]
+
+BENCHMARKS: Dict[str, Tuple[Setup, float]] = {}
+
+
+class BenchmarkResult(ConfiguredBaseModel):
+    """Timings of a benchmark."""
+
+    best_us: Annotated[float, Field(description="Best time per call in microseconds")]
+    median_us: Annotated[
+        float, Field(description="Median time per call in microseconds")
+    ]
+    loops: Annotated[int, Field(description="Calls in each timed run")]
+    repeat: Annotated[int, Field(description="Timed runs")]
+
+
+class Report(ConfiguredBaseModel):
+    """Results of a run of the suite."""
+
+    python: Annotated[str, Field(description="Version of the interpreter")]
+    platform: Annotated[str, Field(description="Platform the suite ran on")]
+    commit: Annotated[
+        Optional[str], Field(default=None, description="Commit of the code measured")
+    ]
+    created: Annotated[str, Field(description="When the suite ran, in ISO 8601")]
+    results: Annotated[
+        Dict[str, BenchmarkResult], Field(description="Timings by benchmark")
+    ]
+
+
+def benchmark(
+    name: str, threshold: float = DEFAULT_THRESHOLD
+) -> Callable[[Setup], Setup]:
+    """Register a benchmark.
+
+    The decorated function sets the benchmark up and returns the call to time, so the set-up is
+    not measured.
+
+    Args:
+        name (str): The name of the benchmark, `<helper>/<case>`.
+        threshold (float, optional): The fraction by which the benchmark may be slower than the
+            baseline before it regresses. Defaults to DEFAULT_THRESHOLD.
+
+    Returns:
+        Callable[[Setup], Setup]: The decorator.
+
+    """
+
+    def decorator(setup: Setup) -> Setup:
+        BENCHMARKS[name] = (setup, threshold)
+        return setup
+
+    return decorator
+
+
+# region Fixtures
+
+
+def github_tools() -> List[Tool]:
+    """Return the GitHub MCP server's tools."""
+    return ListToolsResult.model_validate_json(
+        (FIXTURES / "github_mcp_tools.json").read_text(encoding="utf-8")
+    ).tools
+
+
+class Position(BaseModel):
+    """Position of a review comment."""
+
+    path: str = Field(description="Path of the file commented on")
+    line: int = Field(description="Line commented on")
+    side: Optional[str] = Field(default=None, description="LEFT or RIGHT of the diff")
+
+
+class ReviewComment(BaseModel):
+    """A comment of a pull request review."""
+
+    body: str = Field(description="Text of the comment")
+    position: Position = Field(description="Where the comment is")
+    suggestions: List[Position] = Field(
+        default_factory=list, description="Lines the comment suggests changes to"
+    )
+
+
+class ReviewArguments(BaseModel):
+    """Arguments of a pull request review, with nested `$defs`."""
+
+    owner: str = Field(description="Repository owner")
+    repo: str = Field(description="Repository name")
+    pull_number: int = Field(ge=1, description="Pull request number")
+    event: str = Field(default="COMMENT", description="Review action to perform")
+    comments: List[ReviewComment] = Field(
+        default_factory=list, description="Comments of the review"
+    )
+
+
+def github_agent(index: int = 0) -> BaseAgent:
+    """Return an agent like the GitHub notification agent, without tools."""
+    return BaseAgent(
+        capabilities=AgentCapabilities(
+            pushNotifications=False, stateTransitionHistory=False, streaming=False
+        ),
+        defaultInputModes=["text"],
+        defaultOutputModes=["text"],
+        description="Agent for managing your GitHub notifications",
+        url="https://localhost:41241",
+        version="0.1.0",
+        id=f"github-notification-agent-{index}",
+        name=f"GitHub Notification Agent {index}",
+        model="gpt-4o-mini_2024-07-18",
+        instructions="This agent handles notifications and alerts.",
+        skills=[
+            AgentSkill(
+                name="List Notifications",
+                description="List all notifications from your GitHub account",
+                inputModes=["text"],
+                outputModes=["text"],
+                id="list_notifications",
+                tags=["notifications", "github"],
+            ),
+            AgentSkill(
+                name="Get Notification Details",
+                description="Get details of a specific notification",
+                inputModes=["text"],
+                outputModes=["text"],
+                id="get_notification_details",
+                tags=["notifications", "github"],
+            ),
+        ],
+        tool_registry=None,
+    )
+
+
+TOOL_CALLS = [
+    {
+        "id": f"call_{i}",
+        "type": "function",
+        "function": {
+            "name": "get_notification_details",
+            "arguments": json.dumps({"notificationID": str(i)}),
+        },
+    }
+    for i in range(3)
+]
+
+
+# endregion Fixtures
+
+
+# region Benchmarks
+
+
+@benchmark("create_tool/github-mcp-strict")
+def _create_tool_github() -> Callable[[], Any]:
+    tools = github_tools()
+    # the path of MCPTool.card, which builds the card from the input schema
+    return lambda: [
+        create_tool(
+            tool.name,
+            tool.description,
+            strict_json_schema(tool.inputSchema),
+            strict=True,
+        )
+        for tool in tools
+    ]
+
+
+@benchmark("create_tool/nested-defs-strict")
+def _create_tool_defs() -> Callable[[], Any]:
+    return lambda: create_tool(
+        "create_pull_request_review", "Review a pull request.", ReviewArguments, True
+    )
+
+
+@benchmark("create_tool/client-schema")
+def _create_tool_client() -> Callable[[], Any]:
+    tool = github_tools()[0]
+    # the uncached path, taken the first time a client sends a tool
+    create = create_client_tool.__wrapped__
+    return lambda: create(tool.name, tool.description, tool.inputSchema)
+
+
+@benchmark("model_from_schema/github-mcp-cold", threshold=0.5)
+def _model_from_schema_cold() -> Callable[[], Any]:
+    tools = github_tools()
+
+    def build() -> None:
+        models._schema_models.clear()
+        models._nested_models.clear()
+        for tool in tools:
+            models.model_from_schema(tool.name, tool.inputSchema)
+
+    return build
+
+
+@benchmark("model_from_schema/github-mcp-cached")
+def _model_from_schema_cached() -> Callable[[], Any]:
+    tools = github_tools()
+    for tool in tools:
+        models.model_from_schema(tool.name, tool.inputSchema)
+    return lambda: [
+        models.model_from_schema(tool.name, tool.inputSchema) for tool in tools
+    ]
+
+
+@benchmark("create_message/user")
+def _create_message_user() -> Callable[[], Any]:
+    return lambda: create_message("Any new notifications?", "user")
+
+
+@benchmark("create_message/assistant-tool-calls")
+def _create_message_assistant() -> Callable[[], Any]:
+    return lambda: create_message("", "assistant", tool_calls=TOOL_CALLS)
+
+
+@benchmark("create_message/tool")
+def _create_message_tool() -> Callable[[], Any]:
+    result = github_tools()[0].model_dump_json()
+    return lambda: create_message(result, "tool", None, "call_0")
+
+
+@benchmark("ChatMessage.as_type/user")
+def _as_type_user() -> Callable[[], Any]:
+    message = ChatMessage(role="user", content="Any new notifications?")
+    return lambda: message.as_type
+
+
+@benchmark("ChatMessage.as_type/assistant-tool-calls")
+def _as_type_assistant() -> Callable[[], Any]:
+    message = ChatMessage(role="assistant", content="", tool_calls=TOOL_CALLS)
+    return lambda: message.as_type
+
+
+@validate_options(A2AOptions)
+def execute_agent(id: str, queue: Any, options: Any) -> Any:
+    """Stand-in for `AgentRegistry.execute_agent`."""
+    return options
+
+
+@benchmark("validate_options/dict")
+def _validate_options_dict() -> Callable[[], Any]:
+    options = {"text": "Any new notifications?", "thread_id": "thread"}
+    return lambda: execute_agent("agent", None, options=options)
+
+
+@benchmark("validate_options/model")
+def _validate_options_model() -> Callable[[], Any]:
+    options = A2AOptions(text="Any new notifications?", thread_id="thread")
+    return lambda: execute_agent("agent", None, options=options)
+
+
+@benchmark("BaseAgent.card")
+def _agent_card() -> Callable[[], Any]:
+    agent = github_agent()
+    return lambda: agent.card
+
+
+def _agent_registry(agents: int) -> AgentRegistry:
+    registry = AgentRegistry()
+    for agent in list(registry):
+        registry.unregister(agent.id)
+    for index in range(agents):
+        registry.register(github_agent(index))
+    return registry
+
+
+@benchmark("AgentRegistry.agents_as_tools/manifest")
+def _agents_as_tools() -> Callable[[], Any]:
+    registry = _agent_registry(5)
+    return lambda: registry.agents_as_tools
+
+
+@benchmark("AgentRegistry.agents_as_tools/rebuild")
+def _agents_as_tools_rebuild() -> Callable[[], Any]:
+    registry = _agent_registry(5)
+
+    def rebuild() -> Any:
+        registry._invalidate()
+        return registry.agents_as_tools
+
+    return rebuild
+
+
+@benchmark("EventEncoder.encode/text-delta")
+def _encode_text() -> Callable[[], Any]:
+    encoder = EventEncoder()
+    event = TextMessageContentEvent(
+        type=EventType.TEXT_MESSAGE_CONTENT, message_id="message", delta="You have one "
+    )
+    return lambda: encoder.encode(event)
+
+
+@benchmark("EventEncoder.encode/tool-call-args")
+def _encode_tool_call() -> Callable[[], Any]:
+    encoder = EventEncoder()
+    event = ToolCallArgsEvent(
+        type=EventType.TOOL_CALL_ARGS,
+        tool_call_id="call_0",
+        delta=json.dumps({"text": "List my unread notifications for octo/jarvis"}),
+    )
+    return lambda: encoder.encode(event)
+
+
+# endregion Benchmarks
+
+
+# region Runner
+
+
+def measure(fn: Callable[[], Any], repeat: int, min_time: float) -> BenchmarkResult:
+    """Time a call.
+
+    Args:
+        fn (Callable[[], Any]): The call.
+        repeat (int): The number of timed runs.
+        min_time (float): The minimum seconds of each timed run.
+
+    Returns:
+        BenchmarkResult: The timings.
+
+    """
+    timer = timeit.Timer(fn)
+    loops = 1
+    while timer.timeit(loops) < min_time:
+        loops *= 2
+    times = [elapsed / loops * 1e6 for elapsed in timer.repeat(repeat, loops)]
+    return BenchmarkResult(
+        best_us=round(min(times), 3),
+        median_us=round(statistics.median(times), 3),
+        loops=loops,
+        repeat=repeat,
+    )
+
+
+def current_commit() -> Optional[str]:
+    """Return the abbreviated hash of the checked out commit, if known."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+            cwd=Path(__file__).parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(names: List[str], repeat: int, min_time: float) -> Report:
+    """Run benchmarks.
+
+    Args:
+        names (List[str]): The benchmarks to run.
+        repeat (int): The number of timed runs of each benchmark.
+        min_time (float): The minimum seconds of each timed run.
+
+    Returns:
+        Report: The results.
+
+    """
+    results = {}
+    for name in names:
+        setup, _ = BENCHMARKS[name]
+        results[name] = measure(setup(), repeat, min_time)
+        print(
+            f"  {name:<44}{results[name].best_us:>12.2f}{results[name].median_us:>12.2f}",
+            file=sys.stderr,
+        )
+    return Report(
+        python=platform.python_version(),
+        platform=platform.platform(),
+        commit=current_commit(),
+        created=datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        results=results,
+    )
+
+
+def compare(report: Report, baseline: Report, threshold: Optional[float]) -> bool:
+    """Print the change of each benchmark since the baseline.
+
+    Args:
+        report (Report): The results of this run.
+        baseline (Report): The results to compare with.
+        threshold (Optional[float]): The threshold of every benchmark. Defaults to None, using
+            each benchmark's own.
+
+    Returns:
+        bool: Whether any benchmark regressed.
+
+    """
+    if (baseline.python, baseline.platform) != (report.python, report.platform):
+        print(
+            f"warning: the baseline was measured with Python {baseline.python} on "
+            f"{baseline.platform}, timings may not be comparable"
+        )
+    print(f"compared with {baseline.commit or 'unknown commit'} ({baseline.created})")
+    print(f"  {'benchmark':<44}{'baseline':>12}{'now':>12}{'change':>9}")
+
+    regressed = False
+    for name, result in report.results.items():
+        before = baseline.results.get(name)
+        if before is None:
+            print(f"  {name:<44}{'':>12}{result.best_us:>12.2f}{'new':>9}")
+            continue
+        change = result.best_us / before.best_us - 1
+        limit = BENCHMARKS[name][1] if threshold is None else threshold
+        status = ""
+        if change > limit:
+            regressed = True
+            status = f"  REGRESSED (> {limit:.0%})"
+        print(
+            f"  {name:<44}{before.best_us:>12.2f}{result.best_us:>12.2f}{change:>+9.1%}"
+            f"{status}"
+        )
+    return regressed
+
+
+def main(args: argparse.Namespace) -> int:
+    """Run the suite, returning the exit status."""
+    names = [name for name in BENCHMARKS if not args.filter or args.filter in name]
+    print(
+        f"  {'benchmark (us per call)':<44}{'best':>12}{'median':>12}", file=sys.stderr
+    )
+    report = run(names, args.repeat, args.min_time)
+
+    if args.save:
+        args.save.parent.mkdir(parents=True, exist_ok=True)
+        args.save.write_text(report.model_dump_json(indent=2), encoding="utf-8")
+    if args.json:
+        print(report.model_dump_json(indent=2))
+    if args.compare:
+        baseline = Report.model_validate_json(args.compare.read_text(encoding="utf-8"))
+        return int(compare(report, baseline, args.threshold))
+    return 0
+
+
+# endregion Runner
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--filter", help="Only run benchmarks whose name contains this")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs of each")
+    parser.add_argument(
+        "--min-time", type=float, default=0.1, help="Minimum seconds of a timed run"
+    )
+    parser.add_argument("--save", type=Path, help="Write the results to this file")
+    parser.add_argument("--compare", type=Path, help="Results to compare with")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        help="Slowdown of any benchmark which is a regression, e.g. 0.25 for 25%%",
+    )
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    sys.exit(main(parser.parse_args()))
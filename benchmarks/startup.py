@@ -0,0 +1,164 @@
+"""Benchmark for the API's import time and time to first request.
+
+Import time is measured with `python -X importtime`, in a fresh interpreter for each repeat. Time
+to first request starts uvicorn in a subprocess and polls `GET /` until it answers, so it includes
+the application's lifespan start-up.
+
+Usage:
+    python -m benchmarks.startup --repeat 5
+    python -m benchmarks.startup --skip-server --top 20
+"""
+
+import argparse
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+import httpx
+
+IMPORTTIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$")
+
+
+def import_time(module: str) -> Tuple[float, Dict[str, float]]:
+    """Import a module in a fresh interpreter with `-X importtime`.
+
+    Args:
+        module (str): The module to import.
+
+    Returns:
+        Tuple[float, Dict[str, float]]: The cumulative import time of the module in milliseconds,
+            and the self time in milliseconds of each top-level package it imported.
+
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    total = 0.0
+    packages: Dict[str, float] = defaultdict(float)
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, _, name = match.groups()
+        packages[name.split(".")[0]] += int(self_us) / 1000
+        if name == module:
+            total = int(cumulative_us) / 1000
+    return total, packages
+
+
+def free_port() -> int:
+    """Return a free local TCP port."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def first_request_time(app: str, timeout: float) -> float:
+    """Start uvicorn and measure the time until the first request succeeds.
+
+    Args:
+        app (str): The application to serve, e.g. `api.main:app`.
+        timeout (float): Seconds to wait for the server to answer.
+
+    Returns:
+        float: Milliseconds from starting the process to the first successful response.
+
+    """
+    port = free_port()
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            app,
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        env=os.environ.copy(),
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/", timeout=1).is_success:
+                    return (time.perf_counter() - start) * 1000
+            except httpx.TransportError:
+                pass
+            if process.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with code {process.returncode}")
+            time.sleep(0.01)
+        raise TimeoutError(f"{app} did not answer within {timeout}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main(args: argparse.Namespace):
+    """Run the benchmark."""
+    imports: List[float] = []
+    packages: Dict[str, List[float]] = defaultdict(list)
+    for _ in range(args.repeat):
+        total, by_package = import_time(args.module)
+        imports.append(total)
+        for name, ms in by_package.items():
+            packages[name].append(ms)
+
+    first_requests = (
+        []
+        if args.skip_server
+        else [first_request_time(args.app, args.timeout) for _ in range(args.repeat)]
+    )
+
+    slowest = sorted(
+        ((statistics.median(ms), name) for name, ms in packages.items()), reverse=True
+    )[: args.top]
+    results = {
+        "module": args.module,
+        "repeat": args.repeat,
+        "import_ms": statistics.median(imports),
+        "first_request_ms": (
+            statistics.median(first_requests) if first_requests else None
+        ),
+        "packages_ms": {name: round(ms, 2) for ms, name in slowest},
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"median over {args.repeat} runs")
+    print(f"  {'import ' + args.module:<32}{results['import_ms']:10.1f} ms")
+    if first_requests:
+        print(f"  {'first request':<32}{results['first_request_ms']:10.1f} ms")
+    print("  slowest packages (self time):")
+    for ms, name in slowest:
+        print(f"    {name:<30}{ms:10.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="api.main", help="Module to import")
+    parser.add_argument("--app", default="api.main:app", help="Application to serve")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of runs")
+    parser.add_argument("--top", type=int, default=10, help="Packages to list")
+    parser.add_argument("--timeout", type=float, default=60, help="Server timeout")
+    parser.add_argument(
+        "--skip-server", action="store_true", help="Only measure import time"
+    )
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    main(parser.parse_args())
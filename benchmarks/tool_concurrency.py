@@ -0,0 +1,83 @@
+"""Stress test for concurrent calls to a single MCP tool.
+
+Issues many concurrent calls to one registered `MCPTool`, backed by an in-process session which
+answers after a random delay so the calls interleave, and checks every response answers the tool
+call which asked for it.
+
+Usage:
+    python -m benchmarks.tool_concurrency --calls 500
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from typing import Any, Dict
+
+from mcp.types import CallToolResult, TextContent
+from openai.types.chat.chat_completion_message_tool_call import (
+    ChatCompletionMessageToolCall,
+    Function,
+)
+from pydantic import BaseModel
+
+from api.src.mcp.base import BaseHttpMcpSession, MCPTool
+
+
+class EchoArgs(BaseModel):
+    """Arguments for the echo tool."""
+
+    value: str
+
+
+class EchoSession(BaseHttpMcpSession):
+    """MCP session which echoes the tool arguments after a random delay."""
+
+    async def call_tool(self, name: str, tool_args: Dict[str, Any]) -> CallToolResult:
+        """Echo the tool arguments back after a random delay."""
+        await asyncio.sleep(random.uniform(0, 0.01))
+        return CallToolResult(
+            content=[TextContent(type="text", text=tool_args["value"])]
+        )
+
+
+async def main(calls: int) -> int:
+    """Run the stress test and return the number of mismatched responses."""
+    tool = MCPTool(
+        session=EchoSession(session_id="echo"),
+        name="echo",
+        description="Echo the value back.",
+        tool_call_schema=EchoArgs,
+    )
+    tool_calls = [
+        ChatCompletionMessageToolCall(
+            id=f"call_{i}",
+            type="function",
+            function=Function(name="echo", arguments=json.dumps({"value": str(i)})),
+        )
+        for i in range(calls)
+    ]
+
+    start = time.perf_counter()
+    responses = await asyncio.gather(
+        *[tool.run(options={"tool_call": tool_call}) for tool_call in tool_calls]
+    )
+    elapsed = time.perf_counter() - start
+
+    mismatched = 0
+    for tool_call, response in zip(tool_calls, responses):
+        value = json.loads(response["content"])[0]["text"]
+        if response["tool_call_id"] != tool_call.id or f"call_{value}" != tool_call.id:
+            mismatched += 1
+
+    print(f"{calls} concurrent calls in {elapsed:.3f}s, {mismatched} mismatched")
+    return mismatched
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=500, help="Number of calls")
+    args = parser.parse_args()
+    sys.exit(1 if asyncio.run(main(args.calls)) else 0)
@@ -0,0 +1,88 @@
+"""Microbenchmark for the per-turn cost of building tool schemas.
+
+Compares generating the tool schemas for every round trip, as `create_tool` does, with reading them
+from the registries' precompiled manifests and the client tool cache.
+
+Usage:
+    python -m benchmarks.tool_manifest --tools 30 --turns 200
+"""
+
+import argparse
+import time
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+from api.src.mcp.base import BaseHttpMcpSession, MCPTool
+from api.src.openai.tools import create_client_tool, create_tool
+from api.src.tools.registry import ToolRegistry
+
+
+class Item(BaseModel):
+    """Nested model for the benchmark tools."""
+
+    name: str = Field(description="Name of the item")
+    labels: List[str] = Field(default_factory=list, description="Labels of the item")
+
+
+class Arguments(BaseModel):
+    """Arguments for the benchmark tools."""
+
+    owner: str = Field(description="Owner of the repository")
+    repo: str = Field(description="Name of the repository")
+    page: Optional[int] = Field(default=None, ge=1, description="Page number")
+    items: List[Item] = Field(default_factory=list, description="Items to create")
+
+
+CLIENT_PARAMETERS = {
+    "type": "object",
+    "properties": {
+        "message": {"type": "string", "description": "Message to show"},
+        "level": {"type": "string", "enum": ["info", "warning", "error"]},
+    },
+}
+
+
+def timed(fn, turns: int) -> float:
+    """Return the mean time in milliseconds of calling `fn`."""
+    start = time.perf_counter()
+    for _ in range(turns):
+        fn()
+    return (time.perf_counter() - start) / turns * 1000
+
+
+def main(tools: int, turns: int):
+    """Run the benchmark."""
+    session = BaseHttpMcpSession(session_id="benchmark")
+    registry = ToolRegistry()
+    for i in range(tools):
+        registry.register_tool(
+            MCPTool(
+                session=session,
+                name=f"tool_{i}",
+                description="Benchmark tool.",
+                tool_call_schema=Arguments,
+            )
+        )
+
+    def rebuild():
+        [tool.card for tool in registry._tools.values()]
+        create_tool("notify", "Show a message.", dict(CLIENT_PARAMETERS))
+
+    def manifest():
+        registry.tools
+        create_client_tool("notify", "Show a message.", CLIENT_PARAMETERS)
+
+    before = timed(rebuild, turns)
+    after = timed(manifest, turns)
+    print(f"{tools} tools, mean per turn over {turns} turns")
+    print(f"  rebuilt every turn:  {before:8.3f} ms")
+    print(f"  cached manifest:     {after:8.3f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tools", type=int, default=30, help="Number of tools")
+    parser.add_argument("--turns", type=int, default=200, help="Number of turns")
+    args = parser.parse_args()
+    main(args.tools, args.turns)
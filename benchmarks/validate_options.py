@@ -0,0 +1,109 @@
+"""Microbenchmarks for the entry points decorated with `validate_options`.
+
+Measures the mean time per call of each decorated entry point, passing options as a dict and as
+an already validated model, against calling the undecorated function through `__wrapped__`. The
+entry points' bodies are stubbed out so only the decorator's cost is measured.
+
+Usage:
+    python -m benchmarks.validate_options --calls 20000
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Any, Callable, Dict
+
+from openai.types.chat.chat_completion_message_tool_call import (
+    ChatCompletionMessageToolCall,
+    Function,
+)
+
+from api.src.agents.registry import A2AOptions
+from api.src.openai.client import Credentials
+from api.src.tools.base import BaseToolOptions
+from api.src.utils.options import validate_options
+
+
+@validate_options(A2AOptions)
+async def execute_agent(id: str, queue: Any, options: Any) -> None:
+    """Stand-in for `AgentRegistry.execute_agent`."""
+
+
+@validate_options(BaseToolOptions)
+async def run(self: Any, options: Any) -> None:
+    """Stand-in for `MCPTool.run`."""
+
+
+@validate_options(BaseToolOptions)
+async def call_tool(self: Any, name: str, tool_args: Dict[str, Any]) -> None:
+    """Stand-in for `BaseHttpMcpSession.call_tool`."""
+
+
+@validate_options(Credentials)
+def get_client(client: Any, options: Any) -> None:
+    """Stand-in for `get_client`."""
+
+
+def measure(fn: Callable[[], Any], calls: int) -> float:
+    """Return the mean time in microseconds of calling `fn`."""
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def measure_async(fn: Callable[[], Any], calls: int) -> float:
+    """Return the mean time in microseconds of awaiting `fn`."""
+
+    async def loop():
+        start = time.perf_counter()
+        for _ in range(calls):
+            await fn()
+        return (time.perf_counter() - start) / calls * 1e6
+
+    return asyncio.run(loop())
+
+
+def main(calls: int):
+    """Run the benchmarks."""
+    tool_call = ChatCompletionMessageToolCall(
+        id="call", type="function", function=Function(name="tool", arguments="{}")
+    )
+    agent = {"text": "hello", "thread_id": "thread"}
+    credentials = {"openai_api_version": "2024-06-01"}
+
+    cases = {
+        "execute_agent (dict)": (
+            lambda: execute_agent("agent", None, options=agent),
+            lambda: execute_agent.__wrapped__("agent", None, options=agent),
+        ),
+        "execute_agent (model)": (
+            lambda: execute_agent("agent", None, options=A2AOptions(**agent)),
+            lambda: execute_agent.__wrapped__("agent", None, A2AOptions(**agent)),
+        ),
+        "MCPTool.run (dict)": (
+            lambda: run(None, options={"tool_call": tool_call}),
+            lambda: run.__wrapped__(None, options={"tool_call": tool_call}),
+        ),
+        "call_tool (no options)": (
+            lambda: call_tool(None, name="tool", tool_args={}),
+            None,
+        ),
+    }
+    print(f"mean per call over {calls} calls, in microseconds")
+    print(f"  {'entry point':<26}{'decorated':>12}{'undecorated':>14}")
+    for name, (decorated, undecorated) in cases.items():
+        after = measure_async(decorated, calls)
+        before = measure_async(undecorated, calls) if undecorated else after
+        print(f"  {name:<26}{after:>12.2f}{before:>14.2f}")
+
+    after = measure(lambda: get_client(object, options=credentials), calls)
+    before = measure(lambda: get_client.__wrapped__(object, options=credentials), calls)
+    print(f"  {'get_client (dict)':<26}{after:>12.2f}{before:>14.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=20000, help="Number of calls")
+    args = parser.parse_args()
+    main(args.calls)
@@ -404,7 +404,7 @@ export const ChatProvider = ({ children }: ChatProviderProps) => {
                 if (msg.id === message.messageId) {
                   return {
                     ...msg,
-                    content: message.delta,
+                    content: (msg.content || "") + message.delta,
                   };
                 }
                 return msg;
@@ -416,7 +416,7 @@ export const ChatProvider = ({ children }: ChatProviderProps) => {
                     msg.id === message.messageId
                       ? {
                           ...msg,
-                          content: message.delta,
+                          content: (msg.content || "") + message.delta,
                         }
                       : msg
                   )
@@ -445,7 +445,7 @@ export const ChatProvider = ({ children }: ChatProviderProps) => {
             }
 
             if (toolCall && message && "toolCalls" in message) {
-              toolCall.function.arguments = toolCallArgs.delta;
+              toolCall.function.arguments += toolCallArgs.delta;
 
               // Update the tool call in the message's toolCalls array
               message.toolCalls = message.toolCalls!.map((tc) =>
@@ -0,0 +1,86 @@
+"""Tests that abandoning a call to an agent stops the agent."""
+
+import asyncio
+import uuid
+
+import pytest
+from a2a.types import Message, Part, Role, TextPart
+from ag_ui.core import RunAgentInput, UserMessage
+from openai.types.chat.chat_completion_message_tool_call import (
+    ChatCompletionMessageToolCall,
+    Function,
+)
+
+from api.services.agent import router as agent_router
+from api.services.chat import router as chat_router
+
+
+class FakeAgent:
+    """Stands in for `AgentRegistry.execute_agent`, answering once and then running forever."""
+
+    def __init__(self):
+        self.started = asyncio.Event()
+        self.cancelled = False
+
+    async def execute_agent(self, id, queue, options):  # noqa: A002
+        queue.enqueue_event(
+            Message(
+                messageId=uuid.uuid4().hex,
+                role=Role.agent,
+                parts=[Part(root=TextPart(kind="text", text="Working on it"))],
+            )
+        )
+        self.started.set()
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+
+@pytest.fixture
+def agent(monkeypatch) -> FakeAgent:
+    fake = FakeAgent()
+    monkeypatch.setattr(chat_router.agent_registry, "execute_agent", fake.execute_agent)
+    return fake
+
+
+def test_cancelling_call_agent_cancels_agent(agent):
+    async def run():
+        tool_call = ChatCompletionMessageToolCall(
+            id="call_1",
+            type="function",
+            function=Function(
+                name="github-notification-agent", arguments='{"text": "hi"}'
+            ),
+        )
+        task = asyncio.create_task(
+            chat_router.call_agent(tool_call, "thread", asyncio.Semaphore(1))
+        )
+        await agent.started.wait()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        assert agent.cancelled
+
+    asyncio.run(run())
+
+
+def test_closing_agent_stream_cancels_agent(agent):
+    async def run():
+        message = RunAgentInput(
+            thread_id="thread",
+            run_id="run",
+            state=None,
+            messages=[UserMessage(id="1", role="user", content="hi")],
+            tools=[],
+            context=[],
+            forwarded_props=None,
+        )
+        events = agent_router.generate_events("github-notification-agent", message)
+        # run started, text message start and the agent's first message
+        for _ in range(3):
+            await anext(events)
+        await events.aclose()
+        assert agent.cancelled
+
+    asyncio.run(run())
@@ -0,0 +1,51 @@
+"""Tests for recording LLM and MCP calls to a cassette."""
+
+import asyncio
+
+from mcp.types import ListToolsResult
+
+from api.src.utils.cassette import Cassette, CassetteSettings
+
+
+def test_records_calls_in_the_background(tmp_path):
+    path = tmp_path / "cassette.jsonl"
+    cassette = Cassette(CassetteSettings(cassette_mode="record", cassette_path=path))
+
+    async def list_tools():
+        return ListToolsResult(tools=[])
+
+    async def run():
+        await asyncio.gather(
+            *[
+                cassette.call(
+                    "list_tools", "server", str(i), list_tools, ListToolsResult
+                )
+                for i in range(10)
+            ]
+        )
+        # the calls return before their lines are written
+        while not cassette._writer.done():
+            await cassette._writer
+
+    asyncio.run(run())
+    assert len(path.read_text().splitlines()) == 10
+
+    replay = Cassette(CassetteSettings(cassette_mode="replay", cassette_path=path))
+    assert len(replay._by_key) == 10
+
+
+def test_close_writes_buffered_calls(tmp_path):
+    path = tmp_path / "cassette.jsonl.gz"
+    cassette = Cassette(CassetteSettings(cassette_mode="record", cassette_path=path))
+
+    async def list_tools():
+        return ListToolsResult(tools=[])
+
+    async def run():
+        await cassette.call("list_tools", "server", "key", list_tools, ListToolsResult)
+        cassette.close()
+
+    asyncio.run(run())
+    assert cassette.stats().recorded == 1
+    replay = Cassette(CassetteSettings(cassette_mode="replay", cassette_path=path))
+    assert list(replay._by_key) == ["key"]
@@ -0,0 +1,104 @@
+"""Tests for the cache of chat completions."""
+
+import asyncio
+
+from openai import NOT_GIVEN
+from openai.types.chat import ChatCompletion
+
+from api.src.openai.cache import (
+    CompletionCache,
+    CompletionCacheSettings,
+    completion_key,
+)
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+TOOL = {"type": "function", "function": {"name": "list_notifications"}}
+
+
+def completion(text: str) -> ChatCompletion:
+    return ChatCompletion.model_validate(
+        {
+            "id": "completion",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "model",
+            "choices": [
+                {
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": text},
+                }
+            ],
+        }
+    )
+
+
+def test_key_depends_on_the_parameters_given():
+    key = completion_key(model="model", messages=MESSAGES, temperature=0)
+    assert key == completion_key(
+        messages=MESSAGES, model="model", temperature=0, tools=NOT_GIVEN
+    )
+    assert key != completion_key(model="model", messages=MESSAGES, temperature=1)
+    assert key != completion_key(
+        model="model", messages=MESSAGES, temperature=0, tools=[TOOL]
+    )
+    assert completion_key(
+        model="model", messages=MESSAGES, temperature=0, tools=[TOOL]
+    ) != completion_key(
+        model="model",
+        messages=MESSAGES,
+        temperature=0,
+        tools=[{"type": "function", "function": {"name": "get_notification"}}],
+    )
+
+
+def test_memory_tier_is_bounded_by_size():
+    size = len(completion("a").model_dump_json().encode())
+    cache = CompletionCache(
+        CompletionCacheSettings(
+            completion_cache=True, completion_cache_max_bytes=size * 2
+        )
+    )
+
+    async def run():
+        await cache.put("a", completion("a"))
+        await cache.put("b", completion("b"))
+        # reading `a` makes `b` the least recently used
+        assert (await cache.get("a")).choices[0].message.content == "a"
+        await cache.put("c", completion("c"))
+        return [await cache.get(key) is not None for key in ("a", "b", "c")]
+
+    assert asyncio.run(run()) == [True, False, True]
+    stats = cache.stats()
+    assert (stats.entries, stats.nbytes) == (2, size * 2)
+    assert (stats.hits, stats.misses) == (3, 1)
+
+
+def test_expired_completions_are_not_returned():
+    cache = CompletionCache(CompletionCacheSettings(completion_cache=True))
+
+    async def run():
+        await cache.put("key", completion("a"), ttl=-1)
+        return await cache.get("key")
+
+    assert asyncio.run(run()) is None
+    assert cache.stats().entries == 0
+
+
+def test_disk_tier_is_shared_between_caches(tmp_path):
+    settings = CompletionCacheSettings(
+        completion_cache=True,
+        completion_cache_disk=True,
+        completion_cache_path=tmp_path / "completions.sqlite3",
+    )
+
+    async def run():
+        await CompletionCache(settings).put("key", completion("cached"))
+        # another worker, with an empty memory tier
+        other = CompletionCache(settings)
+        cached = await other.get("key")
+        return cached, other.stats()
+
+    cached, stats = asyncio.run(run())
+    assert cached == completion("cached")
+    assert (stats.hits, stats.disk_hits, stats.entries) == (1, 1, 1)
@@ -0,0 +1,34 @@
+"""Smoke tests for the scripted MCP server used by the benchmarks."""
+
+import asyncio
+import json
+
+from mcp.shared.memory import create_connected_server_and_client_session
+
+from benchmarks.fakes.mcp_server import create_server
+
+
+def arguments(schema):
+    """Return a string for each required argument of a tool."""
+    return {name: "1" for name in schema.get("required", [])}
+
+
+def test_every_tool_returns_json():
+    async def run():
+        async with create_connected_server_and_client_session(
+            create_server()
+        ) as session:
+            tools = (await session.list_tools()).tools
+            assert tools
+            results = {}
+            for tool in tools:
+                result = await session.call_tool(tool.name, arguments(tool.inputSchema))
+                assert not result.isError, (tool.name, result.content)
+                results[tool.name] = json.loads(result.content[0].text)
+            return results
+
+    results = asyncio.run(run())
+    assert results["get_notification_details"] == {
+        "notification": {"notificationID": "1"},
+        "unread": True,
+    }
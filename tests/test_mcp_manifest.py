@@ -0,0 +1,29 @@
+"""Tests for the on-disk cache of MCP tool manifests."""
+
+import asyncio
+
+from mcp.types import ListToolsResult
+
+from api.src.mcp.manifest import McpManifestCache, McpManifestSettings
+
+
+def test_manifest_round_trip(tmp_path):
+    async def run():
+        cache = McpManifestCache(McpManifestSettings(mcp_manifest_cache_path=tmp_path))
+        tools = ListToolsResult.model_validate(
+            {
+                "_meta": {"server": "github"},
+                "tools": [
+                    {
+                        "name": "list_notifications",
+                        "description": "List notifications.",
+                        "inputSchema": {"type": "object", "properties": {}},
+                    }
+                ],
+            }
+        )
+        await cache.save("github", tools)
+        assert await cache.load("github") == tools
+        assert await cache.load("other") is None
+
+    asyncio.run(run())
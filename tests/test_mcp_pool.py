@@ -0,0 +1,155 @@
+"""Tests for the MCP session pool."""
+
+import asyncio
+from contextlib import asynccontextmanager
+
+import httpx
+import pytest
+
+from api.src.mcp.pool import KeepAliveTransport, McpSessionPool
+
+
+class FakeOpener:
+    """Opens fake sessions, counting how many are open."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.opened = 0
+        self.open = 0
+
+    @asynccontextmanager
+    async def __call__(self):
+        self.opened += 1
+        self.open += 1
+        try:
+            await asyncio.sleep(self.delay)
+            yield object()
+        finally:
+            self.open -= 1
+
+
+class EventStream(httpx.AsyncByteStream):
+    """Response body of SSE events, recording how much of it was read."""
+
+    def __init__(self, events: int, delay: float = 0.0):
+        self.events = events
+        self.delay = delay
+        self.read = 0
+        self.closed = False
+
+    async def __aiter__(self):
+        for _ in range(self.events):
+            await asyncio.sleep(self.delay)
+            self.read += 1
+            yield b"event: message\ndata: {}\n\n"
+
+    async def aclose(self):
+        self.closed = True
+
+
+def test_tool_error_keeps_session_open():
+    async def run():
+        opener = FakeOpener()
+        pool = McpSessionPool(opener, size=1, max_requests=4)
+        with pytest.raises(ValueError):
+            async with pool.session():
+                raise ValueError("invalid arguments")
+        assert len(pool) == 1
+
+        async with pool.session():
+            pass
+        assert opener.opened == 1
+        await pool.close()
+        assert opener.open == 0
+
+    asyncio.run(run())
+
+
+def test_connection_error_discards_session():
+    async def run():
+        opener = FakeOpener()
+        pool = McpSessionPool(opener, size=1, max_requests=4)
+        with pytest.raises(ConnectionResetError):
+            async with pool.session():
+                raise ConnectionResetError()
+        assert len(pool) == 0
+        assert opener.open == 0
+
+        async with pool.session():
+            pass
+        assert opener.opened == 2
+        await pool.close()
+
+    asyncio.run(run())
+
+
+def test_open_does_not_block_other_requests():
+    async def run():
+        opener = FakeOpener()
+        pool = McpSessionPool(opener, size=2, max_requests=4)
+        async with pool.session():
+            pass
+
+        # the second session takes long to open, meanwhile the first one is still handed out
+        opener.delay = 10
+        async with pool.session():
+            opening = asyncio.create_task(pool.session().__aenter__())
+            await asyncio.sleep(0.01)
+            async with asyncio.timeout(1):
+                async with pool.session():
+                    pass
+        opening.cancel()
+        await asyncio.gather(opening, return_exceptions=True)
+        await pool.close()
+
+    asyncio.run(run())
+
+
+def test_cancelled_open_closes_connection():
+    async def run():
+        opener = FakeOpener(delay=10)
+        pool = McpSessionPool(opener, size=1, max_requests=4)
+
+        async def borrow():
+            async with pool.session():
+                pass
+
+        task = asyncio.create_task(borrow())
+        await asyncio.sleep(0.01)
+        assert opener.open == 1
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        assert opener.open == 0
+        assert len(pool) == 0
+
+    asyncio.run(run())
+
+
+def read_first_event(stream: EventStream, drain_timeout: float) -> None:
+    """Read the first event of a response and close it, the way the MCP client does."""
+
+    async def run():
+        transport = KeepAliveTransport(
+            httpx.MockTransport(lambda request: httpx.Response(200, stream=stream)),
+            drain_timeout,
+        )
+        async with httpx.AsyncClient(transport=transport) as client:
+            async with client.stream("POST", "http://mcp/mcp/") as response:
+                async for _ in response.aiter_bytes():
+                    break
+
+    asyncio.run(run())
+
+
+def test_response_closed_early_is_drained():
+    stream = EventStream(events=3)
+    read_first_event(stream, drain_timeout=1.0)
+    assert stream.read == 3
+    assert stream.closed
+
+
+def test_response_drain_gives_up_after_timeout():
+    stream = EventStream(events=3, delay=0.2)
+    read_first_event(stream, drain_timeout=0.05)
+    assert stream.read == 1
+    assert stream.closed
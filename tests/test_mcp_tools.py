@@ -0,0 +1,95 @@
+"""Tests for the models and cards of MCP tools."""
+
+import copy
+
+from cachetools import LRUCache
+
+from api.src import pydantic as models
+from api.src.mcp.base import BaseHttpMcpSession, MCPTool
+from api.src.openai.tools import strict_json_schema
+
+SCHEMA = {
+    "type": "object",
+    "$defs": {
+        "User": {
+            "type": "object",
+            "properties": {"login": {"type": "string"}, "id": {"type": "integer"}},
+            "required": ["login"],
+        }
+    },
+    "properties": {
+        "owner": {"type": "string", "description": "Repository owner"},
+        "state": {"type": "string", "enum": ["open", "closed"]},
+        "author": {"$ref": "#/$defs/User"},
+        "filter": {
+            "type": "object",
+            "properties": {"label": {"type": "string"}},
+        },
+    },
+    "required": ["owner"],
+}
+
+
+def test_model_from_schema_is_cached():
+    first = models.model_from_schema("list_issues", SCHEMA)
+    assert ("list_issues", models.schema_hash(SCHEMA)) in models._schema_models
+    assert models.model_from_schema("list_issues", copy.deepcopy(SCHEMA)) is first
+
+
+def test_card_does_not_build_the_model():
+    tool = MCPTool(
+        session=BaseHttpMcpSession(session_id="test"),
+        name="list_issues_card",
+        description="List issues.",
+        tool_call_schema=copy.deepcopy(SCHEMA),
+    )
+    card = tool.card
+    assert isinstance(tool._tool_call_schema, dict)
+    assert card["function"]["name"] == "list_issues_card"
+    assert card["function"]["parameters"]["properties"]["owner"] == {
+        "type": "string",
+        "description": "Repository owner",
+    }
+    # the tool's schema is left as it was
+    assert tool._input_schema == SCHEMA
+
+
+def test_strict_json_schema():
+    schema = strict_json_schema(SCHEMA)
+    assert schema["required"] == ["owner", "state", "author", "filter"]
+    assert schema["additionalProperties"] is False
+    assert schema["properties"]["state"] == {
+        "type": ["string", "null"],
+        "enum": ["open", "closed", None],
+    }
+    assert schema["properties"]["author"] == {
+        "anyOf": [{"$ref": "#/$defs/User"}, {"type": "null"}]
+    }
+    assert schema["properties"]["filter"]["type"] == ["object", "null"]
+    assert schema["properties"]["filter"]["required"] == ["label"]
+    assert schema["properties"]["filter"]["additionalProperties"] is False
+    assert schema["$defs"]["User"]["required"] == ["login", "id"]
+    assert schema["$defs"]["User"]["properties"]["id"]["type"] == ["integer", "null"]
+    assert "additionalProperties" not in SCHEMA
+
+
+def test_card_of_a_tool_without_properties():
+    for strict in (False, True):
+        tool = MCPTool(
+            session=BaseHttpMcpSession(session_id="test"),
+            name="get_me",
+            description="Get the authenticated user.",
+            tool_call_schema={"type": "object"},
+            strict=strict,
+        )
+        parameters = tool.card["function"]["parameters"]
+        assert parameters["type"] == "object"
+        assert parameters["required"] == []
+
+
+def test_model_caches_are_bounded(monkeypatch):
+    monkeypatch.setattr(models, "_schema_models", LRUCache(maxsize=2))
+    for index in range(3):
+        schema = {"type": "object", "properties": {f"field{index}": {"type": "string"}}}
+        models.model_from_schema("tool", schema)
+    assert len(models._schema_models) == 2
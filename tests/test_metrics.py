@@ -0,0 +1,121 @@
+"""Tests for the collectors exporting statistics at /metrics."""
+
+import asyncio
+from types import SimpleNamespace
+
+from mcp.client.stdio import StdioServerParameters
+
+from api.src.agents.registry import agent_registry
+from api.src.mcp.base import BaseHttpMcpSession
+from api.src.mcp.pool import get_mcp_session_manager
+from api.src.openai.cache import get_completion_cache
+from api.src.openai.scheduler import get_llm_scheduler
+from api.src.tools.cache import ToolCacheStats
+from api.src.utils.cassette import get_cassette
+from api.src.utils.metrics import metrics
+from api.src.utils.singleflight import get_single_flight
+
+
+def render() -> str:
+    return asyncio.run(metrics.render())
+
+
+def test_exports_tool_cache_stats(monkeypatch):
+    stats = ToolCacheStats(
+        hits=3, stale_hits=1, misses=2, revalidations=1, invalidations=4, entries=2
+    )
+    agent = SimpleNamespace(
+        id="agent", tool_registry=SimpleNamespace(cache_stats=lambda: {"tool": stats})
+    )
+    monkeypatch.setattr(agent_registry, "_agents", {"agent": agent})
+
+    text = render()
+    labels = 'agent="agent",tool="tool"'
+    assert f'jarvis_tool_cache_lookups_total{{{labels},result="hit"}} 3' in text
+    assert f'jarvis_tool_cache_lookups_total{{{labels},result="stale"}} 1' in text
+    assert f'jarvis_tool_cache_lookups_total{{{labels},result="miss"}} 2' in text
+    assert f"jarvis_tool_cache_invalidations_total{{{labels}}} 4" in text
+    assert f"jarvis_tool_cache_entries{{{labels}}} 2" in text
+
+    # an agent registered again starts from zero, its counters keep increasing
+    stats = ToolCacheStats(
+        hits=1, stale_hits=0, misses=0, revalidations=0, invalidations=0, entries=1
+    )
+    text = render()
+    assert f'jarvis_tool_cache_lookups_total{{{labels},result="hit"}} 4' in text
+    assert f"jarvis_tool_cache_invalidations_total{{{labels}}} 4" in text
+    assert f"jarvis_tool_cache_entries{{{labels}}} 1" in text
+
+    monkeypatch.setattr(agent_registry, "_agents", {})
+    text = render()
+    assert f'jarvis_tool_cache_lookups_total{{{labels},result="hit"}} 4' in text
+    assert "jarvis_tool_cache_entries{" not in text
+
+
+def test_exports_llm_scheduler_stats():
+    get_llm_scheduler.cache_clear()
+    try:
+        assert 'deployment="model"' not in render()
+
+        deployment = get_llm_scheduler().deployment("model")
+        deployment.throttled = 2
+        text = render()
+        assert 'jarvis_llm_queue_depth{deployment="model"} 0' in text
+        assert 'jarvis_llm_throttled_requests_total{deployment="model"} 2' in text
+        assert 'jarvis_llm_concurrency_limit{deployment="model"} ' in text
+        labels = 'limiter="llm:model",priority="interactive"'
+        assert f"jarvis_priority_started_total{{{labels}}} 0" in text
+    finally:
+        get_llm_scheduler.cache_clear()
+
+
+def test_exports_single_flight_stats():
+    async def run():
+        group = get_single_flight("test")
+
+        async def call():
+            await asyncio.sleep(0)
+            return 1
+
+        await asyncio.gather(group.do("key", call), group.do("key", call))
+        return await metrics.render()
+
+    text = asyncio.run(run())
+    assert 'jarvis_single_flight_calls_total{group="test",result="executed"} 1' in text
+    assert 'jarvis_single_flight_calls_total{group="test",result="coalesced"} 1' in text
+    assert 'jarvis_single_flight_in_flight{group="test"} 0' in text
+
+
+def test_exports_cache_and_cassette_stats():
+    get_completion_cache.cache_clear()
+    get_cassette.cache_clear()
+    try:
+        assert "jarvis_completion_cache_entries 0" not in render()
+        get_completion_cache().misses = 2
+        get_cassette().replayed = 3
+        text = render()
+        assert 'jarvis_completion_cache_lookups_total{result="miss"} 2' in text
+        assert "jarvis_completion_cache_entries 0" in text
+        assert 'jarvis_cassette_calls_total{result="replayed"} 3' in text
+    finally:
+        get_completion_cache.cache_clear()
+        get_cassette.cache_clear()
+
+
+def test_exports_mcp_pool_stats_without_stdio_arguments(monkeypatch):
+    monkeypatch.setattr(get_mcp_session_manager(), "_pools", {})
+    session = BaseHttpMcpSession(
+        use_stdio=True,
+        stdio_parameters=StdioServerParameters(
+            command="docker", args=["run", "-e", "GITHUB_PERSONAL_ACCESS_TOKEN=secret"]
+        ),
+    )
+    assert session.pool is not None
+    text = render()
+    assert "secret" not in text
+    assert 'jarvis_mcp_sessions_open{pool="docker"} 0' in text
+    labels = 'limiter="mcp:docker",priority="nested"'
+    assert f"jarvis_priority_queued{{{labels}}} 0" in text
+
+    monkeypatch.setattr(get_mcp_session_manager(), "_pools", {})
+    assert 'jarvis_mcp_sessions_open{pool="docker"}' not in render()
@@ -0,0 +1,122 @@
+"""Tests for handing out concurrency slots by priority."""
+
+import asyncio
+from typing import List, Optional
+
+from api.src.utils.priority import Priority, PriorityLimiter, PrioritySettings
+
+
+def limiter(aging: float = 100, fairness: float = 0) -> PriorityLimiter:
+    settings = PrioritySettings(
+        priority_aging_seconds=aging, priority_fairness_seconds=fairness
+    )
+    return PriorityLimiter(1, settings)
+
+
+async def enter(
+    slots: PriorityLimiter,
+    order: List[str],
+    name: str,
+    priority: Priority,
+    thread_id: Optional[str] = None,
+):
+    async with slots.slot(priority, thread_id):
+        order.append(name)
+
+
+async def queue(slots: PriorityLimiter, order: List[str], *calls) -> List[asyncio.Task]:
+    """Queue calls of `(name, priority, thread_id)` behind a held slot."""
+    tasks = []
+    for name, priority, thread_id in calls:
+        tasks.append(
+            asyncio.create_task(enter(slots, order, name, priority, thread_id))
+        )
+        await asyncio.sleep(0)
+    return tasks
+
+
+def test_higher_classes_are_served_first():
+    async def run():
+        slots, order = limiter(), []
+        async with slots.slot(Priority.INTERACTIVE):
+            tasks = await queue(
+                slots,
+                order,
+                ("background", Priority.BACKGROUND, None),
+                ("nested", Priority.NESTED, None),
+                ("interactive", Priority.INTERACTIVE, None),
+            )
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(run()) == ["interactive", "nested", "background"]
+
+
+def test_calls_which_waited_long_enough_are_served_ahead():
+    async def run():
+        slots, order = limiter(aging=0.01), []
+        async with slots.slot(Priority.INTERACTIVE):
+            tasks = await queue(slots, order, ("background", Priority.BACKGROUND, None))
+            # waits longer than the two classes of aging
+            await asyncio.sleep(0.05)
+            tasks += await queue(
+                slots, order, ("interactive", Priority.INTERACTIVE, None)
+            )
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(run()) == ["background", "interactive"]
+
+
+def test_busy_threads_do_not_crowd_out_others():
+    async def run():
+        slots, order = limiter(fairness=10), []
+        async with slots.slot(Priority.NESTED, "a"):
+            tasks = await queue(
+                slots,
+                order,
+                ("a1", Priority.NESTED, "a"),
+                ("a2", Priority.NESTED, "a"),
+                ("b1", Priority.NESTED, "b"),
+            )
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(run()) == ["b1", "a1", "a2"]
+
+
+def test_cancelled_waiter_handed_a_slot_passes_it_on():
+    async def run():
+        slots, order = limiter(), []
+        async with slots.slot(Priority.INTERACTIVE):
+            cancelled, waiting = await queue(
+                slots,
+                order,
+                ("cancelled", Priority.INTERACTIVE, None),
+                ("waiting", Priority.NESTED, None),
+            )
+        # releasing handed the slot to the first waiter, which is cancelled before it runs
+        assert slots.in_flight == 1 and slots.queued == 1
+        cancelled.cancel()
+        await asyncio.gather(cancelled, waiting, return_exceptions=True)
+        assert cancelled.cancelled()
+        assert (slots.in_flight, slots.queued) == (0, 0)
+        return order
+
+    assert asyncio.run(run()) == ["waiting"]
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def run():
+        slots, order = limiter(), []
+        async with slots.slot(Priority.INTERACTIVE):
+            (cancelled,) = await queue(
+                slots, order, ("cancelled", Priority.INTERACTIVE, None)
+            )
+            cancelled.cancel()
+            await asyncio.gather(cancelled, return_exceptions=True)
+            assert slots.queued == 0
+        assert slots.in_flight == 0
+        assert not slots._threads
+
+    asyncio.run(run())
@@ -0,0 +1,65 @@
+"""Tests that runs streamed in the request end with a RUN_ERROR event when they fail."""
+
+import pytest
+from ag_ui.core import EventType, RunStartedEvent
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.services.chat import router as chat_router
+from api.src.runs.manager import get_run_manager
+
+RUN_INPUT = {
+    "threadId": "thread",
+    "runId": "run",
+    "state": None,
+    "messages": [{"id": "1", "role": "user", "content": "hi"}],
+    "tools": [],
+    "context": [],
+    "forwardedProps": None,
+}
+
+
+async def failing_events(message):
+    yield RunStartedEvent(
+        type=EventType.RUN_STARTED, thread_id=message.thread_id, run_id=message.run_id
+    )
+    raise RuntimeError("model unavailable")
+
+
+@pytest.fixture
+def client(monkeypatch) -> TestClient:
+    monkeypatch.setattr(chat_router, "generate_events", failing_events)
+    app = FastAPI()
+    app.include_router(chat_router.router)
+    return TestClient(app)
+
+
+def test_sse_run_ends_with_run_error(client):
+    response = client.post("/chat", json=RUN_INPUT)
+    assert response.status_code == 200
+    assert '"type":"RUN_STARTED"' in response.text
+    assert '"type":"RUN_ERROR"' in response.text
+    assert "model unavailable" in response.text
+
+
+def test_websocket_run_ends_with_run_error(client):
+    with client.websocket_connect("/chat/ws") as websocket:
+        websocket.send_text("not a run")
+        assert websocket.receive_json()["type"] == "RUN_ERROR"
+
+        # the connection is still open after the invalid message
+        websocket.send_json(RUN_INPUT)
+        assert websocket.receive_json()["type"] == "RUN_STARTED"
+        error = websocket.receive_json()
+        assert error["type"] == "RUN_ERROR"
+        assert error["message"] == "model unavailable"
+
+
+def test_started_runs_wait_in_the_run_store(client):
+    # runs are stored rather than started, so any worker sharing the store can stream them
+    assert client.post("/chat/start", json=RUN_INPUT).json() == {"runId": "run"}
+    assert get_run_manager("chat").get("run") is None
+
+    response = client.get("/chat/stream/run")
+    assert '"type":"RUN_STARTED"' in response.text
+    assert '"type":"RUN_ERROR"' in response.text
@@ -0,0 +1,50 @@
+"""Tests for the stores of pending runs."""
+
+import asyncio
+
+import pytest
+
+from api.src.runs.store import MemoryRunStore, RunStoreSettings, SqliteRunStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    def make(**settings):
+        settings = RunStoreSettings(
+            run_store_path=tmp_path / "runs.sqlite3", **settings
+        )
+        if request.param == "sqlite":
+            return SqliteRunStore("test", settings)
+        return MemoryRunStore("test", settings)
+
+    return make
+
+
+def test_sizes_are_encoded_lengths(make_store):
+    async def run():
+        store = make_store()
+        await store.put("run", "é" * 10)
+        return await store.stats()
+
+    stats = asyncio.run(run())
+    assert (stats.entries, stats.nbytes) == (1, 20)
+
+
+def test_evicts_the_oldest_runs(make_store):
+    async def run():
+        store = make_store(run_store_max_entries=2)
+        for run_id in ("a", "b", "c"):
+            await store.put(run_id, run_id)
+        return [await store.pop(run_id) for run_id in ("a", "b", "c")], store.evictions
+
+    assert asyncio.run(run()) == ([None, "b", "c"], 1)
+
+
+def test_evicts_to_stay_within_the_byte_limit(make_store):
+    async def run():
+        store = make_store(run_store_max_bytes=10)
+        await store.put("a", "x" * 6)
+        await store.put("b", "y" * 6)
+        return await store.pop("a"), await store.pop("b")
+
+    assert asyncio.run(run()) == (None, "y" * 6)
@@ -0,0 +1,55 @@
+"""Tests for runs executing in the background."""
+
+import asyncio
+
+import pytest
+
+from api.src.runs.manager import Run, RunManagerSettings
+
+
+async def events(count: int):
+    for i in range(1, count + 1):
+        yield f"data: {i}\n\n"
+
+
+async def collect(run: Run, last_event_id=None):
+    return [message async for message in run.stream(last_event_id)]
+
+
+def test_replays_buffered_events():
+    async def run():
+        run = Run("run", events(5), RunManagerSettings(run_buffer_size=3))
+        await run._task
+        assert run.can_resume(2)
+        assert await collect(run, 2) == [f"id: {i}\ndata: {i}\n\n" for i in range(3, 6)]
+
+    asyncio.run(run())
+
+
+def test_dropped_events_end_the_stream_with_an_error():
+    async def run():
+        run = Run("run", events(5), RunManagerSettings(run_buffer_size=3))
+        await run._task
+        assert not run.can_resume(None)
+        assert not run.can_resume(1)
+        (message,) = await collect(run)
+        assert message.startswith("data: ")
+        assert '"type":"RUN_ERROR"' in message
+
+    asyncio.run(run())
+
+
+def test_cancelled_run_is_cancelled():
+    async def run():
+        async def forever():
+            yield "data: 1\n\n"
+            await asyncio.Event().wait()
+
+        run = Run("run", forever(), RunManagerSettings())
+        await asyncio.sleep(0)
+        run.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await run._task
+        assert run.done
+
+    asyncio.run(run())
@@ -0,0 +1,161 @@
+"""Tests for the scheduler of chat completion requests."""
+
+import asyncio
+import email.utils
+import time
+
+import httpx
+import pytest
+from openai import RateLimitError
+
+from api.src.openai.scheduler import (
+    DeploymentScheduler,
+    LlmSchedulerSettings,
+    TokenBucket,
+    retry_after,
+)
+
+
+def test_waiting_for_tokens_does_not_hold_a_slot():
+    async def run():
+        settings = LlmSchedulerSettings(
+            llm_initial_concurrency=1, llm_tokens_per_minute=60
+        )
+        scheduler = DeploymentScheduler("model", settings)
+        scheduler._token_bucket.tokens = 0
+
+        async def call():
+            return "done"
+
+        waiting = asyncio.create_task(scheduler.run(call, tokens=1))
+        await asyncio.sleep(0.01)
+        # the request waits for the bucket to refill with its slot given back
+        assert scheduler._slots.in_flight == 0
+        assert await waiting == "done"
+
+    asyncio.run(run())
+
+
+def test_pause_is_waited_without_a_slot():
+    async def run():
+        settings = LlmSchedulerSettings(llm_initial_concurrency=1)
+        scheduler = DeploymentScheduler("model", settings)
+        scheduler.paused_until = time.monotonic() + 0.05
+
+        async def call():
+            return time.monotonic()
+
+        waiting = asyncio.create_task(scheduler.run(call, tokens=1))
+        await asyncio.sleep(0.01)
+        assert scheduler._slots.in_flight == 0
+        assert await waiting >= scheduler.paused_until
+
+    asyncio.run(run())
+
+
+def test_raising_the_limit_starts_queued_requests():
+    async def run():
+        scheduler = DeploymentScheduler(
+            "model", LlmSchedulerSettings(llm_initial_concurrency=1)
+        )
+        release = asyncio.Event()
+
+        async def call():
+            await release.wait()
+
+        first = asyncio.create_task(scheduler.run(call, tokens=1))
+        second = asyncio.create_task(scheduler.run(call, tokens=1))
+        await asyncio.sleep(0)
+        assert (scheduler._slots.in_flight, scheduler._slots.queued) == (1, 1)
+
+        scheduler.limit = 2
+        assert (scheduler._slots.in_flight, scheduler._slots.queued) == (2, 0)
+        release.set()
+        await asyncio.gather(first, second)
+
+    asyncio.run(run())
+
+
+def rate_limit_error(headers=None) -> RateLimitError:
+    request = httpx.Request("POST", "https://llm.test/chat/completions")
+    response = httpx.Response(429, headers=headers or {}, request=request)
+    return RateLimitError("rate limited", response=response, body=None)
+
+
+def test_retry_after_headers():
+    assert retry_after(rate_limit_error({"retry-after-ms": "1500"})) == 1.5
+    assert retry_after(rate_limit_error({"retry-after": "2"})) == 2.0
+    date = email.utils.formatdate(time.time() + 30, usegmt=True)
+    assert 25 < retry_after(rate_limit_error({"retry-after": date})) <= 30
+    assert retry_after(rate_limit_error({"retry-after": "soon"})) is None
+    assert retry_after(rate_limit_error()) is None
+
+
+def test_token_bucket_reports_the_wait_for_tokens():
+    bucket = TokenBucket(60)
+    assert bucket.delay(60) == 0
+    bucket.take(60)
+    assert bucket.delay(1) == pytest.approx(1, abs=0.05)
+    # requests larger than the bucket wait for a full bucket
+    assert bucket.delay(600) == pytest.approx(60, abs=0.05)
+    # corrections may leave the balance negative
+    bucket.consume(30)
+    assert bucket.delay(1) == pytest.approx(31, abs=0.05)
+
+
+def test_rate_limits_decrease_the_limit_and_successes_recover_it():
+    async def run():
+        settings = LlmSchedulerSettings(
+            llm_initial_concurrency=8, llm_min_concurrency=1, llm_backoff_factor=0.5
+        )
+        scheduler = DeploymentScheduler("model", settings)
+        responses = [
+            rate_limit_error({"retry-after-ms": "10"}),
+            rate_limit_error({"retry-after-ms": "10"}),
+        ]
+
+        async def call():
+            if responses:
+                raise responses.pop(0)
+            return "done"
+
+        assert await scheduler.run(call, tokens=1) == "done"
+        # halved twice, then one success adds 1 / limit
+        assert scheduler.limit == pytest.approx(2 + 1 / 2)
+        assert (scheduler.throttled, scheduler.retries) == (2, 2)
+
+        for _ in range(20):
+            await scheduler.run(call, tokens=1)
+        assert scheduler.limit > 5
+
+    asyncio.run(run())
+
+
+def test_rate_limits_pause_the_deployment_for_retry_after():
+    async def run():
+        scheduler = DeploymentScheduler("model", LlmSchedulerSettings())
+        error = rate_limit_error({"retry-after-ms": "50"})
+        start = time.monotonic()
+        assert scheduler._rate_limited(error, 0) == 0.05
+        assert scheduler.paused_until == pytest.approx(start + 0.05, abs=0.01)
+
+    asyncio.run(run())
+
+
+def test_gives_up_after_the_maximum_retries():
+    async def run():
+        settings = LlmSchedulerSettings(llm_max_retries=2)
+        scheduler = DeploymentScheduler("model", settings)
+        calls = 0
+
+        async def call():
+            nonlocal calls
+            calls += 1
+            raise rate_limit_error({"retry-after-ms": "1"})
+
+        with pytest.raises(RateLimitError):
+            await scheduler.run(call, tokens=1)
+        assert (calls, scheduler.retries) == (3, 2)
+        assert scheduler.limit >= settings.llm_min_concurrency
+
+    asyncio.run(run())
@@ -0,0 +1,103 @@
+"""Tests for coalescing identical concurrent calls."""
+
+import asyncio
+
+import pytest
+
+from api.src.utils.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    async def run():
+        group = SingleFlight("test")
+        calls = 0
+
+        async def call():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return calls
+
+        results = await asyncio.gather(*[group.do("key", call) for _ in range(5)])
+        return results, calls, group.stats()
+
+    results, calls, stats = asyncio.run(run())
+    assert results == [1] * 5
+    assert calls == 1
+    assert (stats.calls, stats.coalesced, stats.in_flight) == (1, 4, 0)
+
+
+def test_error_is_raised_to_every_waiter_and_releases_the_key():
+    async def run():
+        group = SingleFlight("test")
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("failed")
+
+        results = await asyncio.gather(
+            group.do("key", fail), group.do("key", fail), return_exceptions=True
+        )
+        assert [type(result) for result in results] == [ValueError, ValueError]
+        assert group.stats().in_flight == 0
+
+        # the next call executes again
+        async def succeed():
+            return "ok"
+
+        assert await group.do("key", succeed) == "ok"
+        assert group.stats().calls == 2
+
+    asyncio.run(run())
+
+
+def test_cancelled_waiter_leaves_the_call_to_the_others():
+    async def run():
+        group = SingleFlight("test")
+        release = asyncio.Event()
+
+        async def call():
+            await release.wait()
+            return "done"
+
+        first = asyncio.create_task(group.do("key", call))
+        second = asyncio.create_task(group.do("key", call))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        assert await second == "done"
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    asyncio.run(run())
+
+
+def test_call_is_cancelled_with_its_last_waiter():
+    async def run():
+        group = SingleFlight("test")
+        started = asyncio.Event()
+        cancelled = asyncio.Event()
+
+        async def call():
+            started.set()
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        waiter = asyncio.create_task(group.do("key", call))
+        await started.wait()
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        await asyncio.wait_for(cancelled.wait(), 1)
+        assert group.stats().in_flight == 0
+
+        # a later caller starts a new call rather than awaiting the cancelled one
+        async def succeed():
+            return "ok"
+
+        assert await group.do("key", succeed) == "ok"
+
+    asyncio.run(run())
@@ -0,0 +1,86 @@
+"""Tests for the TTL caches of tool results."""
+
+import asyncio
+import time
+
+from mcp.types import CallToolResult, TextContent
+
+from api.src.tools.cache import ToolCachePolicy, ToolResultCache
+
+
+def result(text: str) -> CallToolResult:
+    return CallToolResult(content=[TextContent(type="text", text=text)])
+
+
+def text(result: CallToolResult) -> str:
+    return result.content[0].text
+
+
+def stale_cache() -> ToolResultCache:
+    """Return a cache holding a stale result for `key`."""
+    cache = ToolResultCache(ToolCachePolicy(ttl=1, stale_while_revalidate=60))
+    cache._results["key"] = (time.monotonic() - 2, result("stale"))
+    return cache
+
+
+def test_refresh_cancelled_before_it_starts_is_forgotten():
+    async def run():
+        cache = stale_cache()
+
+        async def call():
+            return result("fresh")
+
+        assert text(await cache.get_or_call("key", call)) == "stale"
+        refresh = cache._refreshing["key"]
+        refresh.cancel()
+        await asyncio.gather(refresh, return_exceptions=True)
+        await asyncio.sleep(0)
+        assert "key" not in cache._refreshing
+
+        # the key revalidates again
+        await cache.get_or_call("key", call)
+        await cache._refreshing["key"]
+        assert text(await cache.get_or_call("key", call)) == "fresh"
+
+    asyncio.run(run())
+
+
+def test_invalidate_cancels_refreshes():
+    async def run():
+        cache = stale_cache()
+        release = asyncio.Event()
+
+        async def call():
+            await release.wait()
+            return result("before invalidation")
+
+        await cache.get_or_call("key", call)
+        refresh = cache._refreshing["key"]
+        await asyncio.sleep(0)
+        cache.invalidate()
+        release.set()
+        await asyncio.gather(refresh, return_exceptions=True)
+        assert refresh.cancelled()
+        assert not cache._refreshing
+        assert len(cache._results) == 0
+
+    asyncio.run(run())
+
+
+def test_calls_started_before_an_invalidation_are_not_stored():
+    async def run():
+        cache = ToolResultCache(ToolCachePolicy(ttl=60))
+        release = asyncio.Event()
+
+        async def call():
+            await release.wait()
+            return result("before invalidation")
+
+        pending = asyncio.create_task(cache.get_or_call("key", call))
+        await asyncio.sleep(0)
+        cache.invalidate("key")
+        release.set()
+        assert text(await pending) == "before invalidation"
+        assert len(cache._results) == 0
+
+    asyncio.run(run())